@@ -18,6 +18,8 @@ from common.logger import LOGGER
 # 全局变量
 ADSPOWER_HOST = CONFIG["adspower"]["host"]
 ADSPOWER_API_URL = CONFIG["adspower"]["url"]
+# 本进程已经设置过的浏览器环境代理（(user_id, 编号) -> 代理配置），代理未变化时不再查询 user_id 和请求修改接口
+BROWSER_2_PROXY_CONFIG = {}
 
 
 def check_api_status():
@@ -175,4 +177,96 @@ def is_browser_active(user_id: str = None,
     # 2. 判断状态
     if not browser_status or "status" not in browser_status or browser_status["status"] != "Active":
         return False
-    return True
\ No newline at end of file
+    return True
+
+def get_user_id(serial_number: str):
+    """
+    根据编号获取浏览器环境的 user_id
+    """
+    # 1. 检查 Ads Power API 状态
+    if not check_api_status():
+        LOGGER.error("AdsPower 指纹浏览器 -> 获取 user_id 失败，Ads Power API 状态异常")
+        return None
+    # 2. 请求接口
+    url = "{}/{}".format(ADSPOWER_API_URL, "api/v1/user/list")
+    params = {
+        "serial_number": serial_number
+    }
+    try:
+        response = requests.get(url, params=params)
+        response_json = response.json()
+    except Exception as e:
+        LOGGER.error("AdsPower 指纹浏览器 -> 获取 user_id 出错: {}".format(e))
+        return None
+    # 3. 检验返回值
+    if response.status_code != 200:
+        LOGGER.error("AdsPower 指纹浏览器 -> 获取 user_id 失败，状态码: {}".format(response.status_code))
+        return None
+    if "msg" not in response_json or str(response_json["msg"]).lower() != "success":
+        LOGGER.error("AdsPower 指纹浏览器 -> 获取 user_id 失败，msg 字段不存在或不为 success")
+        return None
+    user_list = (response_json.get("data") or {}).get("list") or []
+    if not user_list or "user_id" not in user_list[0]:
+        LOGGER.error("AdsPower 指纹浏览器 -> 获取 user_id 失败，未找到编号为 {} 的浏览器环境".format(serial_number))
+        return None
+    # 4. 返回结果
+    return user_list[0]["user_id"]
+
+def update_browser_proxy(user_id: str = None,
+                         serial_number: str = None,
+                         proxy_host: str = None,
+                         proxy_port: int = None,
+                         proxy_type: str = "socks5",
+                         proxy_username: str = None,
+                         proxy_password: str = None,
+                         is_forced: bool = False):
+    """
+    修改浏览器环境使用的代理（只指定编号时先查询 user_id）
+    与本进程上次设置的代理相同时不请求接口，在 Ads Power 中手动修改过代理时需要指定 is_forced
+    """
+    # 1. 检查参数
+    if not proxy_host or not proxy_port:
+        LOGGER.error("AdsPower 指纹浏览器 -> 修改代理失败，代理地址不能为空")
+        return False
+    proxy_config = {
+        "proxy_soft": "other",
+        "proxy_type": proxy_type,
+        "proxy_host": proxy_host,
+        "proxy_port": str(proxy_port),
+        "proxy_user": proxy_username or "",
+        "proxy_password": proxy_password or ""
+    }
+    # 2. 代理未变化时不修改
+    browser_key = (user_id or "", serial_number or "")
+    if not is_forced and BROWSER_2_PROXY_CONFIG.get(browser_key) == proxy_config:
+        LOGGER.info("AdsPower 指纹浏览器 -> 代理未变化，不修改：{}:{}".format(proxy_host, proxy_port))
+        return True
+    # 3. 获取 user_id
+    if not user_id:
+        user_id = get_user_id(serial_number)
+        if not user_id:
+            LOGGER.error("AdsPower 指纹浏览器 -> 修改代理失败，无法获取 user_id")
+            return False
+    # 4. 请求接口
+    url = "{}/{}".format(ADSPOWER_API_URL, "api/v1/user/update")
+    data = {
+        "user_id": user_id,
+        "user_proxy_config": proxy_config
+    }
+    try:
+        response = requests.post(url, json=data)
+        response_json = response.json()
+    except Exception as e:
+        LOGGER.error("AdsPower 指纹浏览器 -> 修改代理出错: {}".format(e))
+        return False
+    # 5. 检验返回值
+    if response.status_code != 200:
+        LOGGER.error("AdsPower 指纹浏览器 -> 修改代理失败，状态码: {}".format(response.status_code))
+        return False
+    if "msg" not in response_json or str(response_json["msg"]).lower() != "success":
+        LOGGER.error("AdsPower 指纹浏览器 -> 修改代理失败，msg 字段不存在或不为 success")
+        return False
+    # 6. 记录并返回结果
+    BROWSER_2_PROXY_CONFIG[browser_key] = proxy_config
+    LOGGER.info("AdsPower 指纹浏览器 -> 修改代理成功：{}:{}".format(proxy_host, proxy_port))
+    return True
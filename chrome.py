@@ -150,6 +150,26 @@ def connect_debug_chrome(debug_host: str = "localhost", debug_port: int = 9222,
     # 5. 返回 driver
     return driver
 
+def _get_adspower_browser_port_keys(user_id: str = None, serial_number: str = None):
+    """
+    @description: 浏览器环境的代理端口和 debug 端口的 key（同时作为转发的 base_name，重启后可以按转发名称恢复端口）
+    """
+    port_key = "adspower-{}".format(user_id or serial_number)
+    return port_key + "-proxy", port_key + "-debug"
+
+def _release_adspower_browser_ports(key_2_port: dict):
+    """
+    @description: 删除浏览器环境的端口转发并释放端口
+    """
+    delete_results = gost.delete_port_forwards([key + "-service" for key in key_2_port])
+    if delete_results is None or not all(delete_result["is_success"] for delete_result in delete_results):
+        LOGGER.error("共通 Chrome -> 删除 Ads Power 浏览器的端口转发失败，不释放端口")
+        return False
+    for key, port in key_2_port.items():
+        if port:
+            gost.free_port(port, key)
+    return True
+
 def start_adspower_browser(user_id: str = None,
                            serial_number: str = None,
                            is_open_tabs: bool = False,
@@ -163,8 +183,9 @@ def start_adspower_browser(user_id: str = None,
                            proxy_str: str = None):
     """
     @description: 启动 Ads Power 浏览器
+    代理转发和 debug 端口转发的监听端口自动分配（同一个浏览器环境每次启动使用同一组端口），代理端口会写入浏览器环境的代理设置
     @param {type}
-    @return:
+    @return: (Ads Power 主机, 转发后的 debug 端口)，失败时返回 None
     """
     # 1. 设置变量
     adspower_host = adspower.ADSPOWER_HOST
@@ -172,11 +193,12 @@ def start_adspower_browser(user_id: str = None,
     adspower_browser_debug_port = None
     adspower_browser_debug_protocol = "tcp"
     adspower_browser_forwarded_debug_host = "0.0.0.0"
-    adspower_browser_forwarded_debug_port = 14080 + int(serial_number)
+    adspower_browser_forwarded_debug_port = None
     adspower_browser_forwarded_debug_protocol = "tcp"
     adspower_browser_proxy_host = "127.0.0.1"
-    adspower_browser_proxy_port = 13080 + int(serial_number)
+    adspower_browser_proxy_port = None
     adspower_browser_proxy_protocol = "socks5"
+    adspower_browser_proxy_key, adspower_browser_debug_key = _get_adspower_browser_port_keys(user_id, serial_number)
     # 2. 检测浏览器状态
     browser_status = adspower.get_browser_status(user_id=user_id, serial_number=serial_number)
     if not browser_status:
@@ -185,73 +207,115 @@ def start_adspower_browser(user_id: str = None,
     if "status" in browser_status and browser_status["status"] == "Active":
         LOGGER.info("共通 Chrome -> Ads Power 浏览器已经启动，如有需要请关闭后再启动")
         return None
-    # 3. 设置代理转发
-    # 3.1 删除之前的代理转发
-    proxy_port_forward_service_list = gost.get_port_forward_service_list(
-        from_host=adspower_browser_proxy_host, from_port=adspower_browser_proxy_port)
-    for proxy_port_forward_service in proxy_port_forward_service_list:
-        gost.delete_port_forward_service_with_chain(proxy_port_forward_service["name"])
-    # 3.2 添加新的代理转发
-    proxy_host, proxy_port, proxy_protocol, proxy_username, proxy_password = proxy.parse_proxy_str(proxy_str)
-    is_proxy_service_added = gost.add_port_forward_service_with_chain(
-        from_host=adspower_browser_proxy_host,
-        from_port=adspower_browser_proxy_port,
-        from_protocol=adspower_browser_proxy_protocol,
-        to_host=proxy_host,
-        to_port=proxy_port,
-        to_protocol=proxy_protocol,
-        to_auth_username=proxy_username,
-        to_auth_password=proxy_password
-    )
-    if not is_proxy_service_added:
-        LOGGER.error("共通 Chrome -> 添加代理转发失败")
-        return None
-    # 4. 启动浏览器
-    is_browser_started = adspower.start_browser(
-        user_id=user_id,
-        serial_number=serial_number,
-        is_open_tabs=is_open_tabs,
-        is_open_ip_tab=is_open_ip_tab,
-        is_new_first_tab=is_new_first_tab,
-        launch_args=launch_args,
-        is_headless=is_headless,
-        is_disable_password_filling=is_disable_password_filling,
-        is_clear_cache_after_closing=is_clear_cache_after_closing,
-        is_enable_password_saving=is_enable_password_saving
-    )
-    if not is_browser_started:
-        LOGGER.error("共通 Chrome -> 启动 Ads Power 浏览器失败")
-        return None
-    # 5. 获取启动后的浏览器状态
-    browser_status = adspower.get_browser_status(user_id=user_id, serial_number=serial_number)
-    if not browser_status:
-        LOGGER.error("共通 Chrome -> 获取 Ads Power 浏览器状态失败")
-        return None
-    if "debug_port" not in browser_status or not browser_status["debug_port"]:
-        LOGGER.error("共通 Chrome -> Ads Power 浏览器状态中 debug_port 不存在")
-        return None
-    adspower_browser_debug_port = browser_status["debug_port"]
-    # 4. 添加对于 debug 端口的转发
-    # 4.1 删除之前对于浏览器 debug 端口的转发
-    debug_port_forward_service_list = gost.get_port_forward_service_list(
-        from_host=adspower_browser_forwarded_debug_host,
-        from_port=adspower_browser_forwarded_debug_port)
-    for debug_port_forward_service in debug_port_forward_service_list:
-        gost.delete_port_forward_service_without_chain(debug_port_forward_service["name"])
-    # 4.2 添加新的浏览器 debug 端口转发
-    is_debug_port_forward_service_added = gost.add_port_forward_service_without_chain(
-        from_host=adspower_browser_forwarded_debug_host,
-        from_port=adspower_browser_forwarded_debug_port,
-        from_protocol=adspower_browser_forwarded_debug_protocol,
-        to_host=adspower_browser_debug_host,
-        to_port=adspower_browser_debug_port,
-        to_protocol=adspower_browser_debug_protocol
-    )
-    if not is_debug_port_forward_service_added:
-        LOGGER.error("共通 Chrome -> 添加浏览器 debug 端口转发失败")
-        return None
-    # 6. 返回结果
-    return adspower_host, adspower_browser_forwarded_debug_port
+    # 3. 分配转发端口（之后任一步失败或出错时，停止已经启动的浏览器、删除转发并释放端口）
+    adspower_browser_proxy_port = gost.allocate_port(adspower_browser_proxy_key)
+    adspower_browser_forwarded_debug_port = gost.allocate_port(adspower_browser_debug_key)
+    key_2_port = {
+        adspower_browser_proxy_key: adspower_browser_proxy_port,
+        adspower_browser_debug_key: adspower_browser_forwarded_debug_port
+    }
+    is_browser_started = False
+    is_succeeded = False
+    try:
+        if not adspower_browser_proxy_port or not adspower_browser_forwarded_debug_port:
+            LOGGER.error("共通 Chrome -> 分配转发端口失败")
+            return None
+        # 4. 设置代理转发（已经是当前代理时不做修改，更换代理时只修改转发链）
+        proxy_host, proxy_port, proxy_protocol, proxy_username, proxy_password = proxy.parse_proxy_str(proxy_str)
+        is_proxy_service_added = gost.ensure_port_forward(
+            from_host=adspower_browser_proxy_host,
+            from_port=adspower_browser_proxy_port,
+            from_protocol=adspower_browser_proxy_protocol,
+            to_host=proxy_host,
+            to_port=proxy_port,
+            to_protocol=proxy_protocol,
+            base_name=adspower_browser_proxy_key,
+            to_auth_username=proxy_username,
+            to_auth_password=proxy_password
+        )
+        if not is_proxy_service_added:
+            LOGGER.error("共通 Chrome -> 添加代理转发失败")
+            return None
+        # 5. 浏览器环境使用转发后的代理端口（端口未变化时不请求 Ads Power）
+        is_browser_proxy_updated = adspower.update_browser_proxy(
+            user_id=user_id,
+            serial_number=serial_number,
+            proxy_host=adspower_browser_proxy_host,
+            proxy_port=adspower_browser_proxy_port,
+            proxy_type=adspower_browser_proxy_protocol
+        )
+        if not is_browser_proxy_updated:
+            LOGGER.error("共通 Chrome -> 修改 Ads Power 浏览器的代理失败")
+            return None
+        # 6. 启动浏览器
+        is_browser_started = adspower.start_browser(
+            user_id=user_id,
+            serial_number=serial_number,
+            is_open_tabs=is_open_tabs,
+            is_open_ip_tab=is_open_ip_tab,
+            is_new_first_tab=is_new_first_tab,
+            launch_args=launch_args,
+            is_headless=is_headless,
+            is_disable_password_filling=is_disable_password_filling,
+            is_clear_cache_after_closing=is_clear_cache_after_closing,
+            is_enable_password_saving=is_enable_password_saving
+        )
+        if not is_browser_started:
+            LOGGER.error("共通 Chrome -> 启动 Ads Power 浏览器失败")
+            return None
+        # 7. 获取启动后的浏览器状态
+        browser_status = adspower.get_browser_status(user_id=user_id, serial_number=serial_number)
+        if not browser_status:
+            LOGGER.error("共通 Chrome -> 获取 Ads Power 浏览器状态失败")
+            return None
+        if "debug_port" not in browser_status or not browser_status["debug_port"]:
+            LOGGER.error("共通 Chrome -> Ads Power 浏览器状态中 debug_port 不存在")
+            return None
+        adspower_browser_debug_port = browser_status["debug_port"]
+        # 8. 添加对于 debug 端口的转发（debug 端口未变化时不做修改）
+        is_debug_port_forward_service_added = gost.ensure_port_forward(
+            from_host=adspower_browser_forwarded_debug_host,
+            from_port=adspower_browser_forwarded_debug_port,
+            from_protocol=adspower_browser_forwarded_debug_protocol,
+            to_host=adspower_browser_debug_host,
+            to_port=adspower_browser_debug_port,
+            to_protocol=adspower_browser_debug_protocol,
+            base_name=adspower_browser_debug_key,
+            is_chained=False
+        )
+        if not is_debug_port_forward_service_added:
+            LOGGER.error("共通 Chrome -> 添加浏览器 debug 端口转发失败")
+            return None
+        # 9. 返回结果
+        is_succeeded = True
+        return adspower_host, adspower_browser_forwarded_debug_port
+    finally:
+        if not is_succeeded:
+            if is_browser_started and not adspower.stop_browser(user_id=user_id, serial_number=serial_number):
+                LOGGER.error("共通 Chrome -> 停止启动失败的 Ads Power 浏览器失败")
+            _release_adspower_browser_ports(key_2_port)
+
+def stop_adspower_browser(user_id: str = None,
+                          serial_number: str = None,
+                          is_port_released: bool = True):
+    """
+    @description: 停止 Ads Power 浏览器
+    @param {type}
+    is_port_released: 是否同时删除代理转发和 debug 端口转发并释放端口（下次启动时重新分配）
+    @return: 是否成功
+    """
+    # 1. 停止浏览器
+    if not adspower.stop_browser(user_id=user_id, serial_number=serial_number):
+        LOGGER.error("共通 Chrome -> 停止 Ads Power 浏览器失败")
+        return False
+    # 2. 删除转发并释放端口
+    if not is_port_released:
+        return True
+    adspower_browser_proxy_key, adspower_browser_debug_key = _get_adspower_browser_port_keys(user_id, serial_number)
+    key_2_port = {
+        key: gost.get_allocated_port(key) for key in (adspower_browser_proxy_key, adspower_browser_debug_key)
+    }
+    return _release_adspower_browser_ports(key_2_port)
 
 def check_is_network_error(driver):
     """
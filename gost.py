@@ -9,25 +9,33 @@
 # @DESCRIPTION: GOST 转发控制
 
 
+import concurrent.futures
+
 from common.logger import LOGGER
 from common.logger import CONFIG
 from common.logic import gost_config
 from common.logic import gost_service
 from common.logic import gost_chain
+from common.logic import gost_reconciler
+from common.logic import gost_ports
 
 
 # 全局变量
 ADSPOWER_HOST = CONFIG["gost"]["host"]
+# 批量添加、删除端口转发时的默认最大并发数（不超过 GOST 请求的连接池大小）
+BULK_MAX_WORKERS = CONFIG["gost"].get("bulk_max_workers", 8)
+# 负载均衡转发的节点选择策略（round：轮询，random：随机，fifo：按顺序使用第一个可用节点）
+SELECTOR_STRATEGY_LIST = ["round", "random", "fifo"]
 
 
 def check_api_status():
     """
     @description: 检查 API 状态
     """
-    # 1. 请求配置
-    config = gost_config.get_config()
+    # 1. 请求配置（配置缓存有效期内视为正常，不再请求）
+    config_index = gost_config.get_config_index()
     # 2. 检查配置
-    if not config:
+    if config_index is None:
         LOGGER.error("GOST 转发控制 -> API 配置获取失败")
         return False
     # 3. 其他情况
@@ -40,6 +48,27 @@ def get_config():
     """
     return gost_config.get_config()
 
+def allocate_port(key: str = None):
+    """
+    @description: 在配置的端口范围内分配空闲的监听端口
+    @param {type}
+    key: 可选，同一个 key 总是得到同一个端口（直到被释放）
+    @return: 端口，没有空闲端口或获取配置失败时返回 None
+    """
+    return gost_ports.allocate_port(key)
+
+def get_allocated_port(key: str):
+    """
+    @description: 获取 key 已分配的监听端口，未分配时返回 None
+    """
+    return gost_ports.get_allocated_port(key)
+
+def free_port(port: int, key: str = None):
+    """
+    @description: 释放监听端口（删除转发后调用）
+    """
+    return gost_ports.free_port(port, key)
+
 def get_port_forward_service_list(from_host: str = None,
                                   from_port: int = None,
                                   from_protocol: str = None,
@@ -57,24 +86,103 @@ def get_port_forward_service_list(from_host: str = None,
     if (not from_host or not from_port) and (not to_host or not to_port):
         LOGGER.error("GOST 转发控制 -> 参数缺失，无法获取转发规则")
         return None
-    # 3. 拼凑 name_like
-    service_name_like = ""
-    if from_host and from_port:
-        service_name_like += (from_protocol + "-") if from_protocol else ""
-        service_name_like += (from_host + "-") if from_host else ""
-        service_name_like += (str(from_port) + "-") if from_port else ""
-        service_name_like += "to-"
-    if to_host and to_port:
-        service_name_like += (to_protocol + "-") if to_protocol else ""
-        service_name_like += (to_host + "-") if to_host else ""
-        service_name_like += (str(to_port) + "-") if to_port else ""
-        service_name_like += "service"
-    # 4. 获取转发规则
-    service_list = gost_service.get_by_name_like(service_name_like)
-    # 5. 返回结果
+    # 3. 按来源和目标精确查找
+    service_list = gost_config.find_services(from_host, from_port, from_protocol, to_host, to_port, to_protocol)
+    if service_list is None:
+        LOGGER.error("GOST 转发控制 -> 获取配置失败，无法获取转发规则")
+        return None
+    # 4. 返回结果
     LOGGER.info("GOST 转发控制 -> 获取转发规则成功")
     return service_list
 
+def _build_node(name: str,
+                host: str,
+                port: int,
+                protocol: str,
+                auth_username: str = None,
+                auth_password: str = None):
+    """
+    @description: 构建转发目标节点
+    """
+    node = {
+        "name": name,
+        "addr": "{}:{}".format(host, port),
+        "connector": {
+            "type": protocol
+        }
+    }
+    if auth_username is not None and auth_password is not None:
+        node["connector"]["auth"] = {
+            "username": auth_username,
+            "password": auth_password
+        }
+    return node
+
+def _build_port_forward(from_host: str,
+                        from_port: int,
+                        from_protocol: str,
+                        to_host: str,
+                        to_port: int,
+                        to_protocol: str,
+                        base_name: str = None,
+                        from_auth_username: str = None,
+                        from_auth_password: str = None,
+                        to_auth_username: str = None,
+                        to_auth_password: str = None,
+                        is_chained: bool = True):
+    """
+    @description: 构建端口转发的服务和转发链
+    @param {type}
+    is_chained: 是否通过转发链转发（否则服务直接转发）
+    @return: (服务, 转发链)，不通过转发链时转发链为 None
+    """
+    # 1. 修改参数
+    base_name = "port-forward-{}-{}-{}-to-{}-{}-{}".format(from_protocol, from_host, from_port, to_protocol, to_host, to_port) if not base_name else base_name
+    service_name = base_name + "-service"
+    chain_name = base_name + "-chain"
+    hop_name = base_name + "-hop"
+    node_name = base_name + "-node"
+    # 2. 构建节点
+    to_node = _build_node(node_name, to_host, to_port, to_protocol, to_auth_username, to_auth_password)
+    # 3. 构建服务
+    service = {
+        "name": service_name,
+        "addr": "{}:{}".format(from_host, from_port),
+        "handler": {
+            "type": from_protocol,
+            "auth": {}
+        },
+        "listener": {
+            "type": "tcp",
+        },
+    }
+    if from_auth_username is not None and from_auth_password is not None:
+        service["handler"]["auth"] = {
+            "username": from_auth_username,
+            "password": from_auth_password
+        }
+    else:
+        del service["handler"]["auth"]
+    # 4. 构建转发链（转发链模式服务通过 handler.chain 引用转发链，否则服务直接使用转发器）
+    chain = None
+    if is_chained:
+        chain = {
+            "name": chain_name,
+            "hops": [
+                {
+                    "name": hop_name,
+                    "nodes": [to_node]
+                }
+            ]
+        }
+        service["handler"]["chain"] = chain["name"]
+    else:
+        service["forwarder"] = {
+            "nodes": [to_node],
+        }
+    # 5. 返回结果
+    return service, chain
+
 def add_port_forward_service_without_chain(from_host: str,
                                            from_port: int,
                                            from_protocol: str,
@@ -97,57 +205,15 @@ def add_port_forward_service_without_chain(from_host: str,
     if not from_host or not from_port or not from_protocol or not to_host or not to_port or not to_protocol:
         LOGGER.error("GOST 转发控制 -> 参数缺失，无法添加转发规则")
         return False
-    # 3. 修改参数
-    base_name = "port-forward-{}-{}-{}-to-{}-{}-{}".format(from_protocol, from_host, from_port, to_protocol, to_host, to_port) if not base_name else base_name
-    service_name = base_name + "-service"
-    node_name = base_name + "-node"
+    # 3. 构建转发规则
+    service, _ = _build_port_forward(
+        from_host, from_port, from_protocol, to_host, to_port, to_protocol, base_name,
+        from_auth_username, from_auth_password, to_auth_username, to_auth_password, is_chained=False)
     # 4. 检查是否存在
-    if gost_service.is_exist(service_name):
+    if gost_service.is_exist(service["name"]):
         LOGGER.error("GOST 转发控制 -> 转发规则已存在，无法添加")
         return False
-    # 5. 构建转发规则
-    # 5.1 构建节点
-    to_node = {
-        "name": node_name,
-        "addr": "{}:{}".format(to_host, to_port),
-        "connector": {
-            "type": to_protocol,
-            "auth": {}
-        }
-    }
-    if to_auth_username is not None and to_auth_password is not None:
-        to_node["connector"]["auth"] = {
-            "username": to_auth_username,
-            "password": to_auth_password
-        }
-    else:
-        del to_node["connector"]["auth"]
-    # 5.2 构建转发器
-    forwarder = {
-        "nodes": [to_node],
-    }
-    # 5.3 构建服务
-    service = {
-        "name": service_name,
-        "addr": "{}:{}".format(from_host, from_port),
-        "handler": {
-            "type": from_protocol,
-            "auth": {}
-        },
-        "listener": {
-            "type": "tcp",
-        },
-        # 与转发链模式不同的地方
-        "forwarder": forwarder
-    }
-    if from_auth_username is not None and from_auth_password is not None:
-        service["handler"]["auth"] = {
-            "username": from_auth_username,
-            "password": from_auth_password
-        }
-    else:
-        del service["handler"]["auth"]
-    # 6. 添加转发规则（只需要添加服务）
+    # 5. 添加转发规则（只需要添加服务）
     if not gost_service.add(
             name=service["name"],
             addr=service["addr"],
@@ -156,7 +222,7 @@ def add_port_forward_service_without_chain(from_host: str,
             forwarder=service["forwarder"]):
         LOGGER.error("GOST 转发控制 -> 添加转发规则失败")
         return False
-    # 7. 返回结果
+    # 6. 返回结果
     LOGGER.info("GOST 转发控制 -> 添加转发规则成功")
     return True
 
@@ -206,64 +272,14 @@ def add_port_forward_service_with_chain(from_host: str,
     if not from_host or not from_port or not from_protocol or not to_host or not to_port or not to_protocol:
         LOGGER.error("GOST 转发控制 -> 参数缺失，无法添加转发规则")
         return False
-    # 3. 修改参数
-    base_name = "port-forward-{}-{}-{}-to-{}-{}-{}".format(from_protocol, from_host, from_port, to_protocol, to_host, to_port) if not base_name else base_name
-    service_name = base_name + "-service"
-    chain_name = base_name + "-chain"
-    hop_name = base_name + "-hop"
-    node_name = base_name + "-node"
+    # 3. 构建转发规则
+    service, chain = _build_port_forward(
+        from_host, from_port, from_protocol, to_host, to_port, to_protocol, base_name,
+        from_auth_username, from_auth_password, to_auth_username, to_auth_password, is_chained=True)
     # 4. 检查是否存在
-    if gost_service.is_exist(service_name):
+    if gost_service.is_exist(service["name"]):
         LOGGER.error("GOST 转发控制 -> 转发规则已存在，无法添加")
         return False
-    # 5. 构建转发规则
-    # 5.1 构建节点
-    to_node = {
-        "name": node_name,
-        "addr": "{}:{}".format(to_host, to_port),
-        "connector": {
-            "type": to_protocol,
-            "auth": {}
-        }
-    }
-    if to_auth_username is not None and to_auth_password is not None:
-        to_node["connector"]["auth"] = {
-            "username": to_auth_username,
-            "password": to_auth_password
-        }
-    else:
-        del to_node["connector"]["auth"]
-    # 5.2 构建转发链
-    chain = {
-        "name": chain_name,
-        "hops": [
-            {
-                "name": hop_name,
-                "nodes": [to_node]
-            }
-        ]
-    }
-    # 5.3 构建服务
-    service = {
-        "name": service_name,
-        "addr": "{}:{}".format(from_host, from_port),
-        "handler": {
-            "type": from_protocol,
-            "auth": {},
-            # 与非转发链模式不同的地方
-            "chain": chain["name"]
-        },
-        "listener": {
-            "type": "tcp",
-        },
-    }
-    if from_auth_username is not None and from_auth_password is not None:
-        service["handler"]["auth"] = {
-            "username": from_auth_username,
-            "password": from_auth_password
-        }
-    else:
-        del service["handler"]["auth"]
     # 5. 添加转发规则
     # 5.1 添加转发链
     if not gost_chain.add(
@@ -314,3 +330,339 @@ def delete_port_forward_service_with_chain(service_name: str = None):
     # 5. 返回结果
     LOGGER.info("GOST 转发控制 -> 删除转发规则成功")
     return True
+
+def _run_port_forward_tasks(tasks: list, max_workers: int):
+    """
+    @description: 并发执行批量添加、删除的任务，把错误信息写入结果
+    @param {type}
+    tasks: [(结果, 函数, 参数元组), ...]，函数返回错误信息，成功时返回 None
+    """
+    if not tasks:
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_2_result = {executor.submit(function, *args): result for result, function, args in tasks}
+        for future in concurrent.futures.as_completed(future_2_result):
+            result = future_2_result[future]
+            try:
+                message = future.result()
+            except Exception as e:
+                message = str(e)
+            result["message"] = result["message"] or message
+            result["is_success"] = result["message"] is None
+
+def _add_port_forward(service: dict, chain: dict, chain_action: str):
+    """
+    @description: 添加一个端口转发（批量添加时在线程池中执行）
+    @param {type}
+    service: 服务，为 None 时只添加或修改转发链（服务已存在）
+    chain_action: 转发链的操作（add：添加，update：与期望不一致时修改，None：已经一致）
+    @return: 错误信息，成功时返回 None
+    """
+    if chain_action == "add" and not gost_chain.add(name=chain["name"], hops=chain["hops"]):
+        return "添加转发链失败"
+    if chain_action == "update" and not gost_chain.update(name=chain["name"], hops=chain["hops"]):
+        return "修改转发链失败"
+    if service is not None and not gost_service.add(
+            name=service["name"],
+            addr=service["addr"],
+            handler=service["handler"],
+            listener=service["listener"],
+            forwarder=service.get("forwarder")):
+        return "添加服务失败"
+    return None
+
+def add_port_forwards(specs: list, max_workers: int = BULK_MAX_WORKERS):
+    """
+    @description: 批量添加端口转发：只获取一次配置，跳过已存在的服务，添加缺少的、修改不一致的转发链，并发执行
+    @param {type}
+    specs: 端口转发列表，每项为 add_port_forward_service_with_chain 的参数字典，
+           可以额外指定 is_chained（默认为 True，False 时与 add_port_forward_service_without_chain 相同）
+    max_workers: 最大并发数
+    @return: 与 specs 顺序一致的结果列表 [{"name": 服务名称, "is_success": 是否成功, "is_existed": 是否已存在, "message": 错误信息}, ...]，
+             API 状态异常时返回 None
+    """
+    # 1. 获取一次最新配置
+    config_index = gost_config.get_config_index(max_age_seconds=0)
+    if config_index is None:
+        LOGGER.error("GOST 转发控制 -> API 状态异常，无法批量添加转发规则")
+        return None
+    # 2. 构建转发规则，找出需要添加、修改的部分
+    results = []
+    tasks = []
+    name_set = set()
+    chain_name_set = set()
+    for spec in specs:
+        spec = dict(spec)
+        is_chained = spec.pop("is_chained", True)
+        if not all(spec.get(key) for key in ("from_host", "from_port", "from_protocol", "to_host", "to_port", "to_protocol")):
+            results.append({"name": None, "is_success": False, "is_existed": False, "message": "参数缺失"})
+            continue
+        service, chain = _build_port_forward(is_chained=is_chained, **spec)
+        result = {"name": service["name"], "is_success": True, "is_existed": False, "message": None}
+        results.append(result)
+        # 2.1 与前面的项重复
+        if service["name"] in name_set:
+            result["is_existed"] = True
+            continue
+        name_set.add(service["name"])
+        # 2.2 转发链不存在时添加，同名转发链的跳跃点或目标与期望不一致时修改（同一批中只处理一次）
+        chain_action = None
+        if chain and chain["name"] not in chain_name_set:
+            chain_name_set.add(chain["name"])
+            live_chain = config_index["chains"].get(chain["name"])
+            if live_chain is None:
+                chain_action = "add"
+            elif not gost_reconciler.is_matched(chain, live_chain):
+                chain_action = "update"
+        # 2.3 服务已存在时只处理转发链
+        if service["name"] in config_index["services"]:
+            result["is_existed"] = True
+            service = None
+        if service is not None or chain_action is not None:
+            tasks.append((result, _add_port_forward, (service, chain, chain_action)))
+    # 3. 并发添加
+    _run_port_forward_tasks(tasks, max_workers)
+    # 4. 返回结果
+    success_count = sum(1 for result in results if result["is_success"])
+    LOGGER.info("GOST 转发控制 -> 批量添加转发规则完成，成功：%s，失败：%s，新增或修改：%s" % (
+        success_count, len(results) - success_count, len(tasks)))
+    return results
+
+def _delete_port_forward(service_name: str):
+    """
+    @description: 删除一个端口转发的服务（批量删除时在线程池中执行，转发链在服务删除后统一处理）
+    @return: 错误信息，成功时返回 None
+    """
+    if not gost_service.delete(service_name):
+        return "删除服务失败"
+    return None
+
+def _delete_chain(chain_name: str):
+    """
+    @description: 删除一个不再被引用的转发链（批量删除时在线程池中执行）
+    @return: 错误信息，成功时返回 None
+    """
+    if not gost_chain.delete(chain_name):
+        return "删除转发链失败"
+    return None
+
+def delete_port_forwards(names: list, max_workers: int = BULK_MAX_WORKERS):
+    """
+    @description: 批量删除端口转发：只获取一次配置，并发删除服务，再删除不再被其他服务引用的转发链
+    @param {type}
+    names: 服务名称列表
+    max_workers: 最大并发数
+    @return: 与 names 顺序一致的结果列表 [{"name": 服务名称, "is_success": 是否成功, "is_existed": 是否存在, "message": 错误信息}, ...]，
+             API 状态异常时返回 None
+    """
+    # 1. 获取一次最新配置
+    config_index = gost_config.get_config_index(max_age_seconds=0)
+    if config_index is None:
+        LOGGER.error("GOST 转发控制 -> API 状态异常，无法批量删除转发规则")
+        return None
+    # 2. 找出需要删除的服务（不存在的服务视为已删除）
+    results = []
+    tasks = []
+    name_2_result = {}
+    for name in names:
+        service = config_index["services"].get(name)
+        result = {"name": name, "is_success": True, "is_existed": service is not None, "message": None}
+        results.append(result)
+        if service is None or name in name_2_result:
+            continue
+        name_2_result[name] = result
+        tasks.append((result, _delete_port_forward, (name,)))
+    # 3. 并发删除服务
+    _run_port_forward_tasks(tasks, max_workers)
+    # 4. 删除不再被引用的转发链（引用它的服务都已删除，删除失败的服务和不在本批中的服务仍然引用）
+    chain_name_2_results = {}
+    referenced_chain_name_set = set()
+    for name, service in config_index["services"].items():
+        chain_name = (service.get("handler") or {}).get("chain")
+        if not chain_name or chain_name not in config_index["chains"]:
+            continue
+        result = name_2_result.get(name)
+        if result is not None and result["is_success"]:
+            chain_name_2_results.setdefault(chain_name, []).append(result)
+        else:
+            referenced_chain_name_set.add(chain_name)
+    chain_tasks = []
+    for chain_name, chain_results in chain_name_2_results.items():
+        if chain_name in referenced_chain_name_set:
+            continue
+        chain_result = {"is_success": True, "message": None, "results": chain_results}
+        chain_tasks.append((chain_result, _delete_chain, (chain_name,)))
+    _run_port_forward_tasks(chain_tasks, max_workers)
+    # 4.1 转发链删除失败时，引用它的服务都记为失败
+    for chain_result, _, _ in chain_tasks:
+        for result in chain_result["results"]:
+            result["message"] = result["message"] or chain_result["message"]
+            result["is_success"] = result["message"] is None
+    # 5. 返回结果
+    success_count = sum(1 for result in results if result["is_success"])
+    LOGGER.info("GOST 转发控制 -> 批量删除转发规则完成，成功：%s，失败：%s，删除：%s" % (
+        success_count, len(results) - success_count, len(tasks)))
+    return results
+
+def ensure_port_forward(from_host: str,
+                        from_port: int,
+                        from_protocol: str,
+                        to_host: str,
+                        to_port: int,
+                        to_protocol: str,
+                        base_name: str = None,
+                        from_auth_username: str = None,
+                        from_auth_password: str = None,
+                        to_auth_username: str = None,
+                        to_auth_password: str = None,
+                        is_chained: bool = True):
+    """
+    @description: 确保端口转发为期望状态：已经一致时不做任何修改，监听同一地址的其他转发会被删除
+    @return: 是否成功
+    """
+    # 1. 检查参数
+    if not from_host or not from_port or not from_protocol or not to_host or not to_port or not to_protocol:
+        LOGGER.error("GOST 转发控制 -> 参数缺失，无法确保转发规则")
+        return False
+    # 2. 构建期望的转发规则
+    service, chain = _build_port_forward(
+        from_host, from_port, from_protocol, to_host, to_port, to_protocol, base_name,
+        from_auth_username, from_auth_password, to_auth_username, to_auth_password, is_chained)
+    # 3. 删除监听同一地址的其他转发后调和到期望状态
+    return _ensure_port_forward(service, chain)
+
+def _ensure_port_forward(service: dict, chain: dict):
+    """
+    @description: 删除监听同一地址的其他转发，再把服务和转发链调和到期望状态
+    @return: 是否成功
+    """
+    # 1. 删除监听同一地址的其他转发（如上一次使用的代理）
+    config_index = gost_config.get_config_index(max_age_seconds=0)
+    if config_index is None:
+        LOGGER.error("GOST 转发控制 -> API 状态异常，无法确保转发规则")
+        return False
+    stale_names = [name for name, live_service in config_index["services"].items()
+                   if live_service.get("addr") == service["addr"] and name != service["name"]]
+    if stale_names:
+        delete_results = delete_port_forwards(stale_names)
+        if not delete_results or not all(delete_result["is_success"] for delete_result in delete_results):
+            LOGGER.error("GOST 转发控制 -> 删除监听同一地址的转发规则失败")
+            return False
+    # 2. 调和到期望状态（删除会同步写入配置缓存，不需要再次获取配置）
+    result = gost_reconciler.reconcile(
+        {"services": [service], "chains": [chain] if chain else []}, config_index=gost_config.get_config_index())
+    if result is None or result["failed"]:
+        LOGGER.error("GOST 转发控制 -> 确保转发规则失败")
+        return False
+    return True
+
+def _build_balanced_port_forward(from_host: str,
+                                 from_port: int,
+                                 from_protocol: str,
+                                 proxy_strs: list,
+                                 base_name: str = None,
+                                 strategy: str = "round",
+                                 max_fails: int = 1,
+                                 fail_timeout_seconds: int = 30,
+                                 from_auth_username: str = None,
+                                 from_auth_password: str = None):
+    """
+    @description: 构建负载均衡的端口转发：转发链的跳跃点包含多个上游代理节点，由 GOST 按策略选择
+    @return: (服务, 转发链)，代理字符串无法解析时返回 (None, None)
+    """
+    # 1. 解析代理字符串
+    from common import proxy
+    upstream_list = []
+    for proxy_str in proxy_strs:
+        to_host, to_port, to_protocol, to_auth_username, to_auth_password = proxy.parse_proxy_str(proxy_str)
+        if not to_host or not to_port or not to_protocol:
+            LOGGER.error("GOST 转发控制 -> 代理字符串解析失败：{}".format(proxy_str))
+            return None, None
+        upstream_list.append((to_host, to_port, to_protocol, to_auth_username, to_auth_password))
+    # 2. 构建服务和转发链（名称只与监听地址有关，更换上游节点时只修改转发链）
+    base_name = "port-forward-balanced-{}-{}-{}".format(from_protocol, from_host, from_port) if not base_name else base_name
+    to_host, to_port, to_protocol, to_auth_username, to_auth_password = upstream_list[0]
+    service, chain = _build_port_forward(
+        from_host, from_port, from_protocol, to_host, to_port, to_protocol, base_name,
+        from_auth_username, from_auth_password, to_auth_username, to_auth_password, is_chained=True)
+    # 3. 跳跃点改为多个节点，并设置节点选择策略和失败限制
+    hop = chain["hops"][0]
+    hop["nodes"] = [_build_node("{}-node-{}".format(base_name, i), *upstream)
+                    for i, upstream in enumerate(upstream_list)]
+    hop["selector"] = {
+        "strategy": strategy,
+        "maxFails": max_fails,
+        "failTimeout": "{}s".format(fail_timeout_seconds)
+    }
+    # 4. 返回结果
+    return service, chain
+
+def ensure_balanced_port_forward(from_host: str,
+                                 from_port: int,
+                                 from_protocol: str,
+                                 proxy_strs: list,
+                                 base_name: str = None,
+                                 strategy: str = "round",
+                                 max_fails: int = 1,
+                                 fail_timeout_seconds: int = 30,
+                                 from_auth_username: str = None,
+                                 from_auth_password: str = None):
+    """
+    @description: 确保一个本地端口负载均衡地转发到多个上游代理：节点失败 max_fails 次后在 fail_timeout_seconds 秒内不再使用
+    已经一致时不做任何修改，更换上游节点时只修改转发链，监听同一地址的其他转发会被删除
+    @param {type}
+    proxy_strs: 上游代理字符串列表
+    strategy: 节点选择策略，round / random / fifo
+    max_fails: 节点被视为不可用前允许的连续失败次数
+    fail_timeout_seconds: 节点不可用后暂停使用的时间（秒）
+    @return: 是否成功
+    """
+    # 1. 检查参数
+    if not from_host or not from_port or not from_protocol or not proxy_strs:
+        LOGGER.error("GOST 转发控制 -> 参数缺失，无法确保负载均衡转发规则")
+        return False
+    if strategy not in SELECTOR_STRATEGY_LIST:
+        LOGGER.error("GOST 转发控制 -> 不支持的节点选择策略：{}".format(strategy))
+        return False
+    # 2. 构建期望的转发规则
+    service, chain = _build_balanced_port_forward(
+        from_host, from_port, from_protocol, proxy_strs, base_name, strategy, max_fails, fail_timeout_seconds,
+        from_auth_username, from_auth_password)
+    if service is None:
+        return False
+    # 3. 删除监听同一地址的其他转发后调和到期望状态
+    return _ensure_port_forward(service, chain)
+
+def ensure_balanced_port_forward_from_proxy_pool(from_host: str,
+                                                 from_port: int,
+                                                 from_protocol: str,
+                                                 node_count: int = 3,
+                                                 country_code: str = None,
+                                                 scope: str = None,
+                                                 strategy: str = "round",
+                                                 max_fails: int = 1,
+                                                 fail_timeout_seconds: int = 30,
+                                                 from_auth_username: str = None,
+                                                 from_auth_password: str = None):
+    """
+    @description: 从代理池中选择 node_count 个出口 IP 不同的代理，确保负载均衡转发到这些代理
+    @param {type}
+    country_code: 国家代码，不指定时从全部代理中选择
+    scope: 目标网站（域名或网址），指定时跳过在该网站下被禁用的出口 IP
+    @return: 使用的代理字符串列表，失败时返回 None
+    """
+    # 1. 从代理池中选择代理
+    from common import proxy
+    proxy_strs = proxy.get_proxy_strs(node_count, country_code=country_code, is_distinct_exit_ip=True, scope=scope)
+    if not proxy_strs:
+        LOGGER.error("GOST 转发控制 -> 代理池中没有可用代理，无法确保负载均衡转发规则")
+        return None
+    if len(proxy_strs) < node_count:
+        LOGGER.warning("GOST 转发控制 -> 可用代理不足，只使用 {} 个节点".format(len(proxy_strs)))
+    # 2. 确保转发
+    if not ensure_balanced_port_forward(
+            from_host, from_port, from_protocol, proxy_strs, strategy=strategy, max_fails=max_fails,
+            fail_timeout_seconds=fail_timeout_seconds, from_auth_username=from_auth_username,
+            from_auth_password=from_auth_password):
+        return None
+    return proxy_strs
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/gost_async.py
+# @DATE: 2026/10/18
+# @TIME: 19:03:18
+#
+# @DESCRIPTION: GOST 异步客户端
+#   与 gost_service / gost_chain / gost_hop 相同的 is_exist / get / add / update / delete，在同一个事件循环中并发配置多个转发
+#   所有请求共用一个 aiohttp 连接池（aiohttp 只在创建连接池时导入，不使用异步客户端时不需要安装）
+#   与同步模块共用配置缓存（gost_config）和接口耗时统计（gost_requests）
+#   示例：
+#     async with GostAsyncClient() as client:
+#         await asyncio.gather(*[client.service.add(...) for ...])
+
+
+import json
+import time
+import asyncio
+
+from common.logger import LOGGER
+from common.logic import gost_config
+from common.logic import gost_requests
+
+
+# 全局变量
+# 同时使用的最大连接数
+MAX_CONNECTIONS = gost_requests.POOL_MAXSIZE
+# 幂等请求（失败后可以重试）
+IDEMPOTENT_METHOD_SET = {"GET", "PUT", "DELETE"}
+# 需要重试的状态码
+RETRY_STATUS_SET = {502, 503, 504}
+
+
+class GostAsyncClient:
+    """
+    @description: GOST 异步客户端
+    """
+    def __init__(self, max_connections: int = MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self._session = None
+        # 配置缓存过期时只由一个协程重新获取
+        self._config_lock = asyncio.Lock()
+        self.service = AsyncGostService(self)
+        self.chain = AsyncGostChain(self)
+        self.hop = AsyncGostHop(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+            auth = aiohttp.BasicAuth(gost_requests.GOST_AUTH_USERNAME or "", gost_requests.GOST_AUTH_PASSWORD or "")
+            self._session = aiohttp.ClientSession(
+                auth=auth,
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(
+                    connect=gost_requests.CONNECT_TIMEOUT_SECONDS, sock_read=gost_requests.READ_TIMEOUT_SECONDS))
+        return self._session
+
+    async def close(self):
+        """
+        @description: 关闭连接池
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def request(self, method: str, uri_path: str, params: dict = None, data: dict = None) -> dict:
+        """
+        @description: 发送请求，幂等请求在出错和 502 / 503 / 504 时按退避时间重试，POST 只在连接失败时重试
+        @return: 返回结果，失败时返回 None
+        """
+        import aiohttp
+        # 1. 检查配置
+        if not gost_requests.GOST_API_URL:
+            LOGGER.error("GOST 异步请求 -> 配置文件中 GOST URL 为空")
+            return None
+        # 2. 请求（失败时重试）
+        url = "{}/{}".format(gost_requests.GOST_API_URL, uri_path)
+        body = json.dumps(data) if type(data) == dict else data
+        for retry_index in range(gost_requests.RETRY_COUNT + 1):
+            if retry_index:
+                await asyncio.sleep(gost_requests.RETRY_BACKOFF_FACTOR * (2 ** (retry_index - 1)))
+            is_last = retry_index == gost_requests.RETRY_COUNT
+            started_at = time.time()
+            try:
+                async with self._get_session().request(method, url, params=params, data=body) as response:
+                    status = response.status
+                    response_text = await response.text()
+            except aiohttp.ClientConnectorError as e:
+                gost_requests.record_latency(method, uri_path, time.time() - started_at, False)
+                if is_last:
+                    LOGGER.error("GOST 异步请求 -> {} 请求出错: {}".format(method, e))
+                    return None
+                continue
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                gost_requests.record_latency(method, uri_path, time.time() - started_at, False)
+                if is_last or method not in IDEMPOTENT_METHOD_SET:
+                    LOGGER.error("GOST 异步请求 -> {} 请求出错: {}".format(method, e))
+                    return None
+                continue
+            gost_requests.record_latency(method, uri_path, time.time() - started_at, status == 200)
+            if status in RETRY_STATUS_SET and method in IDEMPOTENT_METHOD_SET and not is_last:
+                continue
+            break
+        # 3. 检验返回值
+        if status != 200:
+            LOGGER.error("GOST 异步请求 -> {} 请求失败，状态码: {}".format(method, status))
+            LOGGER.error("GOST 异步请求 -> {} 请求失败，响应内容: {}".format(method, response_text))
+            return None
+        try:
+            return json.loads(response_text)
+        except ValueError as e:
+            LOGGER.error("GOST 异步请求 -> {} 请求返回的不是 JSON: {}".format(method, e))
+            return None
+
+    async def get_config(self):
+        """
+        @description: 获取 GOST 配置（每次都请求，成功后同时更新配置缓存）
+        """
+        response_json = await self.request("GET", "api/config")
+        if not response_json or not response_json.get("api"):
+            LOGGER.error("GOST 异步配置 -> 获取配置失败")
+            return None
+        gost_config.save_config_index(response_json)
+        return response_json
+
+    async def get_config_index(self, max_age_seconds: float = None):
+        """
+        @description: 获取配置索引，超过有效期时重新获取（并发调用时只请求一次）
+        @return: 配置索引，获取配置失败时返回 None
+        """
+        config_index = gost_config.get_cached_config_index(max_age_seconds)
+        if config_index is not None:
+            return config_index
+        async with self._config_lock:
+            # 等待期间可能已经由其他协程获取
+            config_index = gost_config.get_cached_config_index(max_age_seconds)
+            if config_index is None and await self.get_config():
+                config_index = gost_config.CONFIG_INDEX
+        return config_index
+
+
+class _AsyncGostSection:
+    """
+    @description: 服务、转发链、跳跃点的共通操作
+    """
+    # 配置项名称（gost_config 中的 section 和 API 路径）与日志名称
+    section = None
+    label = None
+
+    def __init__(self, client: GostAsyncClient):
+        self.client = client
+
+    async def is_exist(self, name: str) -> bool:
+        """
+        @description: 检查是否存在（有缓存时不请求）
+        """
+        config_index = await self.client.get_config_index()
+        if config_index is None:
+            LOGGER.error("GOST {} 存在判断 -> 获取配置失败".format(self.label))
+            return False
+        return name in config_index[self.section]
+
+    async def get(self, name: str):
+        """
+        @description: 按名称获取（有缓存时不请求）
+        """
+        if not name:
+            LOGGER.error("GOST {} 获取 -> 名称不能为空".format(self.label))
+            return None
+        config_index = await self.client.get_config_index()
+        if config_index is None:
+            LOGGER.error("GOST {} 获取 -> 获取配置失败".format(self.label))
+            return None
+        return config_index[self.section].get(name)
+
+    async def _add(self, item: dict) -> bool:
+        if await self.is_exist(item["name"]):
+            LOGGER.error("GOST {} 新增 -> 已存在，无法添加".format(self.label))
+            return False
+        if not await self.client.request("POST", "api/config/{}".format(self.section), data=item):
+            LOGGER.error("GOST {} 新增 -> 添加失败".format(self.label))
+            gost_config.invalidate()
+            return False
+        gost_config.put_item(self.section, item)
+        return True
+
+    async def _update(self, item: dict) -> bool:
+        if not await self.is_exist(item["name"]):
+            LOGGER.error("GOST {} 更新 -> 不存在，无法更新".format(self.label))
+            return False
+        if not await self.client.request("PUT", "api/config/{}/{}".format(self.section, item["name"]), data=item):
+            LOGGER.error("GOST {} 更新 -> 更新失败".format(self.label))
+            gost_config.invalidate()
+            return False
+        gost_config.put_item(self.section, item)
+        return True
+
+    async def delete(self, name: str) -> bool:
+        """
+        @description: 删除
+        """
+        if not name:
+            LOGGER.error("GOST {} 删除 -> 名称不能为空".format(self.label))
+            return False
+        if not await self.is_exist(name):
+            LOGGER.error("GOST {} 删除 -> 不存在，无法删除".format(self.label))
+            return False
+        if not await self.client.request("DELETE", "api/config/{}/{}".format(self.section, name)):
+            LOGGER.error("GOST {} 删除 -> 删除失败".format(self.label))
+            gost_config.invalidate()
+            return False
+        gost_config.remove_item(self.section, name)
+        return True
+
+
+class AsyncGostService(_AsyncGostSection):
+    """
+    @description: 服务，参数与 gost_service 相同
+    """
+    section = "services"
+    label = "Service"
+
+    async def get_by_name_like(self, name_like: str):
+        """
+        @description: 获取名称包含 name_like 的服务
+        """
+        if not name_like:
+            LOGGER.error("GOST Service 获取 -> 服务名称不能为空")
+            return None
+        config_index = await self.client.get_config_index()
+        if config_index is None:
+            LOGGER.error("GOST Service 获取 -> 获取配置失败")
+            return None
+        return [service for name, service in config_index["services"].items() if name and name_like in name]
+
+    async def add(self, name: str, addr: str, handler: dict, listener: dict, forwarder: dict) -> bool:
+        if not name or not addr:
+            LOGGER.error("GOST Service 新增 -> 服务名称和地址不能为空")
+            return False
+        return await self._add({"name": name, "addr": addr, "handler": handler, "listener": listener, "forwarder": forwarder})
+
+    async def update(self, name: str, addr: str, handler: dict, listener: dict, forwarder: dict) -> bool:
+        if not name or not addr:
+            LOGGER.error("GOST Service 修改 -> 服务名称和地址不能为空")
+            return False
+        return await self._update({"name": name, "addr": addr, "handler": handler, "listener": listener, "forwarder": forwarder})
+
+
+class AsyncGostChain(_AsyncGostSection):
+    """
+    @description: 转发链，参数与 gost_chain 相同
+    """
+    section = "chains"
+    label = "Chain"
+
+    async def add(self, name: str, hops: list) -> bool:
+        if not name or not hops:
+            LOGGER.error("GOST Chain 新增 -> 转发链名称和跳跃点列表不能为空")
+            return False
+        return await self._add({"name": name, "hops": hops})
+
+    async def update(self, name: str, hops: list) -> bool:
+        if not name or not hops:
+            LOGGER.error("GOST Chain 更新 -> 转发链名称和跳跃点列表不能为空")
+            return False
+        return await self._update({"name": name, "hops": hops})
+
+
+class AsyncGostHop(_AsyncGostSection):
+    """
+    @description: 跳跃点，参数与 gost_hop 相同
+    """
+    section = "hops"
+    label = "Hop"
+
+    async def add(self, name: str, nodes: list) -> bool:
+        if not name or not nodes:
+            LOGGER.error("GOST Hop 新增 -> 跳跃点名称和节点列表不能为空")
+            return False
+        return await self._add({"name": name, "nodes": nodes})
+
+    async def update(self, name: str, nodes: list) -> bool:
+        if not name or not nodes:
+            LOGGER.error("GOST Hop 更新 -> 跳跃点名称和节点列表不能为空")
+            return False
+        return await self._update({"name": name, "nodes": nodes})
@@ -21,18 +21,13 @@ def is_exist(name: str) -> bool:
     :param name: 转发链名称
     :return: 是否存在
     """
-    # 1. 获取全部配置
-    config = gost_config.get_config()
-    if not config:
+    # 1. 获取配置索引（有缓存时不请求）
+    config_index = gost_config.get_config_index()
+    if config_index is None:
         LOGGER.error("GOST Chain 存在判断 -> 获取配置失败")
         return False
-    # 2. 获取转发链列表
-    services = config.get("chains", []) or []
-    # 3. 检查转发链是否存在
-    for service in services:
-        if service.get("name") == name:
-            return True
-    return False
+    # 2. 检查转发链是否存在
+    return name in config_index["chains"]
 
 def add(name: str,
         hops: list):
@@ -57,11 +52,14 @@ def add(name: str,
     }
     # 4. 添加转发链
     response_json = gost_requests.post("api/config/chains", data=chain)
-    # 5. 检验返回值
+    # 5. 检验返回值（失败时缓存可能已经过时，清空后重新获取）
     if not response_json:
         LOGGER.error("GOST Chain 新增 -> 添加转发链失败")
+        gost_config.invalidate()
         return False
-    # 6. 返回结果
+    # 6. 写入缓存
+    gost_config.put_item("chains", chain)
+    # 7. 返回结果
     return True
 
 def update(name: str,
@@ -90,8 +88,11 @@ def update(name: str,
     # 5. 检验返回值
     if not response_json:
         LOGGER.error("GOST Chain 更新 -> 更新转发链失败")
+        gost_config.invalidate()
         return False
-    # 6. 返回结果
+    # 6. 写入缓存
+    gost_config.put_item("chains", chain)
+    # 7. 返回结果
     return True
 
 def delete(name: str):
@@ -111,6 +112,9 @@ def delete(name: str):
     # 4. 检验返回值
     if not response_json:
         LOGGER.error("GOST Chain 删除 -> 删除转发链失败")
+        gost_config.invalidate()
         return False
-    # 5. 返回结果
+    # 5. 从缓存中移除
+    gost_config.remove_item("chains", name)
+    # 6. 返回结果
     return True
\ No newline at end of file
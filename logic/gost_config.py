@@ -7,16 +7,49 @@
 # @TIME: 22:10:45
 #
 # @DESCRIPTION: 配置文件逻辑
+#   配置缓存：按名称索引服务、转发链、跳跃点，存在判断和按名称获取不需要再请求 /api/config
+#   本进程的新增、修改、删除成功后直接写入缓存，写入失败时清空缓存；超过 TTL 后重新获取（其他进程的修改在 TTL 内不可见）
+#   配置索引发布后不再修改：写入缓存时复制涉及的字典（名称集合也替换为新集合）后整体替换，读取和遍历不需要加锁
+#   端口转发服务另外按 (from_protocol, from_host, from_port, to_protocol, to_host, to_port) 建立索引，
+#   并按 (from_host, from_port)、(to_host, to_port) 建立二级索引，查找时精确匹配
 
 
+import re
+import time
+import threading
+
 from common.config import CONFIG
 from common.logger import LOGGER
 from common.logic import gost_requests
 
 
+# 全局变量
+# 缓存的有效期（秒）
+CONFIG_CACHE_TTL_SECONDS = CONFIG["gost"].get("config_cache_ttl_seconds", 5)
+# 建立索引的配置项
+SECTION_LIST = ["services", "chains", "hops"]
+# 端口转发服务名称（gost._build_port_forward 生成的名称）
+SERVICE_NAME_PATTERN = re.compile(
+    r"^port-forward-(?P<from_protocol>[^-]+)-(?P<from_host>.+)-(?P<from_port>\d+)"
+    r"-to-(?P<to_protocol>[^-]+)-(?P<to_host>.+)-(?P<to_port>\d+)-service$")
+# 配置索引，发布后不再修改，每次写入都整体替换，读取时不需要加锁
+#   格式：{"services": {$name: $service, ...}, "chains": {$name: $chain, ...}, "hops": {$name: $hop, ...},
+#          "service_keys": {$name: ($from_protocol, $from_host, $from_port, $to_protocol, $to_host, $to_port), ...},
+#          "key_2_names": {$key: {$name, ...}, ...},
+#          "from_2_names": {($from_host, $from_port): {$name, ...}, ...},
+#          "to_2_names": {($to_host, $to_port): {$name, ...}, ...}}
+CONFIG_INDEX = None
+# 配置索引的构建时间
+CONFIG_INDEXED_AT = 0
+# 替换配置索引时使用的锁（写入之间互斥，读取不需要）
+CONFIG_INDEX_LOCK = threading.RLock()
+# 端口转发服务的索引
+SERVICE_INDEX_NAME_LIST = ["service_keys", "key_2_names", "from_2_names", "to_2_names"]
+
+
 def get_config():
     """
-    @description: 获取 GOST 配置
+    @description: 获取 GOST 配置（每次都请求，成功后同时更新配置缓存）
     """
     # 1. 请求
     response_json = gost_requests.get("api/config")
@@ -27,5 +60,196 @@ def get_config():
     if "api" not in response_json or not response_json["api"]:
         LOGGER.error("GOST 配置 -> 获取配置失败，api 字段不存在或为空")
         return None
-    # 3. 返回结果
-    return response_json
\ No newline at end of file
+    # 3. 更新配置缓存
+    save_config_index(response_json)
+    # 4. 返回结果
+    return response_json
+
+def save_config_index(config: dict):
+    """
+    @description: 按名称建立索引并替换
+    """
+    global CONFIG_INDEX
+    global CONFIG_INDEXED_AT
+    config_index = {"service_keys": {}, "key_2_names": {}, "from_2_names": {}, "to_2_names": {}}
+    for section in SECTION_LIST:
+        config_index[section] = {item.get("name"): item for item in (config.get(section, []) or [])}
+    for service in config_index["services"].values():
+        _index_service(config_index, service)
+    with CONFIG_INDEX_LOCK:
+        CONFIG_INDEX = config_index
+        CONFIG_INDEXED_AT = time.time()
+
+def parse_service_key(service: dict, name_2_chain: dict = None):
+    """
+    @description: 解析端口转发服务的 (from_protocol, from_host, from_port, to_protocol, to_host, to_port)
+    优先按名称解析，名称不是默认格式时按服务地址和第一个节点（直接转发的转发器或转发链的第一个跳跃点）解析
+    @return: 元组，无法解析时返回 None
+    """
+    # 1. 按名称解析
+    match = SERVICE_NAME_PATTERN.match(service.get("name") or "")
+    if match:
+        return (match.group("from_protocol"), match.group("from_host"), int(match.group("from_port")),
+                match.group("to_protocol"), match.group("to_host"), int(match.group("to_port")))
+    # 2. 按结构解析
+    try:
+        from_host, from_port = service["addr"].rsplit(":", 1)
+        handler = service.get("handler") or {}
+        nodes = (service.get("forwarder") or {}).get("nodes") or []
+        if not nodes and name_2_chain and handler.get("chain") in name_2_chain:
+            hops = name_2_chain[handler["chain"]].get("hops") or []
+            nodes = (hops[0].get("nodes") or []) if hops else []
+        if not nodes:
+            return None
+        to_host, to_port = nodes[0]["addr"].rsplit(":", 1)
+        return (handler.get("type"), from_host, int(from_port),
+                (nodes[0].get("connector") or {}).get("type"), to_host, int(to_port))
+    except (KeyError, ValueError, AttributeError, TypeError):
+        return None
+
+def _index_service(config_index: dict, service: dict):
+    # 名称集合不就地修改，已发布的索引中的集合保持不变
+    key = parse_service_key(service, config_index["chains"])
+    if key is None:
+        return
+    name = service.get("name")
+    config_index["service_keys"][name] = key
+    for index_name, index_key in (("key_2_names", key), ("from_2_names", (key[1], key[2])), ("to_2_names", (key[4], key[5]))):
+        config_index[index_name][index_key] = config_index[index_name].get(index_key, frozenset()) | {name}
+
+def _unindex_service(config_index: dict, name: str):
+    key = config_index["service_keys"].pop(name, None)
+    if key is None:
+        return
+    for index_name, index_key in (("key_2_names", key), ("from_2_names", (key[1], key[2])), ("to_2_names", (key[4], key[5]))):
+        names = config_index[index_name].get(index_key)
+        if names is None:
+            continue
+        names = names - {name}
+        if names:
+            config_index[index_name][index_key] = names
+        else:
+            del config_index[index_name][index_key]
+
+def _copy_config_index(section: str) -> dict:
+    """
+    @description: 复制当前配置索引中需要修改的字典（需要持有 CONFIG_INDEX_LOCK，缓存未建立时返回 None）
+    """
+    if CONFIG_INDEX is None:
+        return None
+    config_index = dict(CONFIG_INDEX)
+    for index_name in [section] + (SERVICE_INDEX_NAME_LIST if section == "services" else []):
+        config_index[index_name] = dict(config_index[index_name])
+    return config_index
+
+def find_services(from_host: str = None,
+                  from_port: int = None,
+                  from_protocol: str = None,
+                  to_host: str = None,
+                  to_port: int = None,
+                  to_protocol: str = None):
+    """
+    @description: 按转发的来源和目标精确查找端口转发服务（至少需要 from_host + from_port 或 to_host + to_port）
+    @return: 服务列表，获取配置失败时返回 None
+    """
+    config_index = get_config_index()
+    if config_index is None:
+        return None
+    # 1. 全部条件都指定时直接按完整的键查找
+    if from_protocol and from_host and from_port and to_protocol and to_host and to_port:
+        names = config_index["key_2_names"].get(
+            (from_protocol, from_host, int(from_port), to_protocol, to_host, int(to_port)), set())
+    # 2. 否则按二级索引查找后过滤
+    else:
+        names = None
+        if from_host and from_port:
+            names = config_index["from_2_names"].get((from_host, int(from_port)), set())
+        if to_host and to_port:
+            to_names = config_index["to_2_names"].get((to_host, int(to_port)), set())
+            names = to_names if names is None else names & to_names
+        names = [name for name in (names or ()) if
+                 (not from_protocol or config_index["service_keys"][name][0] == from_protocol)
+                 and (not to_protocol or config_index["service_keys"][name][3] == to_protocol)]
+    return [config_index["services"][name] for name in sorted(names) if name in config_index["services"]]
+
+def get_cached_config_index(max_age_seconds: float = None):
+    """
+    @description: 获取有效期内的配置索引（不请求）
+    @return: 配置索引，没有缓存或已过期时返回 None
+    """
+    max_age_seconds = CONFIG_CACHE_TTL_SECONDS if max_age_seconds is None else max_age_seconds
+    config_index = CONFIG_INDEX
+    if config_index is None or time.time() - CONFIG_INDEXED_AT >= max_age_seconds:
+        return None
+    return config_index
+
+def get_config_index(max_age_seconds: float = None):
+    """
+    @description: 获取配置索引，超过有效期时重新获取配置
+    @param {type}
+    max_age_seconds: 缓存的最长使用时间（秒），默认为 CONFIG_CACHE_TTL_SECONDS，0 为强制重新获取
+    @return: 配置索引，获取配置失败时返回 None
+    """
+    config_index = get_cached_config_index(max_age_seconds)
+    if config_index is None:
+        if not get_config():
+            return None
+        config_index = CONFIG_INDEX
+    return config_index
+
+def get_item(section: str, name: str):
+    """
+    @description: 按名称获取配置项（服务、转发链、跳跃点）
+    @return: 配置项，不存在或获取配置失败时返回 None
+    """
+    config_index = get_config_index()
+    if config_index is None:
+        return None
+    return config_index[section].get(name)
+
+def get_items(section: str):
+    """
+    @description: 获取全部配置项
+    @return: 配置项列表，获取配置失败时返回 None
+    """
+    config_index = get_config_index()
+    if config_index is None:
+        return None
+    return list(config_index[section].values())
+
+def put_item(section: str, item: dict):
+    """
+    @description: 新增或修改成功后写入缓存（复制后替换，缓存未建立时忽略）
+    """
+    global CONFIG_INDEX
+    with CONFIG_INDEX_LOCK:
+        config_index = _copy_config_index(section)
+        if config_index is None:
+            return
+        config_index[section][item["name"]] = item
+        if section == "services":
+            _unindex_service(config_index, item["name"])
+            _index_service(config_index, item)
+        CONFIG_INDEX = config_index
+
+def remove_item(section: str, name: str):
+    """
+    @description: 删除成功后从缓存中移除（复制后替换）
+    """
+    global CONFIG_INDEX
+    with CONFIG_INDEX_LOCK:
+        config_index = _copy_config_index(section)
+        if config_index is None or name not in config_index[section]:
+            return
+        del config_index[section][name]
+        if section == "services":
+            _unindex_service(config_index, name)
+        CONFIG_INDEX = config_index
+
+def invalidate():
+    """
+    @description: 清空配置缓存，下次使用时重新获取（写入失败或其他进程修改了配置时调用）
+    """
+    global CONFIG_INDEX
+    with CONFIG_INDEX_LOCK:
+        CONFIG_INDEX = None
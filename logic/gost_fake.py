@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/gost_fake.py
+# @DATE: 2026/10/18
+# @TIME: 20:12:08
+#
+# @DESCRIPTION: 本地模拟的 GOST v3 配置 API（只使用标准库，在后台线程中运行）
+#   支持 GET /api/config，以及 services / chains / hops 的 POST（新增）、PUT（修改）、DELETE（删除）
+#   名称重复、不存在、认证失败时返回与 GOST 相同的状态码；可以设置每个请求的延迟以模拟远程 GOST
+#   只保存配置，不会真正监听端口或转发
+#   压测 common.gost 每秒可以配置多少个端口转发见 scripts/bench_gost.py
+
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common.logger import LOGGER
+
+
+# 全局变量
+# 支持增删改的配置项
+SECTION_LIST = ["services", "chains", "hops"]
+# 返回内容
+RESPONSE_OK = {"msg": "OK"}
+RESPONSE_DUPLICATED = {"code": 40002, "msg": "object duplicated"}
+RESPONSE_NOT_FOUND = {"code": 40004, "msg": "object not found"}
+RESPONSE_INVALID = {"code": 40001, "msg": "invalid request"}
+RESPONSE_UNAUTHORIZED = {"code": 40101, "msg": "Unauthorized"}
+
+
+class _FakeGostHandler(BaseHTTPRequestHandler):
+    # 保持长连接（与 gost_requests 的连接池配合），头部和内容分开写入时不等待 ACK
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return None
+
+    def _handle(self, method: str):
+        fake_server = self.server.fake_server
+        body = self._read_body() if method in ("POST", "PUT") else None
+        if fake_server.latency_seconds:
+            time.sleep(fake_server.latency_seconds)
+        # 1. 认证
+        if not fake_server.is_authorized(self.headers.get("Authorization")):
+            self._send(401, RESPONSE_UNAUTHORIZED)
+            return
+        # 2. 解析路径：api/config[/$section[/$name]]
+        path_parts = self.path.split("?", 1)[0].strip("/").split("/")
+        if path_parts[:2] != ["api", "config"] or len(path_parts) > 4:
+            self._send(404, RESPONSE_NOT_FOUND)
+            return
+        section = path_parts[2] if len(path_parts) > 2 else None
+        name = path_parts[3] if len(path_parts) > 3 else None
+        if section is not None and section not in SECTION_LIST:
+            self._send(404, RESPONSE_NOT_FOUND)
+            return
+        # 3. 处理
+        status, response = fake_server.handle(method, section, name, body)
+        self._send(status, response)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+class FakeGostServer:
+    """
+    @description: 本地模拟的 GOST 配置 API
+    示例：
+        with FakeGostServer() as fake_server:
+            gost_requests.GOST_API_URL = fake_server.url
+    """
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 auth_username: str = None,
+                 auth_password: str = None,
+                 latency_seconds: float = 0):
+        """
+        @description: 初始化（port 为 0 时自动选择空闲端口）
+        @param {type}
+        auth_username: 认证用户名，与 auth_password 都指定时要求 Basic 认证
+        latency_seconds: 每个请求的延迟（秒）
+        """
+        self.host = host
+        self.port = port
+        self.auth_username = auth_username
+        self.auth_password = auth_password
+        self.latency_seconds = latency_seconds
+        self._lock = threading.Lock()
+        # 格式：{"services": {$name: $service, ...}, ...}（按插入顺序返回）
+        self._section_2_items = {section: {} for section in SECTION_LIST}
+        # 按方法统计的请求次数
+        self.method_2_count = {}
+        self._httpd = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        return "http://{}:{}".format(self.host, self.port)
+
+    def start(self):
+        """
+        @description: 在后台线程中启动
+        """
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _FakeGostHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake_server = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake_gost", daemon=True)
+        self._thread.start()
+        LOGGER.info("GOST 模拟 API -> 启动：{}".format(self.url))
+
+    def stop(self):
+        """
+        @description: 停止
+        """
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+        self._httpd = None
+        self._thread = None
+
+    def is_authorized(self, authorization: str) -> bool:
+        if self.auth_username is None or self.auth_password is None:
+            return True
+        import base64
+        expected = "Basic " + base64.b64encode("{}:{}".format(self.auth_username, self.auth_password).encode()).decode()
+        return authorization == expected
+
+    def get_config(self) -> dict:
+        """
+        @description: 获取当前配置（与 GET /api/config 的返回值相同）
+        """
+        with self._lock:
+            config = {"api": {"addr": "{}:{}".format(self.host, self.port)}}
+            for section, name_2_item in self._section_2_items.items():
+                if name_2_item:
+                    config[section] = [json.loads(json.dumps(item)) for item in name_2_item.values()]
+            return config
+
+    def reset(self):
+        """
+        @description: 清空配置和请求统计
+        """
+        with self._lock:
+            self._section_2_items = {section: {} for section in SECTION_LIST}
+            self.method_2_count = {}
+
+    def handle(self, method: str, section: str, name: str, body):
+        """
+        @description: 处理一个请求
+        @return: (状态码, 返回内容)
+        """
+        with self._lock:
+            self.method_2_count[method] = self.method_2_count.get(method, 0) + 1
+        # 1. 获取配置
+        if section is None:
+            if method != "GET":
+                return 405, RESPONSE_INVALID
+            return 200, self.get_config()
+        with self._lock:
+            name_2_item = self._section_2_items[section]
+            # 2. 新增
+            if method == "POST" and name is None:
+                if not isinstance(body, dict) or not body.get("name"):
+                    return 400, RESPONSE_INVALID
+                if body["name"] in name_2_item:
+                    return 400, RESPONSE_DUPLICATED
+                name_2_item[body["name"]] = body
+                return 200, RESPONSE_OK
+            # 3. 修改（名称以路径为准）
+            if method == "PUT" and name is not None:
+                if not isinstance(body, dict):
+                    return 400, RESPONSE_INVALID
+                if name not in name_2_item:
+                    return 404, RESPONSE_NOT_FOUND
+                body["name"] = name
+                name_2_item[name] = body
+                return 200, RESPONSE_OK
+            # 4. 删除
+            if method == "DELETE" and name is not None:
+                if name_2_item.pop(name, None) is None:
+                    return 404, RESPONSE_NOT_FOUND
+                return 200, RESPONSE_OK
+        return 405, RESPONSE_INVALID
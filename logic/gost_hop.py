@@ -21,18 +21,13 @@ def is_exist(name: str) -> bool:
     :param name: 跳跃点名称
     :return: 是否存在
     """
-    # 1. 获取全部配置
-    config = gost_config.get_config()
-    if not config:
+    # 1. 获取配置索引（有缓存时不请求）
+    config_index = gost_config.get_config_index()
+    if config_index is None:
         LOGGER.error("GOST Hop 存在判断 -> 获取配置失败")
         return False
-    # 2. 获取跳跃点列表
-    services = config.get("hops", []) or []
-    # 3. 检查跳跃点是否存在
-    for service in services:
-        if service.get("name") == name:
-            return True
-    return False
+    # 2. 检查跳跃点是否存在
+    return name in config_index["hops"]
 
 def add(name: str,
         nodes: list):
@@ -57,11 +52,14 @@ def add(name: str,
     }
     # 4. 添加跳跃点
     response_json = gost_requests.post("api/config/hops", data=hop)
-    # 5. 检验返回值
+    # 5. 检验返回值（失败时缓存可能已经过时，清空后重新获取）
     if not response_json:
         LOGGER.error("GOST Hop 新增 -> 添加跳跃点失败")
+        gost_config.invalidate()
         return False
-    # 6. 返回结果
+    # 6. 写入缓存
+    gost_config.put_item("hops", hop)
+    # 7. 返回结果
     return True
 
 def update(name: str,
@@ -90,8 +88,11 @@ def update(name: str,
      # 5. 检验返回值
      if not response_json:
           LOGGER.error("GOST Hop 更新 -> 更新跳跃点失败")
+          gost_config.invalidate()
           return False
-     # 6. 返回结果
+     # 6. 写入缓存
+     gost_config.put_item("hops", hop)
+     # 7. 返回结果
      return True
 
 def delete(name: str):
@@ -107,6 +108,9 @@ def delete(name: str):
     # 3. 检验返回值
     if not response_json:
         LOGGER.error("GOST Hop 删除 -> 删除跳跃点失败")
+        gost_config.invalidate()
         return False
-    # 4. 返回结果
+    # 4. 从缓存中移除
+    gost_config.remove_item("hops", name)
+    # 5. 返回结果
     return True
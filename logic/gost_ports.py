@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/gost_ports.py
+# @DATE: 2026/10/18
+# @TIME: 19:36:52
+#
+# @DESCRIPTION: GOST 监听端口分配逻辑
+#   在配置的端口范围内分配空闲端口，第一次使用时把当前 GOST 配置中已监听的端口标记为已使用（在 Redis 中分配时还会读取 Redis 中已分配的端口和 key）
+#   位图每个字节对应 8 个端口，另用一个整数标记还有空闲端口的字节，分配和释放均为 O(1)
+#   指定 key 分配时同一个 key 总是得到同一个端口（如同一个浏览器环境每次启动使用同一个端口）
+#   按 key 分配的端口，转发的 base_name 应使用同一个 key（服务名称为 "{key}-service"），
+#   进程重启后按服务名称恢复 key 与端口的对应关系，同一个 key 仍然得到原来的端口
+#   同一台主机上有多个控制进程时可以改为在 Redis 中分配（LUA 脚本保证原子性）：
+#     common:gost_ports:{GOST 主机}:bitmap    位图，第 n 位对应 起始端口 + n
+#     common:gost_ports:{GOST 主机}:keys      Hash，key -> 端口
+
+
+import threading
+
+from common.config import CONFIG
+from common.logger import LOGGER
+from common.logic import gost_config
+
+
+# 全局变量
+# 分配的端口范围（包含两端）
+PORT_RANGE_START = CONFIG["gost"].get("port_range_start", 20000)
+PORT_RANGE_END = CONFIG["gost"].get("port_range_end", 29999)
+# 是否在 Redis 中分配（多个控制进程共用 GOST 时开启）
+IS_PORT_REDIS = CONFIG["gost"].get("is_port_redis", False)
+# Redis 使用的数据库和键
+REDIS_DB = CONFIG["gost"].get("redis_db", CONFIG["redis"]["db"])
+PORT_REDIS_KEY_PREFIX = "common:gost_ports:{}".format(CONFIG["gost"]["host"])
+# 在 Redis 中分配端口的 LUA 脚本（返回偏移量，没有空闲端口时返回 -1）
+ALLOCATE_LUA_SCRIPT = """
+if ARGV[2] ~= '' then
+    local offset = redis.call('hget', KEYS[2], ARGV[2])
+    if offset then
+        return tonumber(offset)
+    end
+end
+local offset = redis.call('bitpos', KEYS[1], 0)
+if offset < 0 or offset >= tonumber(ARGV[1]) then
+    return -1
+end
+redis.call('setbit', KEYS[1], offset, 1)
+if ARGV[2] ~= '' then
+    redis.call('hset', KEYS[2], ARGV[2], offset)
+end
+return offset
+"""
+# 在 Redis 中释放端口的 LUA 脚本
+FREE_LUA_SCRIPT = """
+redis.call('setbit', KEYS[1], ARGV[1], 0)
+if ARGV[2] ~= '' and redis.call('hget', KEYS[2], ARGV[2]) == ARGV[1] then
+    redis.call('hdel', KEYS[2], ARGV[2])
+end
+return 1
+"""
+# 读取 Redis 位图中已使用的偏移量的 LUA 脚本（位图是二进制数据，连接开启 decode_responses 时不能直接 GET）
+LOAD_LUA_SCRIPT = """
+local bitmap = redis.call('get', KEYS[1])
+local offsets = {}
+if not bitmap then
+    return offsets
+end
+for byte_index = 1, #bitmap do
+    local byte = string.byte(bitmap, byte_index)
+    if byte > 0 then
+        for bit_index = 0, 7 do
+            if math.floor(byte / 2 ^ (7 - bit_index)) % 2 == 1 then
+                table.insert(offsets, (byte_index - 1) * 8 + bit_index)
+            end
+        end
+    end
+end
+return offsets
+"""
+# 服务名称的后缀（gost._build_port_forward 生成的名称），去掉后缀即为分配端口时的 key
+SERVICE_NAME_SUFFIX = "-service"
+# 本进程的端口分配器，第一次使用时创建
+ALLOCATOR = None
+ALLOCATOR_LOCK = threading.Lock()
+
+
+class PortAllocator:
+    """
+    @description: 端口范围内的位图分配器（线程安全）
+    """
+    def __init__(self, start_port: int = PORT_RANGE_START, end_port: int = PORT_RANGE_END):
+        if start_port > end_port:
+            raise ValueError("起始端口不能大于结束端口")
+        self.start_port = start_port
+        self.end_port = end_port
+        self._lock = threading.Lock()
+        size = end_port - start_port + 1
+        # 位图，1 为已使用；最后一个字节中超出范围的位预先置为 1
+        self._bitmap = bytearray((size + 7) // 8)
+        if size % 8:
+            self._bitmap[-1] = 0xFF & ~((1 << (size % 8)) - 1)
+        # 第 n 位为 1 表示第 n 个字节中还有空闲端口
+        self._free_byte_mask = (1 << len(self._bitmap)) - 1
+        self._used_count = 0
+        # 按 key 分配的端口
+        self._key_2_port = {}
+        self._port_2_key = {}
+
+    def __len__(self):
+        return self._used_count
+
+    def __contains__(self, port):
+        return self.start_port <= port <= self.end_port and self._is_set(port - self.start_port)
+
+    def _is_set(self, offset: int) -> bool:
+        return bool(self._bitmap[offset >> 3] & (1 << (offset & 7)))
+
+    def _set(self, offset: int):
+        byte_index = offset >> 3
+        self._bitmap[byte_index] |= 1 << (offset & 7)
+        if self._bitmap[byte_index] == 0xFF:
+            self._free_byte_mask &= ~(1 << byte_index)
+        self._used_count += 1
+
+    def _clear(self, offset: int):
+        byte_index = offset >> 3
+        self._bitmap[byte_index] &= ~(1 << (offset & 7))
+        self._free_byte_mask |= 1 << byte_index
+        self._used_count -= 1
+
+    def allocate(self, key: str = None):
+        """
+        @description: 分配一个空闲端口（指定 key 且已经分配过时返回同一个端口）
+        @return: 端口，没有空闲端口时返回 None
+        """
+        with self._lock:
+            if key is not None and key in self._key_2_port:
+                return self._key_2_port[key]
+            if not self._free_byte_mask:
+                return None
+            # 最低位的有空闲端口的字节，以及该字节中最低位的 0
+            byte_index = (self._free_byte_mask & -self._free_byte_mask).bit_length() - 1
+            byte = self._bitmap[byte_index]
+            offset = (byte_index << 3) + (~byte & (byte + 1)).bit_length() - 1
+            self._set(offset)
+            port = self.start_port + offset
+            if key is not None:
+                self._key_2_port[key] = port
+                self._port_2_key[port] = key
+            return port
+
+    def get_port(self, key: str):
+        """
+        @description: 获取 key 已分配的端口，未分配时返回 None
+        """
+        return self._key_2_port.get(key)
+
+    def reserve(self, port: int, key: str = None) -> bool:
+        """
+        @description: 把指定端口标记为已使用（范围外的端口忽略），已经使用但还没有绑定 key 时只补充绑定
+        @return: 是否由本次标记（已经使用或在范围外时返回 False）
+        """
+        if not self.start_port <= port <= self.end_port:
+            return False
+        with self._lock:
+            offset = port - self.start_port
+            is_set = self._is_set(offset)
+            if not is_set:
+                self._set(offset)
+            if key is not None and key not in self._key_2_port and port not in self._port_2_key:
+                self._key_2_port[key] = port
+                self._port_2_key[port] = key
+            return not is_set
+
+    def free(self, port: int) -> bool:
+        """
+        @description: 释放端口（同时解除 key 的绑定）
+        @return: 是否已使用并被释放
+        """
+        if not self.start_port <= port <= self.end_port:
+            return False
+        with self._lock:
+            offset = port - self.start_port
+            if not self._is_set(offset):
+                return False
+            self._clear(offset)
+            key = self._port_2_key.pop(port, None)
+            if key is not None:
+                del self._key_2_port[key]
+            return True
+
+
+def get_listening_port_2_key() -> dict:
+    """
+    @description: 获取当前 GOST 配置中所有服务监听的端口，以及按服务名称推出的 key
+    @return: {端口: key}（名称不以 -service 结尾时 key 为 None），获取配置失败时返回 None
+    """
+    services = gost_config.get_items("services")
+    if services is None:
+        return None
+    port_2_key = {}
+    for service in services:
+        try:
+            port = int((service.get("addr") or "").rsplit(":", 1)[1])
+        except (IndexError, ValueError):
+            continue
+        name = service.get("name") or ""
+        port_2_key[port] = name[:-len(SERVICE_NAME_SUFFIX)] if name.endswith(SERVICE_NAME_SUFFIX) else None
+    return port_2_key
+
+def get_allocator() -> PortAllocator:
+    """
+    @description: 获取本进程的端口分配器，第一次使用时按当前 GOST 配置（以及 Redis）标记已使用的端口并恢复 key 与端口的对应关系
+    @return: 端口分配器，获取配置失败时返回 None
+    """
+    global ALLOCATOR
+    if ALLOCATOR is None:
+        with ALLOCATOR_LOCK:
+            if ALLOCATOR is None:
+                port_2_key = get_listening_port_2_key()
+                if port_2_key is None:
+                    LOGGER.error("GOST 端口分配 -> 获取配置失败，无法确定已使用的端口")
+                    return None
+                allocator = PortAllocator()
+                for port, key in port_2_key.items():
+                    allocator.reserve(port, key)
+                if IS_PORT_REDIS:
+                    _seed_redis(allocator, port_2_key)
+                    _load_redis(allocator)
+                ALLOCATOR = allocator
+                LOGGER.info("GOST 端口分配 -> 端口范围：{}-{}，已使用：{}".format(
+                    allocator.start_port, allocator.end_port, len(allocator)))
+    return ALLOCATOR
+
+def _get_redis_connection():
+    from common import redis
+    return redis.get_connetion(db=REDIS_DB)
+
+def _seed_redis(allocator: PortAllocator, port_2_key: dict):
+    # 只把已监听的端口置为已使用、补充缺少的 key，不清除其他进程已分配的端口
+    pipeline = _get_redis_connection().pipeline(transaction=False)
+    for port, key in port_2_key.items():
+        if allocator.start_port <= port <= allocator.end_port:
+            pipeline.setbit(PORT_REDIS_KEY_PREFIX + ":bitmap", port - allocator.start_port, 1)
+            if key is not None:
+                pipeline.hsetnx(PORT_REDIS_KEY_PREFIX + ":keys", key, port - allocator.start_port)
+    pipeline.execute()
+
+def _load_redis(allocator: PortAllocator):
+    # 其他进程（或本进程重启前）在 Redis 中分配、但还没有添加转发的端口也标记为已使用
+    redis_connection = _get_redis_connection()
+    for key, offset in redis_connection.hgetall(PORT_REDIS_KEY_PREFIX + ":keys").items():
+        key = key.decode() if isinstance(key, bytes) else key
+        allocator.reserve(allocator.start_port + int(offset), key)
+    for offset in redis_connection.eval(LOAD_LUA_SCRIPT, 1, PORT_REDIS_KEY_PREFIX + ":bitmap"):
+        allocator.reserve(allocator.start_port + int(offset))
+
+def allocate_port(key: str = None):
+    """
+    @description: 分配一个空闲端口
+    @param {type}
+    key: 可选，同一个 key 总是得到同一个端口（直到被释放）
+    @return: 端口，没有空闲端口或获取配置失败时返回 None
+    """
+    allocator = get_allocator()
+    if allocator is None:
+        return None
+    # 1. 本进程内分配
+    if not IS_PORT_REDIS:
+        port = allocator.allocate(key)
+    # 2. 在 Redis 中分配
+    else:
+        offset = _get_redis_connection().eval(
+            ALLOCATE_LUA_SCRIPT, 2, PORT_REDIS_KEY_PREFIX + ":bitmap", PORT_REDIS_KEY_PREFIX + ":keys",
+            allocator.end_port - allocator.start_port + 1, key or "")
+        port = None if int(offset) < 0 else allocator.start_port + int(offset)
+        if port is not None:
+            allocator.reserve(port, key)
+    if port is None:
+        LOGGER.error("GOST 端口分配 -> 端口范围 {}-{} 内没有空闲端口".format(allocator.start_port, allocator.end_port))
+    return port
+
+def get_allocated_port(key: str):
+    """
+    @description: 获取 key 已分配的端口
+    @return: 端口，未分配或获取配置失败时返回 None
+    """
+    allocator = get_allocator()
+    if allocator is None:
+        return None
+    if IS_PORT_REDIS:
+        offset = _get_redis_connection().hget(PORT_REDIS_KEY_PREFIX + ":keys", key)
+        return None if offset is None else allocator.start_port + int(offset)
+    return allocator.get_port(key)
+
+def free_port(port: int, key: str = None) -> bool:
+    """
+    @description: 释放端口（删除转发后调用）
+    @param {type}
+    key: 分配时指定的 key（在 Redis 中分配时用于解除绑定）
+    @return: 是否成功
+    """
+    allocator = get_allocator()
+    if allocator is None:
+        return False
+    if IS_PORT_REDIS:
+        if not allocator.start_port <= port <= allocator.end_port:
+            return False
+        _get_redis_connection().eval(
+            FREE_LUA_SCRIPT, 2, PORT_REDIS_KEY_PREFIX + ":bitmap", PORT_REDIS_KEY_PREFIX + ":keys",
+            port - allocator.start_port, key or "")
+        allocator.free(port)
+        return True
+    return allocator.free(port)
+
+def reset():
+    """
+    @description: 丢弃本进程的端口分配器，下次使用时重新按 GOST 配置创建
+    """
+    global ALLOCATOR
+    with ALLOCATOR_LOCK:
+        ALLOCATOR = None
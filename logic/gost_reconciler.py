@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/gost_reconciler.py
+# @DATE: 2026/10/18
+# @TIME: 18:42:30
+#
+# @DESCRIPTION: GOST 配置调和逻辑
+#   给定期望的服务、转发链、跳跃点，与当前配置比较后只新增缺少的、修改不一致的、（可选）删除多余的，已经一致的不做任何请求
+#   比较时双方先规范化（去掉空值和 GOST 附加的运行状态字段、数字统一为字符串）再整体比较，当前配置中多出的字段（如过时的 handler.chain）也会被修改
+#   新增、修改按 跳跃点 -> 转发链 -> 服务 的顺序（被引用的先创建），删除按相反顺序
+
+
+from common.logger import LOGGER
+from common.logic import gost_config
+from common.logic import gost_service
+from common.logic import gost_chain
+from common.logic import gost_hop
+from common.logic.periodic_refresher import PeriodicRefresher
+
+
+# 全局变量
+# 新增、修改的顺序（删除时相反）
+SECTION_LIST = ["hops", "chains", "services"]
+# 后台调和线程
+RECONCILER = None
+# GOST 返回配置时附加的运行状态字段（不属于配置，比较时忽略）
+IGNORED_KEY_SET = frozenset(["status"])
+
+
+def normalize(value):
+    """
+    @description: 规范化配置项：去掉值为空（None、空字符串、空字典、空列表）的字段和运行状态字段，数字统一为字符串
+    """
+    if isinstance(value, dict):
+        normalized_dict = {}
+        for key, item in value.items():
+            if key in IGNORED_KEY_SET:
+                continue
+            item = normalize(item)
+            if item is not None:
+                normalized_dict[key] = item
+        return normalized_dict or None
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value] or None
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+def is_matched(desired, live) -> bool:
+    """
+    @description: 判断当前配置是否与期望一致（规范化后整体比较）
+    """
+    return normalize(desired) == normalize(live)
+
+def diff(desired_state: dict, config_index: dict, prune_name_prefix: str = None) -> dict:
+    """
+    @description: 比较期望状态和当前配置
+    @param {type}
+    desired_state: {"services": [...], "chains": [...], "hops": [...]}，缺少的项视为空列表
+    config_index: gost_config.get_config_index() 的返回值
+    prune_name_prefix: 指定时，名称以此开头但不在期望中的配置项会被删除（不指定时不删除任何配置项）
+    @return: {"add": {"services": [...], ...}, "update": {...}, "delete": {"services": [名称, ...], ...}}
+    """
+    changes = {"add": {}, "update": {}, "delete": {}}
+    for section in SECTION_LIST:
+        desired_items = desired_state.get(section) or []
+        name_2_live_item = config_index[section]
+        changes["add"][section] = [item for item in desired_items if item["name"] not in name_2_live_item]
+        changes["update"][section] = [item for item in desired_items if item["name"] in name_2_live_item
+                                      and not is_matched(item, name_2_live_item[item["name"]])]
+        desired_name_set = {item["name"] for item in desired_items}
+        changes["delete"][section] = [
+            name for name in name_2_live_item
+            if prune_name_prefix and name and name.startswith(prune_name_prefix) and name not in desired_name_set]
+    return changes
+
+def _write(action: str, section: str, item: dict) -> bool:
+    if section == "services":
+        function = gost_service.add if action == "add" else gost_service.update
+        return function(name=item["name"], addr=item["addr"], handler=item.get("handler"),
+                        listener=item.get("listener"), forwarder=item.get("forwarder"))
+    if section == "chains":
+        function = gost_chain.add if action == "add" else gost_chain.update
+        return function(name=item["name"], hops=item["hops"])
+    function = gost_hop.add if action == "add" else gost_hop.update
+    return function(name=item["name"], nodes=item["nodes"])
+
+def _delete(section: str, name: str) -> bool:
+    return {"services": gost_service.delete, "chains": gost_chain.delete, "hops": gost_hop.delete}[section](name)
+
+def reconcile(desired_state: dict, prune_name_prefix: str = None, config_index: dict = None) -> dict:
+    """
+    @description: 把 GOST 配置调和到期望状态（只获取一次配置，只发送有变化的请求）
+    @param {type}
+    desired_state: {"services": [...], "chains": [...], "hops": [...]}
+    prune_name_prefix: 指定时删除名称以此开头但不在期望中的配置项
+    config_index: 可选，调用方刚刚获取的配置索引，不指定时重新获取
+    @return: {"added": [名称, ...], "updated": [...], "deleted": [...], "failed": [...]}，获取配置失败时返回 None
+    """
+    # 1. 获取一次最新配置并比较
+    config_index = config_index or gost_config.get_config_index(max_age_seconds=0)
+    if config_index is None:
+        LOGGER.error("GOST 调和 -> 获取配置失败，无法调和")
+        return None
+    changes = diff(desired_state, config_index, prune_name_prefix)
+    result = {"added": [], "updated": [], "deleted": [], "failed": []}
+    # 2. 新增、修改（被引用的先创建）
+    for section in SECTION_LIST:
+        for action, result_key in (("add", "added"), ("update", "updated")):
+            for item in changes[action][section]:
+                result[result_key if _write(action, section, item) else "failed"].append(item["name"])
+    # 3. 删除（引用方先删除）
+    for section in reversed(SECTION_LIST):
+        for name in changes["delete"][section]:
+            result["deleted" if _delete(section, name) else "failed"].append(name)
+    # 4. 返回结果
+    if result["added"] or result["updated"] or result["deleted"] or result["failed"]:
+        LOGGER.info("GOST 调和 -> 新增：%s，修改：%s，删除：%s，失败：%s" % (
+            len(result["added"]), len(result["updated"]), len(result["deleted"]), len(result["failed"])))
+    return result
+
+def start(get_desired_state, interval_seconds: float = 60, jitter_seconds: float = 5, prune_name_prefix: str = None):
+    """
+    @description: 启动后台定时调和（已经启动时先停止再按新参数启动），GOST 配置被外部修改或重启后会自动恢复
+    @param {type}
+    get_desired_state: 函数，返回当前的期望状态
+    """
+    global RECONCILER
+    stop()
+    RECONCILER = PeriodicRefresher(
+        lambda: reconcile(get_desired_state(), prune_name_prefix), interval_seconds, jitter_seconds, "gost_reconcile",
+        "GOST 调和")
+    RECONCILER.start()
+    LOGGER.info("GOST 调和 -> 启动后台定时调和，间隔：%s 秒" % interval_seconds)
+
+def stop():
+    """
+    @description: 停止后台定时调和
+    """
+    global RECONCILER
+    if RECONCILER is None:
+        return
+    RECONCILER.stop()
+    RECONCILER = None
+    LOGGER.info("GOST 调和 -> 停止后台定时调和")
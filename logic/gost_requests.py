@@ -7,10 +7,17 @@
 # @TIME: 22:14:05
 #
 # @DESCRIPTION: GOST 请求封装
+#   所有请求共用一个带连接池的 Session（保持长连接），GET / PUT / DELETE 失败时按退避时间重试，POST 只在连接失败时重试
+#   按接口记录请求次数、失败次数和耗时
 
 
+import re
 import json
+import time
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from common.config import CONFIG
 from common.logger import LOGGER
@@ -23,14 +30,93 @@ GOST_AUTH_USERNAME = CONFIG["gost"]["auth_username"]
 GOST_AUTH_PASSWORD = CONFIG["gost"]["auth_password"]
 # 是否已经通知过没有 AUTH 信息
 IS_NOTIFIED_NO_AUTH = False
+# 连接超时和读取超时（秒）
+CONNECT_TIMEOUT_SECONDS = CONFIG["gost"].get("connect_timeout_seconds", 3)
+READ_TIMEOUT_SECONDS = CONFIG["gost"].get("read_timeout_seconds", 10)
+# 重试次数和退避系数（第 n 次重试前等待 backoff_factor * 2 ^ (n - 1) 秒）
+RETRY_COUNT = CONFIG["gost"].get("retry_count", 3)
+RETRY_BACKOFF_FACTOR = CONFIG["gost"].get("retry_backoff_factor", 0.3)
+# 连接池大小（同时请求的线程数超过时会等待）
+POOL_MAXSIZE = CONFIG["gost"].get("pool_maxsize", 16)
+# 共用的 Session，第一次请求时创建
+SESSION = None
+SESSION_LOCK = threading.Lock()
+# 接口耗时统计
+#   格式：{"GET api/config": {"count": $count, "failure_count": $failure_count, "total_seconds": $total_seconds, "max_seconds": $max_seconds}, ...}
+ENDPOINT_2_STATS_DICT = {}
+ENDPOINT_STATS_LOCK = threading.Lock()
+# 统计时把配置项名称替换为占位符，同一类接口合并统计
+ENDPOINT_NAME_PATTERN = re.compile(r"^(api/config/(?:services|chains|hops|bypasses|admissions|resolvers|hosts|limiters|authers))/[^/?]+")
 
 
-def get(uri_path: str, params: dict = None) -> dict:
+def get_session() -> requests.Session:
     """
-    @description: GET 请求
+    @description: 获取共用的 Session（连接池、长连接、重试）
+    """
+    global SESSION
+    if SESSION is None:
+        with SESSION_LOCK:
+            if SESSION is None:
+                retry = Retry(
+                    total=RETRY_COUNT,
+                    backoff_factor=RETRY_BACKOFF_FACTOR,
+                    status_forcelist=[502, 503, 504],
+                    # 只有幂等请求在读取失败和上面的状态码时重试，POST 只在连接失败时重试
+                    allowed_methods=["GET", "PUT", "DELETE"],
+                    raise_on_status=False)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+                session = requests.Session()
+                session.auth = (GOST_AUTH_USERNAME, GOST_AUTH_PASSWORD)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                SESSION = session
+    return SESSION
+
+def record_latency(method: str, uri_path: str, seconds: float, is_success: bool):
+    """
+    @description: 记录接口耗时（异步客户端也使用）
+    """
+    endpoint = "{} {}".format(method, ENDPOINT_NAME_PATTERN.sub(r"\1/{name}", uri_path))
+    with ENDPOINT_STATS_LOCK:
+        stats = ENDPOINT_2_STATS_DICT.get(endpoint)
+        if stats is None:
+            stats = ENDPOINT_2_STATS_DICT[endpoint] = {"count": 0, "failure_count": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+        stats["count"] += 1
+        if not is_success:
+            stats["failure_count"] += 1
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+def get_latency_stats() -> dict:
+    """
+    @description: 获取接口耗时统计
+    @return: {"GET api/config": {"count": 请求次数, "failure_count": 失败次数, "avg_seconds": 平均耗时, "max_seconds": 最大耗时}, ...}
+    """
+    with ENDPOINT_STATS_LOCK:
+        return {
+            endpoint: {
+                "count": stats["count"],
+                "failure_count": stats["failure_count"],
+                "avg_seconds": stats["total_seconds"] / stats["count"],
+                "max_seconds": stats["max_seconds"]
+            } for endpoint, stats in ENDPOINT_2_STATS_DICT.items()
+        }
+
+def reset_latency_stats():
+    """
+    @description: 清空接口耗时统计
+    """
+    with ENDPOINT_STATS_LOCK:
+        ENDPOINT_2_STATS_DICT.clear()
+
+def _request(method: str, uri_path: str, params: dict = None, data=None) -> dict:
+    """
+    @description: 发送请求
+    :param method: 请求方法
     :param uri_path: URI 路径
     :param params: 请求参数
-    :return: 返回结果
+    :param data: 请求数据，dict 会转为 JSON
+    :return: 返回结果，失败时返回 None
     """
     # 1. 检查配置
     if not GOST_API_URL:
@@ -43,21 +129,34 @@ def get(uri_path: str, params: dict = None) -> dict:
             IS_NOTIFIED_NO_AUTH = True
     # 2. 请求
     url = "{}/{}".format(GOST_API_URL, uri_path)
-    auth = (GOST_AUTH_USERNAME, GOST_AUTH_PASSWORD)
+    started_at = time.time()
     try:
-        response = requests.get(url, auth=auth, params=params)
+        response = get_session().request(
+            method, url, params=params, data=json.dumps(data) if type(data) == dict else data,
+            timeout=(CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS))
         response_json = response.json()
     except Exception as e:
-        LOGGER.error("GOST 请求 -> GET 请求出错: {}".format(e))
+        record_latency(method, uri_path, time.time() - started_at, False)
+        LOGGER.error("GOST 请求 -> {} 请求出错: {}".format(method, e))
         return None
+    record_latency(method, uri_path, time.time() - started_at, response.status_code == 200)
     # 3. 检验返回值
     if response.status_code != 200:
-        LOGGER.error("GOST 请求 -> GET 请求失败，状态码: {}".format(response.status_code))
-        LOGGER.error("GOST 请求 -> GET 请求失败，响应内容: {}".format(response.text))
+        LOGGER.error("GOST 请求 -> {} 请求失败，状态码: {}".format(method, response.status_code))
+        LOGGER.error("GOST 请求 -> {} 请求失败，响应内容: {}".format(method, response.text))
         return None
     # 4. 返回结果
     return response_json
 
+def get(uri_path: str, params: dict = None) -> dict:
+    """
+    @description: GET 请求
+    :param uri_path: URI 路径
+    :param params: 请求参数
+    :return: 返回结果
+    """
+    return _request("GET", uri_path, params=params)
+
 def post(uri_path: str, data: dict = None) -> dict:
     """
     @description: POST 请求
@@ -65,31 +164,7 @@ def post(uri_path: str, data: dict = None) -> dict:
     :param data: 请求数据
     :return: 返回结果
     """
-    # 1. 检查配置
-    if not GOST_API_URL:
-        LOGGER.error("GOST 请求 -> 配置文件中 GOST URL 为空")
-        return None
-    if not GOST_AUTH_USERNAME or not GOST_AUTH_PASSWORD:
-        global IS_NOTIFIED_NO_AUTH
-        if not IS_NOTIFIED_NO_AUTH:
-            LOGGER.warning("GOST 请求 -> 配置文件中 GOST 用户名或密码为空，将不会进行认证")
-            IS_NOTIFIED_NO_AUTH = True
-    # 2. 请求
-    url = "{}/{}".format(GOST_API_URL, uri_path)
-    auth = (GOST_AUTH_USERNAME, GOST_AUTH_PASSWORD)
-    try:
-        response = requests.post(url, auth=auth, data=json.dumps(data) if type(data) == dict else data)
-        response_json = response.json()
-    except Exception as e:
-        LOGGER.error("GOST 请求 -> POST 请求出错: {}".format(e))
-        return None
-    # 3. 检验返回值
-    if response.status_code != 200:
-        LOGGER.error("GOST 请求 -> POST 请求失败，状态码: {}".format(response.status_code))
-        LOGGER.error("GOST 请求 -> POST 请求失败，响应内容: {}".format(response.text))
-        return None
-    # 4. 返回结果
-    return response_json
+    return _request("POST", uri_path, data=data)
 
 def put(uri_path: str, data: dict = None) -> dict:
     """
@@ -98,31 +173,7 @@ def put(uri_path: str, data: dict = None) -> dict:
     :param data: 请求数据
     :return: 返回结果
     """
-    # 1. 检查配置
-    if not GOST_API_URL:
-        LOGGER.error("GOST 请求 -> 配置文件中 GOST URL 为空")
-        return None
-    if not GOST_AUTH_USERNAME or not GOST_AUTH_PASSWORD:
-        global IS_NOTIFIED_NO_AUTH
-        if not IS_NOTIFIED_NO_AUTH:
-            LOGGER.warning("GOST 请求 -> 配置文件中 GOST 用户名或密码为空，将不会进行认证")
-            IS_NOTIFIED_NO_AUTH = True
-    # 2. 请求
-    url = "{}/{}".format(GOST_API_URL, uri_path)
-    auth = (GOST_AUTH_USERNAME, GOST_AUTH_PASSWORD)
-    try:
-        response = requests.put(url, auth=auth, data=json.dumps(data) if type(data) == dict else data)
-        response_json = response.json()
-    except Exception as e:
-        LOGGER.error("GOST 请求 -> PUT 请求出错: {}".format(e))
-        return None
-    # 3. 检验返回值
-    if response.status_code != 200:
-        LOGGER.error("GOST 请求 -> PUT 请求失败，状态码: {}".format(response.status_code))
-        LOGGER.error("GOST 请求 -> PUT 请求失败，响应内容: {}".format(response.text))
-        return None
-    # 4. 返回结果
-    return response_json
+    return _request("PUT", uri_path, data=data)
 
 def delete(uri_path: str) -> dict:
     """
@@ -130,28 +181,4 @@ def delete(uri_path: str) -> dict:
     :param uri_path: URI 路径
     :return: 返回结果
     """
-    # 1. 检查配置
-    if not GOST_API_URL:
-        LOGGER.error("GOST 请求 -> 配置文件中 GOST URL 为空")
-        return None
-    if not GOST_AUTH_USERNAME or not GOST_AUTH_PASSWORD:
-        global IS_NOTIFIED_NO_AUTH
-        if not IS_NOTIFIED_NO_AUTH:
-            LOGGER.warning("GOST 请求 -> 配置文件中 GOST 用户名或密码为空，将不会进行认证")
-            IS_NOTIFIED_NO_AUTH = True
-    # 2. 请求
-    url = "{}/{}".format(GOST_API_URL, uri_path)
-    auth = (GOST_AUTH_USERNAME, GOST_AUTH_PASSWORD)
-    try:
-        response = requests.delete(url, auth=auth)
-        response_json = response.json()
-    except Exception as e:
-        LOGGER.error("GOST 请求 -> DELETE 请求出错: {}".format(e))
-        return None
-    # 3. 检验返回值
-    if response.status_code != 200:
-        LOGGER.error("GOST 请求 -> DELETE 请求失败，状态码: {}".format(response.status_code))
-        LOGGER.error("GOST 请求 -> DELETE 请求失败，响应内容: {}".format(response.text))
-        return None
-    # 4. 返回结果
-    return response_json
\ No newline at end of file
+    return _request("DELETE", uri_path)
@@ -21,18 +21,13 @@ def is_exist(name: str) -> bool:
     :param name: 服务名称
     :return: 是否存在
     """
-    # 1. 获取全部配置
-    config = gost_config.get_config()
-    if not config:
+    # 1. 获取配置索引（有缓存时不请求）
+    config_index = gost_config.get_config_index()
+    if config_index is None:
         LOGGER.error("GOST Service 存在判断 -> 获取配置失败")
         return False
-    # 2. 获取服务列表
-    services = config.get("services", []) or []
-    # 3. 检查服务是否存在
-    for service in services:
-        if service.get("name") == name:
-            return True
-    return False
+    # 2. 检查服务是否存在
+    return name in config_index["services"]
 
 def get_by_name_like(name_like: str):
     """
@@ -42,19 +37,17 @@ def get_by_name_like(name_like: str):
     if not name_like:
         LOGGER.error("GOST Service 获取 -> 服务名称不能为空")
         return None
-    # 2. 获取全部配置
-    config = gost_config.get_config()
-    if not config:
+    # 2. 获取服务列表（有缓存时不请求）
+    services = gost_config.get_items("services")
+    if services is None:
         LOGGER.error("GOST Service 获取 -> 获取配置失败")
         return None
-    # 3. 获取服务列表
-    services = config.get("services", []) or []
-    # 4. 获取服务
+    # 3. 获取服务
     name_like_services = []
     for service in services:
         if name_like in service.get("name"):
             name_like_services.append(service)
-    # 5. 返回结果
+    # 4. 返回结果
     return name_like_services
 
 def get(name: str):
@@ -65,18 +58,13 @@ def get(name: str):
     if not name:
         LOGGER.error("GOST Service 获取 -> 服务名称不能为空")
         return None
-    # 2. 获取全部配置
-    config = gost_config.get_config()
-    if not config:
+    # 2. 获取配置索引（有缓存时不请求）
+    config_index = gost_config.get_config_index()
+    if config_index is None:
         LOGGER.error("GOST Service 获取 -> 获取配置失败")
         return None
-    # 3. 获取服务列表
-    services = config.get("services", []) or []
-    # 4. 获取服务
-    for service in services:
-        if service.get("name") == name:
-            return service
-    return None
+    # 3. 获取服务
+    return config_index["services"].get(name)
 
 def add(name: str,
         addr: str,
@@ -107,11 +95,14 @@ def add(name: str,
     }
     # 4. 添加服务
     response_json = gost_requests.post("api/config/services", data=service)
-    # 5. 检验返回值
+    # 5. 检验返回值（失败时缓存可能已经过时，清空后重新获取）
     if not response_json:
         LOGGER.error("GOST Service 新增 -> 添加服务失败")
+        gost_config.invalidate()
         return False
-    # 6. 返回结果
+    # 6. 写入缓存
+    gost_config.put_item("services", service)
+    # 7. 返回结果
     return True
 
 def update(name: str,
@@ -146,8 +137,11 @@ def update(name: str,
     # 5. 检验返回值
     if not response_json:
         LOGGER.error("GOST Service 修改 -> 更新服务失败")
+        gost_config.invalidate()
         return False
-    # 6. 返回结果
+    # 6. 写入缓存
+    gost_config.put_item("services", service)
+    # 7. 返回结果
     return True
 
 def delete(name: str):
@@ -167,6 +161,9 @@ def delete(name: str):
     # 4. 检验返回值
     if not response_json:
         LOGGER.error("GOST Service 删除 -> 删除服务失败")
+        gost_config.invalidate()
         return False
-    # 5. 返回结果
+    # 5. 从缓存中移除
+    gost_config.remove_item("services", name)
+    # 6. 返回结果
     return True
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/periodic_refresher.py
+# @DATE: 2026/10/18
+# @TIME: 20:16:48
+#
+# @DESCRIPTION: 后台定时执行逻辑（代理池自动刷新、GOST 调和等共用）
+
+
+import random
+import threading
+
+from common.logger import LOGGER
+
+
+class PeriodicRefresher:
+    """
+    @description: 后台定时刷新线程，每次等待 interval_seconds 加上 0 ~ jitter_seconds 的随机时间，避免多个进程同时刷新
+    """
+    def __init__(self, refresh_function, interval_seconds: float, jitter_seconds: float = 0, name: str = "refresher",
+                 log_prefix: str = "共通"):
+        """
+        @description: 初始化
+        @param {type}
+        name: 线程名称
+        log_prefix: 出错时日志的前缀（如 "共通 Proxy"、"GOST 调和"）
+        """
+        self.refresh_function = refresh_function
+        self.interval_seconds = interval_seconds
+        self.jitter_seconds = jitter_seconds
+        self.name = name
+        self.log_prefix = log_prefix
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval_seconds + random.uniform(0, self.jitter_seconds)):
+            try:
+                self.refresh_function()
+            except Exception as e:
+                LOGGER.error("{} -> 后台刷新 {} 出错！错误信息：{}".format(self.log_prefix, self.name, e))
+
+    def start(self):
+        """
+        @description: 启动（已经在运行时忽略）
+        """
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """
+        @description: 停止并等待线程退出
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
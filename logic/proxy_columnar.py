@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/proxy_columnar.py
+# @DATE: 2026/10/18
+# @TIME: 16:20:45
+#
+# @DESCRIPTION: 列式代理池逻辑
+#   每个字段一个 array 列，按端口排序，端口查找使用二分
+#   host / 协议 / 国家代码 / 备注保存为字符串表中的编号，IPv4 出口 IP 压缩为 32 位整数
+#   代理字符串不预先生成，使用时再生成（账户密码在加载时生成一次，按槽位保存为定长的 ASCII），适合几十万代理、内存敏感的进程
+#   可用槽位按国家保存在数组中，移除时与末尾交换，随机选择只在可用槽位中进行
+#   被禁用的出口 IP 与 proxy.BANNED_EXIT_IP_CACHE 共用
+
+
+import socket
+import random
+import bisect
+import threading
+from array import array
+
+
+# 全局变量
+# 每个槽位保存的账户密码的字节数（用户名和密码各占一半，见 proxy._trim_encrypted_string）
+CREDENTIAL_SIZE = 20
+# 加载时每批生成账户密码的端口数量
+CREDENTIAL_BATCH_SIZE = 10000
+
+
+def pack_ip(ip: str) -> int:
+    """
+    @description: IPv4 地址压缩为 32 位整数，不是 IPv4 时返回 0
+    """
+    try:
+        return int.from_bytes(socket.inet_aton(ip), "big") if ip and ip.count(".") == 3 else 0
+    except OSError:
+        return 0
+
+def unpack_ip(packed_ip: int) -> str:
+    """
+    @description: 32 位整数还原为 IPv4 地址
+    """
+    return socket.inet_ntoa(packed_ip.to_bytes(4, "big"))
+
+
+class StringTable:
+    """
+    @description: 字符串表，相同的字符串只保存一次，列中只保存编号
+    """
+    __slots__ = ("_strings", "_string_2_id")
+
+    def __init__(self):
+        self._strings = []
+        self._string_2_id = {}
+
+    def __len__(self):
+        return len(self._strings)
+
+    def get_id(self, string) -> int:
+        """
+        @description: 获取字符串的编号，不存在时添加
+        """
+        string_id = self._string_2_id.get(string)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._string_2_id[string] = string_id
+            self._strings.append(string)
+        return string_id
+
+    def find_id(self, string):
+        """
+        @description: 查找字符串的编号，不存在时返回 None
+        """
+        return self._string_2_id.get(string)
+
+    def get(self, string_id: int):
+        return self._strings[string_id]
+
+
+class ColumnarProxyPool:
+    """
+    @description: 列式代理池，提供与 proxy 模块相同的 get_proxy_info / get_proxy_str / remove_by_proxy_str
+    构建后端口顺序固定，移除时标记为失效并从可用槽位中删除；刷新时整体重新构建
+    """
+    def __init__(self, proxy_str_builder, banned_exit_ip_cache=None):
+        """
+        @param {type}
+        proxy_str_builder: 函数 (host, port, protocol, username, password, is_forward) -> 代理字符串
+        banned_exit_ip_cache: 被禁用的出口 IP（键为出口 IP 字符串，只判断是否存在），通常为 proxy.BANNED_EXIT_IP_CACHE
+        """
+        self.proxy_str_builder = proxy_str_builder
+        # 1. 列（下标为槽位，按端口升序）
+        self.ports = array("q")
+        self.host_ids = array("I")
+        self.protocol_ids = array("I")
+        self.country_code_ids = array("I")
+        self.remark_ids = array("I")
+        self.exit_ips = array("I")
+        self.is_alives = bytearray()
+        # 账户密码，每个槽位 CREDENTIAL_SIZE 字节，没有账户密码时为空
+        self.credentials = bytearray()
+        # 2. 字符串表
+        self.host_table = StringTable()
+        self.protocol_table = StringTable()
+        self.country_code_table = StringTable()
+        self.remark_table = StringTable()
+        # 3. 不是 IPv4 的出口 IP（列中为 0）、不是定长 ASCII 的账户密码（列中为空格）
+        self.slot_2_exit_ip = {}
+        self.slot_2_credential = {}
+        # 4. 可用槽位：国家编号到可用槽位的映射、全部可用槽位，以及每个槽位在这两个数组中的位置
+        self.country_code_id_2_slots = {}
+        self.alive_slots = array("I")
+        self.slot_2_country_position = array("I")
+        self.slot_2_alive_position = array("I")
+        # 5. 被禁用的出口 IP
+        self.banned_exit_ip_cache = banned_exit_ip_cache if banned_exit_ip_cache is not None else {}
+        # 移除时使用的锁，读取不需要
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.alive_slots)
+
+    @classmethod
+    def from_rows(cls, rows, proxy_str_builder, is_exit_ip_remove_duplicate: bool = True,
+                  credential_generator=None, banned_exit_ip_cache=None):
+        """
+        @description: 从查询结果构建
+        @param {type}
+        rows: 可迭代的 (country_code, host, port, protocol, exit_ip, remark)
+        proxy_str_builder, banned_exit_ip_cache: 同构造函数
+        credential_generator: 可选，函数 (ports) -> {端口: (用户名, 密码)}，通常为 proxy._generate_proxy_username_and_password_by_ports
+        """
+        pool = cls(proxy_str_builder, banned_exit_ip_cache)
+        # 1. 逐行编码，出口 IP 去重使用压缩后的整数
+        exit_ip_set = set()
+        encoded_rows = []
+        for country_code, host, port, protocol, exit_ip, remark in rows:
+            packed_exit_ip = pack_ip(exit_ip)
+            if is_exit_ip_remove_duplicate:
+                exit_ip_key = packed_exit_ip or exit_ip
+                if exit_ip_key in exit_ip_set:
+                    continue
+                exit_ip_set.add(exit_ip_key)
+            encoded_rows.append((
+                port,
+                pool.host_table.get_id(host),
+                pool.protocol_table.get_id(protocol),
+                pool.country_code_table.get_id(country_code or "UNKNOWN"),
+                pool.remark_table.get_id(remark),
+                packed_exit_ip,
+                None if packed_exit_ip else exit_ip))
+        # 2. 按端口排序后写入列
+        encoded_rows.sort(key=lambda encoded_row: encoded_row[0])
+        for slot, (port, host_id, protocol_id, country_code_id, remark_id, packed_exit_ip, exit_ip) in enumerate(encoded_rows):
+            pool.ports.append(port)
+            pool.host_ids.append(host_id)
+            pool.protocol_ids.append(protocol_id)
+            pool.country_code_ids.append(country_code_id)
+            pool.remark_ids.append(remark_id)
+            pool.exit_ips.append(packed_exit_ip)
+            if exit_ip is not None:
+                pool.slot_2_exit_ip[slot] = exit_ip
+            if country_code_id not in pool.country_code_id_2_slots:
+                pool.country_code_id_2_slots[country_code_id] = array("I")
+            country_slots = pool.country_code_id_2_slots[country_code_id]
+            pool.slot_2_country_position.append(len(country_slots))
+            country_slots.append(slot)
+            pool.slot_2_alive_position.append(slot)
+            pool.alive_slots.append(slot)
+        pool.is_alives = bytearray(b"\x01") * len(encoded_rows)
+        del encoded_rows
+        # 3. 分批生成账户密码
+        if credential_generator is not None:
+            for start in range(0, len(pool.ports), CREDENTIAL_BATCH_SIZE):
+                ports = pool.ports[start:start + CREDENTIAL_BATCH_SIZE]
+                port_2_username_and_password = credential_generator(ports)
+                for slot, port in enumerate(ports, start):
+                    pool._append_credential(slot, *port_2_username_and_password[port])
+        return pool
+
+    def _append_credential(self, slot: int, username: str, password: str):
+        credential = (username or "") + (password or "")
+        if len(username or "") * 2 == CREDENTIAL_SIZE and len(credential) == CREDENTIAL_SIZE and credential.isascii():
+            self.credentials += credential.encode("ascii")
+        else:
+            self.credentials += b" " * CREDENTIAL_SIZE
+            self.slot_2_credential[slot] = (username, password)
+
+    def get_credential(self, slot: int):
+        """
+        @description: 获取槽位的账户密码
+        @return: (用户名, 密码)，没有时为 (None, None)
+        """
+        if not self.credentials:
+            return None, None
+        if slot in self.slot_2_credential:
+            return self.slot_2_credential[slot]
+        credential = self.credentials[slot * CREDENTIAL_SIZE:(slot + 1) * CREDENTIAL_SIZE].decode("ascii")
+        return credential[:CREDENTIAL_SIZE // 2], credential[CREDENTIAL_SIZE // 2:]
+
+    def _find_slot(self, port: int):
+        """
+        @description: 二分查找端口所在的槽位，不存在或已移除时返回 None
+        """
+        slot = bisect.bisect_left(self.ports, port)
+        if slot < len(self.ports) and self.ports[slot] == port and self.is_alives[slot]:
+            return slot
+        return None
+
+    def get_exit_ip(self, slot: int) -> str:
+        packed_exit_ip = self.exit_ips[slot]
+        return unpack_ip(packed_exit_ip) if packed_exit_ip else self.slot_2_exit_ip.get(slot)
+
+    def get_proxy_info(self, port: int):
+        """
+        @description: 获取代理信息（与 proxy 模块的字段相同），不存在时返回 None
+        """
+        slot = self._find_slot(port)
+        if slot is None:
+            return None
+        username, password = self.get_credential(slot)
+        return {
+            "country_code": self.country_code_table.get(self.country_code_ids[slot]),
+            "host": self.host_table.get(self.host_ids[slot]),
+            "port": port,
+            "protocol": self.protocol_table.get(self.protocol_ids[slot]),
+            "exit_ip": self.get_exit_ip(slot),
+            "remark": self.remark_table.get(self.remark_ids[slot]),
+            "username": username,
+            "password": password
+        }
+
+    def _is_available(self, slot: int, is_skipped=None) -> bool:
+        if not self.is_alives[slot]:
+            return False
+        exit_ip = self.get_exit_ip(slot)
+        return exit_ip not in self.banned_exit_ip_cache and not (is_skipped and is_skipped(exit_ip))
+
+    def _random_slot(self, slots, is_skipped=None):
+        """
+        @description: 在可用槽位中惰性 Fisher-Yates 不放回抽样，跳过出口 IP 被禁用的槽位
+        可用槽位中没有已移除的代理，期望抽取次数为 1 / (1 - 被禁用的比例)，不会从头顺序查找
+        """
+        slot_count = len(slots)
+        swapped_position_dict = {}
+        for i in range(slot_count):
+            j = random.randrange(i, slot_count)
+            position = swapped_position_dict.get(j, j)
+            swapped_position_dict[j] = swapped_position_dict.get(i, i)
+            try:
+                slot = slots[position]
+            except IndexError:
+                # 抽样期间末尾的槽位被移除
+                continue
+            if self._is_available(slot, is_skipped):
+                return slot
+        return None
+
+    def get_proxy_str(self, country_code: str = None, is_forward: bool = False, protocol: str = "socks5",
+                      is_skipped=None):
+        """
+        @description: 根据国家代码随机获取代理字符串，跳过已移除的代理和被禁用的出口 IP
+        @param {type}
+        is_skipped: 可选，函数 (出口 IP) -> 是否跳过（如只在目标网站下被禁用的出口 IP）
+        @return: 代理字符串，没有可用代理时返回 None
+        """
+        # 1. 确定候选槽位
+        if country_code:
+            country_code_id = self.country_code_table.find_id(country_code)
+            slots = self.country_code_id_2_slots.get(country_code_id) if country_code_id is not None else None
+            if not slots:
+                return None
+        else:
+            slots = self.alive_slots
+        slot = self._random_slot(slots, is_skipped)
+        if slot is None:
+            return None
+        # 2. 使用加载时生成的账户密码生成代理字符串
+        username, password = self.get_credential(slot)
+        return self.proxy_str_builder(
+            self.host_table.get(self.host_ids[slot]), self.ports[slot],
+            protocol or self.protocol_table.get(self.protocol_ids[slot]), username, password, is_forward)
+
+    @staticmethod
+    def _remove_slot(slots, slot_2_position, slot: int):
+        # 与末尾的槽位交换后删除
+        position = slot_2_position[slot]
+        last_slot = slots[-1]
+        slots[position] = last_slot
+        slot_2_position[last_slot] = position
+        slots.pop()
+
+    def remove_by_port(self, port: int) -> bool:
+        """
+        @description: 移除端口（标记为失效，并从可用槽位中删除），O(1)
+        @return: 是否存在并被移除
+        """
+        with self._lock:
+            slot = self._find_slot(port)
+            if slot is None:
+                return False
+            self.is_alives[slot] = 0
+            self._remove_slot(self.alive_slots, self.slot_2_alive_position, slot)
+            self._remove_slot(self.country_code_id_2_slots[self.country_code_ids[slot]], self.slot_2_country_position, slot)
+            return True
+
+    def remove_by_proxy_str(self, proxy_str: str):
+        """
+        @description: 根据代理字符串移除代理
+        """
+        return self.remove_by_port(int(proxy_str.rsplit(":", 1)[-1]))
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/proxy_hash_ring.py
+# @DATE: 2026/10/18
+# @TIME: 14:05:18
+#
+# @DESCRIPTION: 代理一致性哈希环逻辑
+#   会话键映射到固定端口，代理增减时只有约 1/N 的会话键会换到别的端口
+#   每个端口在环上放置若干虚拟节点，查找使用二分 O(log n)
+#   修改时在副本上增删后整体替换，查找不需要加锁；移除的端口先标记跳过，攒够一批再删除
+
+
+import bisect
+import hashlib
+
+
+# 全局变量
+# 每个端口的虚拟节点数
+DEFAULT_REPLICA_COUNT = 8
+# 增删的端口超过这个数量时，用归并重建代替逐个插入（逐个插入每次都要移动列表）
+MERGE_REBUILD_PORT_COUNT = 32
+
+
+def _hash(value: str) -> int:
+    """
+    @description: 64 位哈希
+    """
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+def _hash_replicas(port: int, replica_count: int) -> list:
+    """
+    @description: 生成端口的全部虚拟节点哈希（每次摘要切出 8 个 64 位哈希）
+    """
+    hashes = []
+    for chunk in range((replica_count + 7) // 8):
+        digest = hashlib.blake2b("{}#{}".format(port, chunk).encode("utf-8"), digest_size=64).digest()
+        hashes.extend(int.from_bytes(digest[i:i + 8], "big") for i in range(0, 64, 8))
+    return hashes[:replica_count]
+
+
+class ConsistentHashRing:
+    """
+    @description: 一致性哈希环
+    """
+    def __init__(self, ports=None, replica_count: int = DEFAULT_REPLICA_COUNT):
+        self.replica_count = replica_count
+        # 环上的点（按哈希值排序）、对应的端口以及端口集合，作为一个元组整体替换
+        self._ring = ([], [], frozenset())
+        # 已移除但还留在环上的端口，查找时跳过，攒够一批后再从环上删除
+        self._removed_port_set = set()
+        if ports:
+            self.update(ports)
+
+    def __len__(self):
+        return len(self._ring[2]) - len(self._removed_port_set)
+
+    def __contains__(self, port):
+        return port in self._ring[2] and port not in self._removed_port_set
+
+    def _get_points(self, port: int) -> list:
+        return [(point_hash, port) for point_hash in _hash_replicas(port, self.replica_count)]
+
+    def add(self, port: int):
+        """
+        @description: 添加端口
+        """
+        if port in self._removed_port_set:
+            self._removed_port_set.discard(port)
+            return
+        if port in self._ring[2]:
+            return
+        self._update(added_ports={port}, removed_ports=set())
+
+    def remove(self, port: int):
+        """
+        @description: 移除端口（先标记，攒够一批后再从环上删除）
+        """
+        if port not in self._ring[2]:
+            return
+        self._removed_port_set.add(port)
+        if len(self._removed_port_set) >= MERGE_REBUILD_PORT_COUNT:
+            self._update(added_ports=set(), removed_ports=set(self._removed_port_set))
+
+    def update(self, ports):
+        """
+        @description: 把环上的端口更新为 ports，只计算增删部分的哈希
+        """
+        port_set = frozenset(ports)
+        added_ports = port_set - self._ring[2]
+        # 已标记移除但又出现的端口直接取消标记
+        for port in port_set & self._removed_port_set:
+            self._removed_port_set.discard(port)
+        removed_ports = (self._ring[2] - port_set) | self._removed_port_set
+        if added_ports or removed_ports:
+            self._update(added_ports, removed_ports)
+
+    def _update(self, added_ports: set, removed_ports: set):
+        """
+        @description: 增删端口，修改环上的点的副本后整体替换
+        """
+        hashes, ports, port_set = self._ring
+        # 1. 变化较少时在副本上逐个插入、删除
+        if len(added_ports) + len(removed_ports) <= MERGE_REBUILD_PORT_COUNT:
+            hashes, ports = list(hashes), list(ports)
+            for port in removed_ports:
+                for point_hash, _ in self._get_points(port):
+                    index = bisect.bisect_left(hashes, point_hash)
+                    # 哈希冲突时向后找到属于该端口的点
+                    while index < len(hashes) and hashes[index] == point_hash:
+                        if ports[index] == port:
+                            del hashes[index]
+                            del ports[index]
+                            break
+                        index += 1
+            for port in added_ports:
+                for point_hash, point_port in self._get_points(port):
+                    index = bisect.bisect_left(hashes, point_hash)
+                    hashes.insert(index, point_hash)
+                    ports.insert(index, point_port)
+        # 2. 变化较多时过滤掉被删除的点，再与新增的点归并（两段各自有序，Timsort 按归并处理）
+        else:
+            merged_points = [(point_hash, port) for point_hash, port in zip(hashes, ports)
+                             if port not in removed_ports]
+            merged_points.extend(sorted(point for port in added_ports for point in self._get_points(port)))
+            merged_points.sort()
+            hashes = [point[0] for point in merged_points]
+            ports = [point[1] for point in merged_points]
+        # 3. 先替换环，再清除已经删除的标记
+        self._ring = (hashes, ports, (port_set - removed_ports) | added_ports)
+        self._removed_port_set -= removed_ports
+
+    def get(self, key: str, is_skipped=None):
+        """
+        @description: 获取会话键对应的端口
+        @param {type}
+        key: 会话键
+        is_skipped: 可选，判断端口是否需要跳过的函数（如出口 IP 被禁用），跳过时顺时针找下一个端口
+        @return: 端口，环为空或全部被跳过时返回 None
+        """
+        # 只取一次环，查找期间环被替换也不受影响
+        hashes, ports, port_set = self._ring
+        if not hashes:
+            return None
+        index = bisect.bisect_right(hashes, _hash(key))
+        point_count = len(hashes)
+        skipped_port_set = set()
+        for offset in range(point_count):
+            port = ports[(index + offset) % point_count]
+            if port in skipped_port_set:
+                continue
+            if port not in self._removed_port_set and (is_skipped is None or not is_skipped(port)):
+                return port
+            skipped_port_set.add(port)
+            if len(skipped_port_set) >= len(port_set):
+                break
+        return None
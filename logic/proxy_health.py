@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/proxy_health.py
+# @DATE: 2026/10/18
+# @TIME: 10:12:31
+#
+# @DESCRIPTION: 代理健康度评分与加权选择逻辑
+#   每个端口记录成功、失败次数和延迟，按半衰期衰减后计算健康度，
+#   再用树状数组（Fenwick Tree）按健康度加权抽样，单次选择 O(log n)
+#   上报结果由调用方先无锁计数，再由后台线程定时调用 apply 批量更新（report 为单次更新）
+#   只有修改在评分器的锁内进行，选择不加锁（读到修改了一半的前缀和时只会略微影响抽样概率，越界时返回 None 由调用方随机选择）
+#   由后台线程每隔 RESCORE_INTERVAL_SECONDS 秒调用 rescore 按衰减后的统计重算有过上报的端口的权重，
+#   被禁用或失败过的端口即使没有再被选中也会逐渐恢复；端口离开代理池时丢弃其统计
+
+
+import math
+import time
+import random
+import threading
+
+
+# 全局变量
+# 成功、失败次数的半衰期（秒）
+HALF_LIFE_SECONDS = 600
+# 先验成功、失败次数（没有上报时健康度为 0.5）
+PRIOR_SUCCESS_COUNT = 1.0
+PRIOR_FAILURE_COUNT = 1.0
+# 延迟的指数移动平均系数
+LATENCY_EWMA_ALPHA = 0.3
+# 参考延迟（秒），延迟等于参考延迟时延迟系数为 0.5
+REFERENCE_LATENCY_SECONDS = 2.0
+# 禁用出口 IP 时记为的失败次数（强负向信号）
+BAN_FAILURE_COUNT = 20.0
+# 健康度下限，保证差的代理仍有机会被选中并恢复
+MIN_SCORE = 0.01
+# 后台重算衰减后权重的间隔（秒）
+RESCORE_INTERVAL_SECONDS = 30
+# 成功、失败次数都衰减到这个值以下时视为没有统计，不再重算
+NEGLIGIBLE_COUNT = 0.01
+
+
+class FenwickTree:
+    """
+    @description: 树状数组，支持 O(log n) 的单点更新、追加和按前缀和查找
+    """
+    def __init__(self):
+        # 1-based 的树状数组，下标 0 不使用
+        self._tree = [0.0]
+        # 每个位置的原始权重
+        self._weights = []
+
+    def __len__(self):
+        return len(self._weights)
+
+    def _prefix_sum(self, index: int) -> float:
+        """
+        @description: 前 index 个位置的权重和
+        """
+        total = 0.0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def total(self) -> float:
+        """
+        @description: 全部权重和
+        """
+        return self._prefix_sum(len(self._weights))
+
+    def get(self, slot: int) -> float:
+        """
+        @description: 获取某个位置的权重
+        """
+        return self._weights[slot]
+
+    def append(self, weight: float):
+        """
+        @description: 在末尾追加一个位置
+        """
+        index = len(self._weights) + 1
+        # 新节点覆盖 (index - lowbit(index), index] 区间
+        lowbit = index & -index
+        self._tree.append(weight + self._prefix_sum(index - 1) - self._prefix_sum(index - lowbit))
+        self._weights.append(weight)
+
+    def pop(self) -> float:
+        """
+        @description: 删除末尾位置（末尾节点不被其他节点覆盖，直接删除即可）
+        """
+        self._tree.pop()
+        return self._weights.pop()
+
+    def update(self, slot: int, weight: float):
+        """
+        @description: 修改某个位置的权重
+        """
+        delta = weight - self._weights[slot]
+        self._weights[slot] = weight
+        index = slot + 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def find(self, value: float) -> int:
+        """
+        @description: 查找前缀和首次超过 value 的位置
+        """
+        size = len(self._weights)
+        position = 0
+        bit = 1 << (size.bit_length() - 1) if size else 0
+        while bit:
+            next_position = position + bit
+            if next_position <= size and self._tree[next_position] <= value:
+                position = next_position
+                value -= self._tree[next_position]
+            bit >>= 1
+        # 浮点误差可能导致越界
+        return min(position, size - 1)
+
+
+class WeightedPortSelector:
+    """
+    @description: 按权重抽样的端口集合，增删改和抽样均为 O(log n)
+    """
+    def __init__(self):
+        self._ports = []
+        self._port_2_slot = {}
+        self._tree = FenwickTree()
+
+    def __len__(self):
+        return len(self._ports)
+
+    def __contains__(self, port):
+        return port in self._port_2_slot
+
+    def add(self, port: int, weight: float):
+        """
+        @description: 添加端口，已存在时更新权重
+        """
+        if port in self._port_2_slot:
+            self._tree.update(self._port_2_slot[port], weight)
+            return
+        self._port_2_slot[port] = len(self._ports)
+        self._ports.append(port)
+        self._tree.append(weight)
+
+    def update(self, port: int, weight: float):
+        """
+        @description: 更新端口权重
+        """
+        slot = self._port_2_slot.get(port)
+        if slot is not None:
+            self._tree.update(slot, weight)
+
+    def remove(self, port: int):
+        """
+        @description: 移除端口（与末尾交换后删除）
+        """
+        slot = self._port_2_slot.pop(port, None)
+        if slot is None:
+            return
+        last_port = self._ports.pop()
+        last_weight = self._tree.pop()
+        if slot < len(self._ports):
+            self._ports[slot] = last_port
+            self._port_2_slot[last_port] = slot
+            self._tree.update(slot, last_weight)
+
+    def sample(self):
+        """
+        @description: 按权重抽取一个端口（不加锁，与修改同时进行时可能返回 None）
+        """
+        try:
+            if not self._ports:
+                return None
+            total = self._tree.total()
+            if total <= 0:
+                return random.choice(self._ports)
+            return self._ports[self._tree.find(random.random() * total)]
+        except IndexError:
+            # 抽样期间末尾的端口被移除
+            return None
+
+
+class ProxyHealth:
+    """
+    @description: 单个端口的健康统计
+    """
+    __slots__ = ("success_count", "failure_count", "latency", "updated_at")
+
+    def __init__(self):
+        self.success_count = 0.0
+        self.failure_count = 0.0
+        self.latency = None
+        self.updated_at = time.time()
+
+    def decay(self, now: float):
+        """
+        @description: 按半衰期衰减成功、失败次数
+        """
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            factor = math.pow(0.5, elapsed / HALF_LIFE_SECONDS)
+            self.success_count *= factor
+            self.failure_count *= factor
+        self.updated_at = now
+
+    def is_negligible(self) -> bool:
+        """
+        @description: 成功、失败次数是否已经衰减到可以忽略（健康度只取决于先验和延迟）
+        """
+        return self.success_count < NEGLIGIBLE_COUNT and self.failure_count < NEGLIGIBLE_COUNT
+
+    def score(self, now: float) -> float:
+        """
+        @description: 计算健康度，范围 (MIN_SCORE, 1]
+        """
+        self.decay(now)
+        success_rate = (self.success_count + PRIOR_SUCCESS_COUNT) \
+            / (self.success_count + self.failure_count + PRIOR_SUCCESS_COUNT + PRIOR_FAILURE_COUNT)
+        latency_factor = 1.0
+        if self.latency is not None:
+            latency_factor = REFERENCE_LATENCY_SECONDS / (REFERENCE_LATENCY_SECONDS + self.latency)
+        return max(success_rate * latency_factor, MIN_SCORE)
+
+
+class ProxyHealthScorer:
+    """
+    @description: 代理健康度评分器
+    每个国家一个加权选择器，另有一个全部端口的选择器；仍在代理池中的端口统计在刷新代理池后保留
+    修改树状数组的方法都在评分器的锁内进行（并发的读-改-写会让前缀和永久错误），pick 只读取，不加锁
+    """
+    def __init__(self):
+        self.port_2_health = {}
+        self.port_2_country_code = {}
+        self.country_code_2_selector = {}
+        self.all_selector = WeightedPortSelector()
+        self._lock = threading.RLock()
+        # 统计还没有衰减完的端口（重算权重时只遍历这些端口）
+        self._decaying_port_set = set()
+
+    def _get_score(self, port: int, now: float) -> float:
+        health = self.port_2_health.get(port)
+        if not health:
+            health = ProxyHealth()
+            self.port_2_health[port] = health
+        return health.score(now)
+
+    def _update_weight(self, port: int, now: float):
+        score = self._get_score(port, now)
+        self.all_selector.update(port, score)
+        selector = self.country_code_2_selector.get(self.port_2_country_code.get(port))
+        if selector:
+            selector.update(port, score)
+
+    def rescore(self, now: float = None):
+        """
+        @description: 按衰减后的统计重算有过上报的端口的权重，统计衰减完的端口不再重算（由后台线程定时调用）
+        """
+        now = now or time.time()
+        with self._lock:
+            for port in list(self._decaying_port_set):
+                self._update_weight(port, now)
+                health = self.port_2_health.get(port)
+                if health is None or health.is_negligible():
+                    self._decaying_port_set.discard(port)
+
+    def rebuild(self, country_code_2_ports_dict: dict):
+        """
+        @description: 根据国家代码到端口列表的映射重建选择器
+        """
+        now = time.time()
+        with self._lock:
+            port_2_country_code = {}
+            country_code_2_selector = {}
+            all_selector = WeightedPortSelector()
+            for country_code, ports in country_code_2_ports_dict.items():
+                selector = WeightedPortSelector()
+                for port in ports:
+                    score = self._get_score(port, now)
+                    selector.add(port, score)
+                    all_selector.add(port, score)
+                    port_2_country_code[port] = country_code
+                country_code_2_selector[country_code] = selector
+            # 一次性替换，并丢弃已经离开代理池的端口的统计
+            self.port_2_country_code = port_2_country_code
+            self.country_code_2_selector = country_code_2_selector
+            self.all_selector = all_selector
+            self.port_2_health = {port: health for port, health in self.port_2_health.items()
+                                  if port in port_2_country_code}
+            self._decaying_port_set &= port_2_country_code.keys()
+
+    def add(self, port: int, country_code: str):
+        """
+        @description: 添加单个端口
+        """
+        with self._lock:
+            score = self._get_score(port, time.time())
+            self.port_2_country_code[port] = country_code
+            self.country_code_2_selector.setdefault(country_code, WeightedPortSelector()).add(port, score)
+            self.all_selector.add(port, score)
+
+    def remove(self, port: int):
+        """
+        @description: 移除单个端口，同时丢弃统计
+        """
+        with self._lock:
+            country_code = self.port_2_country_code.pop(port, None)
+            selector = self.country_code_2_selector.get(country_code)
+            if selector:
+                selector.remove(port)
+            self.all_selector.remove(port)
+            self.port_2_health.pop(port, None)
+            self._decaying_port_set.discard(port)
+
+    def report(self, port: int, is_success: bool, latency: float = None):
+        """
+        @description: 上报一次使用结果（加锁，频繁上报时使用 apply 批量更新）
+        """
+        self.apply({port: (1, 0 if is_success else 1, latency or 0.0, 0 if latency is None else 1)})
+
+    def apply(self, port_2_counts: dict):
+        """
+        @description: 批量应用使用结果（只加一次锁，每个端口只更新一次权重）
+        @param {type}
+        port_2_counts: {端口: (次数, 失败次数, 延迟总和（秒）, 有延迟的次数)}，即 PortResultCounter.collect() 的返回值
+        """
+        now = time.time()
+        with self._lock:
+            for port, (request_count, failure_count, latency_sum, latency_count) in port_2_counts.items():
+                if port not in self.port_2_country_code:
+                    continue
+                health = self.port_2_health.get(port)
+                if not health:
+                    health = ProxyHealth()
+                    self.port_2_health[port] = health
+                health.decay(now)
+                health.success_count += request_count - failure_count
+                health.failure_count += failure_count
+                # 多个延迟按平均值更新，系数与逐个更新时平均值的总权重相同
+                if latency_count:
+                    latency = latency_sum / latency_count
+                    if health.latency is None:
+                        health.latency = latency
+                    else:
+                        alpha = 1 - (1 - LATENCY_EWMA_ALPHA) ** latency_count
+                        health.latency = alpha * latency + (1 - alpha) * health.latency
+                self._decaying_port_set.add(port)
+                self._update_weight(port, now)
+
+    def ban(self, port: int):
+        """
+        @description: 禁用出口 IP 的强负向信号
+        """
+        now = time.time()
+        with self._lock:
+            if port not in self.port_2_country_code:
+                return
+            health = self.port_2_health.get(port)
+            if not health:
+                health = ProxyHealth()
+                self.port_2_health[port] = health
+            health.decay(now)
+            health.failure_count += BAN_FAILURE_COUNT
+            self._decaying_port_set.add(port)
+            self._update_weight(port, now)
+
+    def pick(self, country_code: str = None):
+        """
+        @description: 按健康度加权选择端口（不加锁，选择器整体替换时使用替换前或替换后的选择器）
+        @return: 端口，没有端口或与修改冲突时返回 None
+        """
+        if country_code:
+            selector = self.country_code_2_selector.get(country_code)
+            return selector.sample() if selector else None
+        return self.all_selector.sample()
+
+    def get_score(self, port: int):
+        """
+        @description: 获取端口当前健康度
+        """
+        with self._lock:
+            if port not in self.port_2_health:
+                return None
+            return self._get_score(port, time.time())
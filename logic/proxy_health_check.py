@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/proxy_health_check.py
+# @DATE: 2026/10/18
+# @TIME: 13:20:52
+#
+# @DESCRIPTION: 代理批量健康检查逻辑
+#   使用 asyncio 并发探测 SOCKS5 / HTTP 代理，不依赖第三方库
+#   通过代理请求一个返回出口 IP 的地址（默认 http://api.ipify.org/），记录建连延迟和实际出口 IP
+
+
+import time
+import base64
+import socket
+import asyncio
+import ipaddress
+from urllib.parse import urlsplit
+
+
+# 全局变量
+# 默认并发数
+DEFAULT_CONCURRENCY = 200
+# 默认建连超时（秒），指到代理建立连接并通过代理连上目标为止
+DEFAULT_CONNECT_TIMEOUT = 5
+# 默认总超时（秒）
+DEFAULT_TIMEOUT = 10
+# 响应最大读取字节数
+MAX_RESPONSE_BYTES = 65536
+
+
+class ProxyCheckError(Exception):
+    """
+    @description: 代理检查异常
+    """
+    def __init__(self, check_error_message: str):
+        self.check_error_message = check_error_message
+        super().__init__(check_error_message)
+
+
+def _build_http_request(target_host: str, target_port: int, path: str, is_absolute: bool, extra_headers: dict = None) -> bytes:
+    """
+    @description: 构建 HTTP/1.0 请求（不使用分块传输，读到连接关闭即可）
+    """
+    request_target = "http://{}:{}{}".format(target_host, target_port, path) if is_absolute else path
+    lines = ["GET {} HTTP/1.0".format(request_target), "Host: {}".format(target_host), "Connection: close"]
+    for key, value in (extra_headers or {}).items():
+        lines.append("{}: {}".format(key, value))
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+
+def _parse_http_response(response: bytes) -> str:
+    """
+    @description: 解析 HTTP 响应，返回响应体中的出口 IP（规范化后的字符串）
+    响应体不是 IP 地址时（如代理返回的认证页面、运营商劫持页面）视为失败
+    """
+    header, _, body = response.partition(b"\r\n\r\n")
+    status_line = header.split(b"\r\n", 1)[0].decode("latin-1")
+    status_parts = status_line.split(" ", 2)
+    if len(status_parts) < 2 or status_parts[1] != "200":
+        raise ProxyCheckError("目标返回异常状态：{}".format(status_line))
+    body_str = body.decode("utf-8", "replace").strip()
+    try:
+        return str(ipaddress.ip_address(body_str))
+    except ValueError:
+        raise ProxyCheckError("响应不是有效的出口 IP：{!r}".format(body_str[:32]))
+
+async def _socks5_connect(reader, writer, target_host: str, target_port: int, username: str, password: str):
+    """
+    @description: SOCKS5 握手（RFC 1928 / RFC 1929）并连接目标
+    """
+    # 1. 协商认证方式
+    writer.write(b"\x05\x02\x00\x02" if username and password else b"\x05\x01\x00")
+    await writer.drain()
+    version, method = await reader.readexactly(2)
+    if version != 0x05:
+        raise ProxyCheckError("SOCKS5 版本错误：{}".format(version))
+    # 2. 用户名密码认证
+    if method == 0x02:
+        if not username or not password:
+            raise ProxyCheckError("SOCKS5 代理要求认证")
+        username_bytes = username.encode("utf-8")
+        password_bytes = password.encode("utf-8")
+        writer.write(b"\x01" + bytes([len(username_bytes)]) + username_bytes + bytes([len(password_bytes)]) + password_bytes)
+        await writer.drain()
+        _, status = await reader.readexactly(2)
+        if status != 0x00:
+            raise ProxyCheckError("SOCKS5 认证失败")
+    elif method != 0x00:
+        raise ProxyCheckError("SOCKS5 不支持的认证方式：{}".format(method))
+    # 3. 连接目标
+    target_host_bytes = target_host.encode("utf-8")
+    writer.write(b"\x05\x01\x00\x03" + bytes([len(target_host_bytes)]) + target_host_bytes + target_port.to_bytes(2, "big"))
+    await writer.drain()
+    _, reply, _, address_type = await reader.readexactly(4)
+    if reply != 0x00:
+        raise ProxyCheckError("SOCKS5 连接目标失败，错误码：{}".format(reply))
+    # 4. 读取绑定地址
+    if address_type == 0x01:
+        await reader.readexactly(4 + 2)
+    elif address_type == 0x03:
+        address_length = (await reader.readexactly(1))[0]
+        await reader.readexactly(address_length + 2)
+    elif address_type == 0x04:
+        await reader.readexactly(16 + 2)
+    else:
+        raise ProxyCheckError("SOCKS5 不支持的地址类型：{}".format(address_type))
+
+async def check_proxy(host: str,
+                      port: int,
+                      protocol: str,
+                      username: str = None,
+                      password: str = None,
+                      check_url: str = "http://api.ipify.org/",
+                      connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                      timeout: float = DEFAULT_TIMEOUT) -> dict:
+    """
+    @description: 检查单个代理
+    @return: {"port": $port, "is_success": $is_success, "latency": $latency, "exit_ip": $exit_ip, "error": $error}
+    """
+    result = {"port": port, "is_success": False, "latency": None, "exit_ip": None, "error": None}
+    split_result = urlsplit(check_url)
+    target_host = split_result.hostname
+    target_port = split_result.port or 80
+    path = split_result.path or "/"
+    if split_result.query:
+        path += "?" + split_result.query
+    writer = None
+    start_time = time.perf_counter()
+    try:
+        async def _check():
+            nonlocal writer
+            # 1. 连接代理并通过代理连上目标
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), connect_timeout)
+            if protocol in ("socks5", "socks5h"):
+                await asyncio.wait_for(
+                    _socks5_connect(reader, writer, target_host, target_port, username, password),
+                    max(connect_timeout - (time.perf_counter() - start_time), 0))
+                result["latency"] = time.perf_counter() - start_time
+                writer.write(_build_http_request(target_host, target_port, path, False))
+            elif protocol in ("http", "https"):
+                headers = {}
+                if username and password:
+                    credentials = base64.b64encode("{}:{}".format(username, password).encode("utf-8")).decode("utf-8")
+                    headers["Proxy-Authorization"] = "Basic " + credentials
+                writer.write(_build_http_request(target_host, target_port, path, True, headers))
+            else:
+                raise ProxyCheckError("不支持的代理协议：{}".format(protocol))
+            await writer.drain()
+            # 2. 读取响应
+            response = await reader.read(MAX_RESPONSE_BYTES)
+            if result["latency"] is None:
+                # HTTP 代理没有单独的建连阶段，以收到首个响应为准
+                result["latency"] = time.perf_counter() - start_time
+            while True:
+                chunk = await reader.read(MAX_RESPONSE_BYTES)
+                if not chunk or len(response) >= MAX_RESPONSE_BYTES:
+                    break
+                response += chunk
+            return _parse_http_response(response)
+        result["exit_ip"] = await asyncio.wait_for(_check(), timeout)
+        result["is_success"] = bool(result["exit_ip"])
+        if not result["is_success"]:
+            result["error"] = "未获取到出口 IP"
+    except asyncio.TimeoutError:
+        result["error"] = "超时"
+    except (ProxyCheckError, OSError, asyncio.IncompleteReadError, socket.gaierror) as e:
+        result["error"] = str(e) or e.__class__.__name__
+    finally:
+        if writer:
+            writer.close()
+    return result
+
+async def check_proxies(proxy_info_list: list,
+                        concurrency: int = DEFAULT_CONCURRENCY,
+                        check_url: str = "http://api.ipify.org/",
+                        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                        timeout: float = DEFAULT_TIMEOUT) -> list:
+    """
+    @description: 并发检查多个代理（信号量限制并发数）
+    @param {type}
+    proxy_info_list: [{"host": $host, "port": $port, "protocol": $protocol, "username": $username, "password": $password}, ...]
+    @return: 与 proxy_info_list 顺序一致的检查结果列表
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _check_with_semaphore(proxy_info):
+        async with semaphore:
+            return await check_proxy(
+                proxy_info["host"], proxy_info["port"], proxy_info["protocol"],
+                proxy_info.get("username"), proxy_info.get("password"),
+                check_url, connect_timeout, timeout)
+
+    return await asyncio.gather(*[_check_with_semaphore(proxy_info) for proxy_info in proxy_info_list])
+
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/proxy_index.py
+# @DATE: 2026/10/18
+# @TIME: 17:26:40
+#
+# @DESCRIPTION: 代理属性索引逻辑
+#   按国家代码、协议、host、备注标签建立 值 -> 端口集合 的倒排索引，
+#   选择时同一属性的多个值取并集，不同属性之间取交集（从最小的集合开始），结果按条件缓存到下一次修改为止
+
+
+import re
+import threading
+
+
+# 全局变量
+# 支持的属性
+ATTRIBUTE_LIST = ["country_code", "protocol", "host", "tag"]
+# 备注拆分为标签使用的分隔符（空白、逗号、分号、竖线、斜杠）
+TAG_SEPARATOR_PATTERN = re.compile(r"[\s,;|/，；]+")
+# 选择结果缓存的最大条件数，超过后清空
+MAX_CACHED_SELECTION_COUNT = 256
+
+
+def split_tags(remark: str) -> set:
+    """
+    @description: 备注拆分为标签（统一小写）
+    @return: 标签集合
+    """
+    if not remark:
+        return set()
+    return {tag.lower() for tag in TAG_SEPARATOR_PATTERN.split(remark) if tag}
+
+def get_attribute_values(proxy_info: dict) -> dict:
+    """
+    @description: 获取代理信息中各属性的值
+    @return: {属性: 值集合}
+    """
+    return {
+        "country_code": {proxy_info["country_code"]},
+        "protocol": {proxy_info["protocol"]},
+        "host": {proxy_info["host"]},
+        "tag": split_tags(proxy_info["remark"])
+    }
+
+def normalize_filters(filters: dict):
+    """
+    @description: 规范化筛选条件：去掉值为 None 的属性，单个值转为集合，标签统一小写
+    @param {type}
+    filters: {属性: 值或值的集合}，同一属性的多个值为“任意一个”
+    @return: ((属性, frozenset(值)), ...)，按属性排序，可以作为缓存键
+    """
+    normalized_filters = []
+    for attribute, values in filters.items():
+        if values is None:
+            continue
+        if attribute not in ATTRIBUTE_LIST:
+            raise ValueError("不支持的代理属性：%s" % attribute)
+        if isinstance(values, str):
+            values = [values]
+        if attribute == "tag":
+            values = [value.lower() for value in values]
+        normalized_filters.append((attribute, frozenset(values)))
+    return tuple(sorted(normalized_filters))
+
+
+class ProxyAttributeIndex:
+    """
+    @description: 代理属性倒排索引（修改加锁；读取缓存命中时不加锁）
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._attribute_2_value_2_ports = {attribute: {} for attribute in ATTRIBUTE_LIST}
+        # 每次修改加一，缓存中版本不一致的结果不再使用
+        self.version = 0
+        # 格式：{规范化的筛选条件: (版本, (端口, ...))}
+        self._selection_cache = {}
+
+    def __len__(self):
+        return sum(len(ports) for ports in self._attribute_2_value_2_ports["country_code"].values())
+
+    def add(self, port: int, proxy_info: dict):
+        """
+        @description: 添加代理
+        """
+        with self._lock:
+            for attribute, values in get_attribute_values(proxy_info).items():
+                value_2_ports = self._attribute_2_value_2_ports[attribute]
+                for value in values:
+                    value_2_ports.setdefault(value, set()).add(port)
+            self.version += 1
+
+    def remove(self, port: int, proxy_info: dict):
+        """
+        @description: 移除代理（代理信息需要与添加时相同）
+        """
+        with self._lock:
+            for attribute, values in get_attribute_values(proxy_info).items():
+                value_2_ports = self._attribute_2_value_2_ports[attribute]
+                for value in values:
+                    ports = value_2_ports.get(value)
+                    if ports is None:
+                        continue
+                    ports.discard(port)
+                    if not ports:
+                        del value_2_ports[value]
+            self.version += 1
+
+    def _select(self, normalized_filters) -> tuple:
+        # 1. 每个属性取多个值的并集
+        port_sets = []
+        for attribute, values in normalized_filters:
+            value_2_ports = self._attribute_2_value_2_ports[attribute]
+            value_port_sets = [value_2_ports[value] for value in values if value in value_2_ports]
+            if not value_port_sets:
+                return ()
+            port_sets.append(value_port_sets[0] if len(value_port_sets) == 1 else set().union(*value_port_sets))
+        # 2. 从最小的集合开始取交集
+        port_sets.sort(key=len)
+        ports = set(port_sets[0])
+        for port_set in port_sets[1:]:
+            ports &= port_set
+            if not ports:
+                break
+        return tuple(ports)
+
+    def select(self, filters: dict) -> tuple:
+        """
+        @description: 选择符合全部条件的端口
+        @param {type}
+        filters: {属性: 值或值的集合}，如 {"country_code": {"US", "CA"}, "tag": "residential"}
+        @return: 端口元组，没有条件时返回 None（表示不筛选）
+        """
+        normalized_filters = normalize_filters(filters)
+        if not normalized_filters:
+            return None
+        # 1. 读取缓存
+        cached_selection = self._selection_cache.get(normalized_filters)
+        if cached_selection is not None and cached_selection[0] == self.version:
+            return cached_selection[1]
+        # 2. 计算并缓存
+        with self._lock:
+            ports = self._select(normalized_filters)
+            if len(self._selection_cache) >= MAX_CACHED_SELECTION_COUNT:
+                self._selection_cache = {}
+            self._selection_cache[normalized_filters] = (self.version, ports)
+        return ports
+
+    @staticmethod
+    def is_matched(proxy_info: dict, filters: dict) -> bool:
+        """
+        @description: 判断代理信息是否符合全部条件（读取索引后代理可能已被修改，选中后再确认一次）
+        """
+        attribute_2_values = get_attribute_values(proxy_info)
+        for attribute, values in normalize_filters(filters):
+            if attribute_2_values[attribute].isdisjoint(values):
+                return False
+        return True
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/proxy_lease.py
+# @DATE: 2026/10/18
+# @TIME: 14:48:36
+#
+# @DESCRIPTION: 代理并发租约逻辑
+#   记录每个端口正在使用的数量，按使用数量分桶，租用时从数量最少的桶中选择端口
+#   可选使用 Redis 计数，限制多个进程对同一端口的总并发
+
+
+import time
+import threading
+
+from common.config import CONFIG
+from common.logic.proxy_ports import IndexedPortList
+
+
+# 全局变量
+# Redis 计数使用的数据库和键前缀
+REDIS_DB = CONFIG["proxy"].get("redis_db", CONFIG["redis"]["db"])
+REDIS_KEY_PREFIX = "common:proxy_lease"
+# Redis 计数的过期时间（秒），防止进程异常退出后计数无法释放
+REDIS_LEASE_EXPIRE_SECONDS = 600
+# 在同一个桶中随机尝试的次数，超过后顺序查找
+RANDOM_TRY_COUNT = 8
+# Redis 计数加一的 LUA 脚本：未达到上限时加一并刷新过期时间
+ACQUIRE_LUA_SCRIPT = """
+local inflight = tonumber(redis.call('get', KEYS[1]) or '0')
+if inflight >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('incr', KEYS[1])
+redis.call('expire', KEYS[1], ARGV[2])
+return 1
+"""
+# Redis 计数减一的 LUA 脚本：不会减到负数
+RELEASE_LUA_SCRIPT = """
+local inflight = tonumber(redis.call('get', KEYS[1]) or '0')
+if inflight <= 1 then
+    return redis.call('del', KEYS[1])
+end
+return redis.call('decr', KEYS[1])
+"""
+
+
+def _acquire_redis(port: int, max_inflight: int) -> bool:
+    from common import redis
+    redis_conn = redis.get_connetion(db=REDIS_DB)
+    return redis_conn.eval(ACQUIRE_LUA_SCRIPT, 1, "{}:{}".format(REDIS_KEY_PREFIX, port),
+                           max_inflight, REDIS_LEASE_EXPIRE_SECONDS) == 1
+
+def _release_redis(port: int):
+    from common import redis
+    redis_conn = redis.get_connetion(db=REDIS_DB)
+    redis_conn.eval(RELEASE_LUA_SCRIPT, 1, "{}:{}".format(REDIS_KEY_PREFIX, port))
+
+
+class PortLeaseCounter:
+    """
+    @description: 端口并发计数器（线程安全）
+    每个范围（国家代码，None 为全部端口）维护一组按使用数量分的桶：levels[k] 为正在使用 k 次的端口
+    """
+    def __init__(self, get_ports, get_country_code):
+        """
+        @param {type}
+        get_ports: 函数，根据国家代码（None 为全部）返回当前代理池中的端口列表
+        get_country_code: 函数，根据端口返回国家代码，端口不在代理池中时返回 None
+        """
+        self._get_ports = get_ports
+        self._get_country_code = get_country_code
+        self._condition = threading.Condition()
+        self.port_2_inflight = {}
+        self._scope_2_levels = {}
+
+    def _get_levels(self, scope):
+        # 第一次使用时按当前计数构建
+        levels = self._scope_2_levels.get(scope)
+        if levels is None:
+            levels = [IndexedPortList()]
+            for port in self._get_ports(scope):
+                inflight = self.port_2_inflight.get(port, 0)
+                while len(levels) <= inflight:
+                    levels.append(IndexedPortList())
+                levels[inflight].append(port)
+            self._scope_2_levels[scope] = levels
+        return levels
+
+    def _move(self, port: int, scopes, from_inflight: int, to_inflight: int):
+        for scope in scopes:
+            levels = self._scope_2_levels.get(scope)
+            if levels is None or from_inflight >= len(levels) or not levels[from_inflight].remove(port):
+                continue
+            while len(levels) <= to_inflight:
+                levels.append(IndexedPortList())
+            levels[to_inflight].append(port)
+
+    def reset(self):
+        """
+        @description: 代理池整体替换后调用，下次使用时按新的代理池重建分桶（计数保留）
+        """
+        with self._condition:
+            self._scope_2_levels = {}
+
+    def add(self, port: int, country_code: str):
+        """
+        @description: 代理池新增端口后调用
+        """
+        with self._condition:
+            inflight = self.port_2_inflight.get(port, 0)
+            for scope in (country_code, None):
+                levels = self._scope_2_levels.get(scope)
+                if levels is None:
+                    continue
+                while len(levels) <= inflight:
+                    levels.append(IndexedPortList())
+                levels[inflight].append(port)
+            self._condition.notify_all()
+
+    def remove(self, port: int, country_code: str):
+        """
+        @description: 代理池移除端口后调用（计数保留到归还为止）
+        """
+        with self._condition:
+            inflight = self.port_2_inflight.get(port, 0)
+            for scope in (country_code, None):
+                levels = self._scope_2_levels.get(scope)
+                if levels is not None and inflight < len(levels):
+                    levels[inflight].remove(port)
+
+    def _pick(self, country_code: str, max_inflight: int, is_skipped):
+        levels = self._get_levels(country_code)
+        for inflight in range(min(max_inflight, len(levels))):
+            bucket = levels[inflight]
+            if not bucket:
+                continue
+            # 1. 随机尝试，避免总是选中同一个端口
+            for _ in range(min(RANDOM_TRY_COUNT, len(bucket))):
+                port = bucket.random_choice()
+                if not (is_skipped and is_skipped(port)):
+                    return port
+            # 2. 随机尝试都需要跳过时顺序查找
+            for port in list(bucket):
+                if not (is_skipped and is_skipped(port)):
+                    return port
+        return None
+
+    def _increase(self, port: int):
+        # 需要持有 self._condition
+        inflight = self.port_2_inflight.get(port, 0)
+        self.port_2_inflight[port] = inflight + 1
+        self._move(port, (self._get_country_code(port), None), inflight, inflight + 1)
+
+    def _decrease(self, port: int) -> bool:
+        # 需要持有 self._condition，计数已经为 0 时返回 False
+        inflight = self.port_2_inflight.get(port, 0)
+        if inflight <= 0:
+            return False
+        if inflight == 1:
+            del self.port_2_inflight[port]
+        else:
+            self.port_2_inflight[port] = inflight - 1
+        self._move(port, (self._get_country_code(port), None), inflight, inflight - 1)
+        self._condition.notify_all()
+        return True
+
+    def acquire(self, country_code: str = None, max_inflight: int = 4, is_skipped=None,
+                is_distributed: bool = False, wait_seconds: float = 0):
+        """
+        @description: 租用使用数量最少且未达到上限的端口
+        使用 Redis 计数时，先在锁内选出端口并占用本地计数，释放锁后再在 Redis 中加一，
+        Redis 中已达到上限时重新加锁撤销本地计数，并在本次租用中跳过这个端口后重试（网络请求期间不阻塞其他租用和归还）
+        @param {type}
+        country_code: 国家代码，None 为全部端口
+        max_inflight: 单个端口的最大并发
+        is_skipped: 可选，判断端口是否需要跳过的函数
+        is_distributed: 是否同时使用 Redis 计数限制多个进程的总并发
+        wait_seconds: 没有可用端口时最多等待的秒数
+        @return: 端口，没有可用端口时返回 None
+        """
+        deadline = time.time() + wait_seconds
+        # 本次租用中 Redis 计数已达到上限的端口
+        full_port_set = set()
+
+        def _is_skipped(port):
+            return port in full_port_set or (is_skipped is not None and is_skipped(port))
+
+        while True:
+            # 1. 在本地计数中选择并占用
+            with self._condition:
+                port = self._pick(country_code, max_inflight, _is_skipped)
+                if port is None:
+                    remaining_seconds = deadline - time.time()
+                    if remaining_seconds <= 0:
+                        return None
+                    self._condition.wait(remaining_seconds)
+                    # 等待期间其他进程可能已经归还
+                    full_port_set.clear()
+                    continue
+                self._increase(port)
+            if not is_distributed:
+                return port
+            # 2. 不持有锁，在 Redis 中加一
+            try:
+                is_acquired = _acquire_redis(port, max_inflight)
+            except Exception:
+                with self._condition:
+                    self._decrease(port)
+                raise
+            if is_acquired:
+                return port
+            # 3. Redis 中已达到上限，撤销本地计数后重试
+            with self._condition:
+                self._decrease(port)
+            full_port_set.add(port)
+
+    def release(self, port: int, is_distributed: bool = False):
+        """
+        @description: 归还端口
+        """
+        with self._condition:
+            if not self._decrease(port):
+                return
+        if is_distributed:
+            _release_redis(port)
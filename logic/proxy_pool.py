@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/proxy_pool.py
+# @DATE: 2026/10/18
+# @TIME: 15:32:10
+#
+# @DESCRIPTION: 代理池快照逻辑
+#   代理池整体构建完成后通过一次引用赋值替换，读取时先取一次快照引用，不需要加锁，也不会读到构建了一半的代理池
+#   快照发布后不再修改：新增代理、增量刷新都写时复制出新快照再替换（只复制代理信息字典和涉及变化的端口列表）
+#   移除代理时只在当前快照上标记（O(1)），读取时跳过；标记的端口超过一定比例或下次写时复制时再真正移除
+#   每个代理的信息是只读的紧凑记录（__slots__，没有实例字典），可以像字典一样按键读取
+
+
+import time
+import random
+from collections.abc import Mapping
+
+from common.logic.proxy_ports import IndexedPortList
+
+
+# 全局变量
+# 随机选择时遇到需要跳过的端口的重试次数，超过后顺序查找
+RANDOM_TRY_COUNT = 8
+# 标记移除的端口超过代理数量的这个比例时写时复制出新快照（均摊到每次移除仍为 O(1)，也避免随机选择频繁选中已移除的端口）
+REMOVED_PORT_FOLD_RATIO = 0.25
+# 代理信息的字段
+PROXY_INFO_FIELD_LIST = ("country_code", "host", "port", "protocol", "exit_ip", "remark", "username", "password")
+PROXY_INFO_FIELD_SET = frozenset(PROXY_INFO_FIELD_LIST)
+
+
+class ProxyInfo(Mapping):
+    """
+    @description: 代理信息（只读的紧凑记录）
+    兼容字典的读取方式：proxy_info["exit_ip"]、proxy_info.get("remark")、dict(proxy_info)
+    proxy_strs 为加载时预先生成的代理字符串，排列方式由 proxy._generate_proxy_strs 决定，不作为字典的键
+    """
+    __slots__ = PROXY_INFO_FIELD_LIST + ("proxy_strs",)
+
+    def __init__(self, country_code, host, port, protocol, exit_ip, remark, username, password, proxy_strs: tuple = ()):
+        self.country_code = country_code
+        self.host = host
+        self.port = port
+        self.protocol = protocol
+        self.exit_ip = exit_ip
+        self.remark = remark
+        self.username = username
+        self.password = password
+        self.proxy_strs = proxy_strs
+
+    def __getitem__(self, key):
+        if key not in PROXY_INFO_FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(PROXY_INFO_FIELD_LIST)
+
+    def __len__(self):
+        return len(PROXY_INFO_FIELD_LIST)
+
+    def __repr__(self):
+        return "ProxyInfo(%r)" % dict(self)
+
+
+class ProxyPoolSnapshot:
+    """
+    @description: 代理池快照
+    """
+    __slots__ = ("port_2_proxy_info_dict", "country_code_2_ports_dict", "all_port_list", "created_at", "attribute_index",
+                 "removed_port_set")
+
+    def __init__(self, country_code_2_ports_dict: dict, port_2_proxy_info_dict: dict, all_port_list: IndexedPortList = None):
+        self.port_2_proxy_info_dict = port_2_proxy_info_dict
+        self.country_code_2_ports_dict = country_code_2_ports_dict
+        self.all_port_list = all_port_list if all_port_list is not None else IndexedPortList(port_2_proxy_info_dict.keys())
+        self.created_at = time.time()
+        # 属性索引（按属性组合筛选时构建，见 proxy._get_attribute_index）
+        self.attribute_index = None
+        # 已标记移除的端口（仍留在字典和端口列表中，读取时跳过），只增加不减少
+        self.removed_port_set = set()
+
+    def __len__(self):
+        return len(self.port_2_proxy_info_dict) - len(self.removed_port_set)
+
+    def get_proxy_info(self, port: int, country_code: str = None):
+        """
+        @description: 获取有效的代理信息
+        @param {type}
+        country_code: 可选，代理不属于该国家时视为无效
+        @return: 代理信息，不存在时返回 None
+        """
+        proxy_info = self.port_2_proxy_info_dict.get(port)
+        if proxy_info is None or port in self.removed_port_set \
+                or (country_code and proxy_info["country_code"] != country_code):
+            return None
+        return proxy_info
+
+    def items(self):
+        """
+        @description: 遍历有效的端口和代理信息（跳过已标记移除的端口）
+        """
+        removed_port_set = self.removed_port_set
+        for port, proxy_info in self.port_2_proxy_info_dict.items():
+            if port not in removed_port_set:
+                yield port, proxy_info
+
+    def get_ports(self, country_code: str = None):
+        """
+        @description: 获取端口列表，未找到国家时返回 None
+        """
+        return self.country_code_2_ports_dict.get(country_code) if country_code else self.all_port_list
+
+    def iter_ports(self, country_code: str = None):
+        """
+        @description: 遍历有效的端口
+        """
+        for port in list(self.get_ports(country_code) or []):
+            if self.get_proxy_info(port, country_code) is not None:
+                yield port
+
+    def random_port(self, country_code: str = None, is_skipped=None):
+        """
+        @description: 随机选择一个有效的端口
+        @param {type}
+        is_skipped: 可选，判断端口是否需要跳过的函数
+        @return: 端口，没有有效端口时返回 None
+        """
+        ports = self.get_ports(country_code)
+        if not ports:
+            return None
+        # 1. 随机尝试（只有需要跳过的端口会导致重试，通常一两次就能选中）
+        for _ in range(RANDOM_TRY_COUNT):
+            port = ports.random_choice()
+            if port is not None and self.get_proxy_info(port, country_code) is not None \
+                    and not (is_skipped and is_skipped(port)):
+                return port
+        # 2. 随机尝试都失败时从随机位置开始顺序查找
+        port_list = list(ports)
+        offset = random.randrange(len(port_list)) if port_list else 0
+        for port in port_list[offset:] + port_list[:offset]:
+            if self.get_proxy_info(port, country_code) is not None and not (is_skipped and is_skipped(port)):
+                return port
+        return None
+
+    def mark_removed(self, port: int):
+        """
+        @description: 标记移除端口，不复制快照（O(1)，需要持有 proxy.PROXY_POOL_LOCK）
+        @return: 被移除的代理信息，不存在或已经移除时返回 None
+        """
+        proxy_info = self.get_proxy_info(port)
+        if proxy_info is not None:
+            self.removed_port_set.add(port)
+        return proxy_info
+
+    def is_fold_needed(self) -> bool:
+        """
+        @description: 标记移除的端口是否已经多到需要写时复制出新快照
+        """
+        return len(self.removed_port_set) > len(self.port_2_proxy_info_dict) * REMOVED_PORT_FOLD_RATIO
+
+    def apply_changes(self, port_2_upserted_proxy_info: dict = None, removed_ports=None):
+        """
+        @description: 写时复制：生成应用了增删后的新快照（标记移除的端口一并真正移除），当前快照不变
+        其他国家的端口列表与当前快照共用（发布后不再修改），属性索引由调用方决定是否沿用
+        @param {type}
+        port_2_upserted_proxy_info: 新增或更新的代理信息 {端口: 代理信息}
+        removed_ports: 移除的端口（不存在的忽略）
+        @return: 新快照
+        """
+        port_2_proxy_info_dict = dict(self.port_2_proxy_info_dict)
+        country_code_2_ports_dict = dict(self.country_code_2_ports_dict)
+        all_port_list = self.all_port_list.copy()
+        copied_country_code_set = set()
+
+        def _get_copied_ports(country_code):
+            if country_code not in copied_country_code_set:
+                ports = country_code_2_ports_dict.get(country_code)
+                country_code_2_ports_dict[country_code] = ports.copy() if ports is not None else IndexedPortList()
+                copied_country_code_set.add(country_code)
+            return country_code_2_ports_dict[country_code]
+
+        # 1. 移除（包括已标记移除的端口）
+        for port in self.removed_port_set.union(removed_ports or ()):
+            proxy_info = port_2_proxy_info_dict.pop(port, None)
+            if proxy_info is not None:
+                _get_copied_ports(proxy_info["country_code"]).remove(port)
+                all_port_list.remove(port)
+        # 2. 新增或更新（国家变化时从旧国家的列表中移除）
+        for port, proxy_info in (port_2_upserted_proxy_info or {}).items():
+            old_proxy_info = port_2_proxy_info_dict.get(port)
+            if old_proxy_info is not None and old_proxy_info["country_code"] != proxy_info["country_code"]:
+                _get_copied_ports(old_proxy_info["country_code"]).remove(port)
+            if old_proxy_info is None or old_proxy_info["country_code"] != proxy_info["country_code"]:
+                _get_copied_ports(proxy_info["country_code"]).append(port)
+            all_port_list.append(port)
+            port_2_proxy_info_dict[port] = proxy_info
+        # 3. 去掉变空的国家
+        for country_code in copied_country_code_set:
+            if not country_code_2_ports_dict[country_code]:
+                del country_code_2_ports_dict[country_code]
+        return ProxyPoolSnapshot(country_code_2_ports_dict, port_2_proxy_info_dict, all_port_list)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/proxy_ports.py
+# @DATE: 2026/10/18
+# @TIME: 11:03:47
+#
+# @DESCRIPTION: 代理端口列表逻辑
+#   端口数组 + 端口到下标的反向索引，删除时与末尾交换，增删查和随机选择均为 O(1)
+
+
+import random
+
+
+class IndexedPortList:
+    """
+    @description: 带反向索引的端口列表
+    可以像列表一样 len()、遍历、下标访问以及 random.choice()，但不保证顺序
+    """
+    __slots__ = ("_ports", "_port_2_slot")
+
+    def __init__(self, ports: list = None):
+        self._ports = []
+        self._port_2_slot = {}
+        for port in ports or []:
+            self.append(port)
+
+    def __len__(self):
+        return len(self._ports)
+
+    def __iter__(self):
+        return iter(self._ports)
+
+    def __getitem__(self, slot):
+        return self._ports[slot]
+
+    def __contains__(self, port):
+        return port in self._port_2_slot
+
+    def __repr__(self):
+        return "IndexedPortList(%r)" % self._ports
+
+    def append(self, port: int):
+        """
+        @description: 添加端口（已存在时忽略）
+        """
+        if port in self._port_2_slot:
+            return
+        self._port_2_slot[port] = len(self._ports)
+        self._ports.append(port)
+
+    def remove(self, port: int) -> bool:
+        """
+        @description: 移除端口，把末尾的端口移到被删除的位置
+        @return: 是否存在并被移除
+        """
+        slot = self._port_2_slot.pop(port, None)
+        if slot is None:
+            return False
+        last_port = self._ports.pop()
+        if slot < len(self._ports):
+            self._ports[slot] = last_port
+            self._port_2_slot[last_port] = slot
+        return True
+
+    def copy(self):
+        """
+        @description: 复制（只复制数组和反向索引，不逐个添加）
+        """
+        port_list = IndexedPortList()
+        port_list._ports = list(self._ports)
+        port_list._port_2_slot = dict(self._port_2_slot)
+        return port_list
+
+    def index(self, port: int) -> int:
+        """
+        @description: 获取端口所在的下标
+        """
+        return self._port_2_slot[port]
+
+    def random_choice(self):
+        """
+        @description: 随机选择一个端口，为空时返回 None
+        """
+        if not self._ports:
+            return None
+        return self._ports[random.randrange(len(self._ports))]
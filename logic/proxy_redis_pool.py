@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/proxy_redis_pool.py
+# @DATE: 2026/10/18
+# @TIME: 11:41:09
+#
+# @DESCRIPTION: Redis 共享代理池逻辑
+#   由一个进程发布带版本号的代理池快照，其他进程按版本号同步或直接在 Redis 中选择代理
+#   Redis 键：
+#     common:proxy_pool:version                      当前版本号
+#     common:proxy_pool:{version}:info               Hash，端口 -> 代理信息 JSON
+#     common:proxy_pool:{version}:ports:{国家代码}    Set，国家的端口
+#     common:proxy_pool:{version}:ports              Set，全部端口
+#     common:proxy_pool:{version}:keys               Set，该版本的全部键（含自身），旧版本按它设置过期，不需要扫描键空间
+#     common:proxy_pool:banned_exit_ips              ZSet，出口 IP -> 禁用过期时间戳
+
+
+import json
+import time
+
+from common.config import CONFIG
+from common import redis
+
+
+# 全局变量
+# 使用的 Redis 数据库
+REDIS_DB = CONFIG["proxy"].get("redis_db", CONFIG["redis"]["db"])
+# 键前缀
+REDIS_KEY_PREFIX = "common:proxy_pool"
+# 版本号键
+VERSION_REDIS_KEY = REDIS_KEY_PREFIX + ":version"
+# 禁用出口 IP 键
+BANNED_EXIT_IPS_REDIS_KEY = REDIS_KEY_PREFIX + ":banned_exit_ips"
+# 旧版本快照保留时间（秒），保证正在同步的进程能读完
+OLD_VERSION_EXPIRE_SECONDS = 120
+# 代理信息中需要共享的字段
+PROXY_INFO_KEYS = ("country_code", "host", "port", "protocol", "exit_ip", "remark")
+# 在 Redis 中选择代理时版本号恰好切换的重试次数
+PICK_RETRY_COUNT = 3
+# 在 Redis 中选择代理的 LUA 脚本：随机取若干端口，返回第一个出口 IP 未被禁用的代理信息
+#   用到的键全部通过 KEYS 传入（版本号、端口集合、代理信息、禁用出口 IP），版本号在调用前读取
+#   KEYS[1] 中的版本号与 ARGV[1] 不一致时（期间发布了新版本）返回 0，由调用方重试
+PICK_LUA_SCRIPT = """
+if redis.call('get', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+local now = tonumber(ARGV[3])
+local ports = redis.call('srandmember', KEYS[2], tonumber(ARGV[2]))
+for _, port in ipairs(ports) do
+    local info = redis.call('hget', KEYS[3], port)
+    if info then
+        local expire_at = redis.call('zscore', KEYS[4], cjson.decode(info)['exit_ip'])
+        if (not expire_at) or tonumber(expire_at) <= now then
+            return info
+        end
+    end
+end
+return false
+"""
+
+
+def _get_version_key(version, suffix: str) -> str:
+    return "{}:{}:{}".format(REDIS_KEY_PREFIX, version, suffix)
+
+def get_version():
+    """
+    @description: 获取当前快照版本号
+    @return: 版本号，未发布时返回 None
+    """
+    version = redis.get_connetion(db=REDIS_DB).get(VERSION_REDIS_KEY)
+    return int(version) if version else None
+
+def publish(port_2_proxy_info_dict: dict) -> int:
+    """
+    @description: 发布代理池快照，新版本写完后再切换版本号
+    @return: 新版本号
+    """
+    redis_conn = redis.get_connetion(db=REDIS_DB)
+    # 1. 生成新版本号（毫秒时间戳，保证递增）
+    old_version = get_version()
+    version = max(int(time.time() * 1000), (old_version or 0) + 1)
+    # 2. 写入代理信息和国家端口集合
+    info_key = _get_version_key(version, "info")
+    all_ports_key = _get_version_key(version, "ports")
+    keys_key = _get_version_key(version, "keys")
+    country_code_2_ports = {}
+    pipeline = redis_conn.pipeline(transaction=True)
+    info_mapping = {}
+    for port, proxy_info in port_2_proxy_info_dict.items():
+        info_mapping[port] = json.dumps({key: proxy_info[key] for key in PROXY_INFO_KEYS})
+        country_code_2_ports.setdefault(proxy_info["country_code"], []).append(port)
+    if info_mapping:
+        pipeline.hset(info_key, mapping=info_mapping)
+        pipeline.sadd(all_ports_key, *info_mapping.keys())
+    country_ports_keys = [_get_version_key(version, "ports:" + country_code) for country_code in country_code_2_ports]
+    for country_ports_key, ports in zip(country_ports_keys, country_code_2_ports.values()):
+        pipeline.sadd(country_ports_key, *ports)
+    # 2.1 记录该版本的全部键
+    pipeline.sadd(keys_key, keys_key, info_key, all_ports_key, *country_ports_keys)
+    # 3. 切换版本号
+    pipeline.set(VERSION_REDIS_KEY, version)
+    pipeline.execute()
+    # 4. 旧版本延迟过期
+    if old_version:
+        expire_version(old_version, OLD_VERSION_EXPIRE_SECONDS)
+    # 5. 返回版本号
+    return version
+
+def expire_version(version: int, seconds: int):
+    """
+    @description: 让某个版本的全部键在指定秒数后过期
+    没有键集合的版本（旧格式）只能找到代理信息和全部端口两个键
+    """
+    redis_conn = redis.get_connetion(db=REDIS_DB)
+    keys_key = _get_version_key(version, "keys")
+    keys = redis_conn.smembers(keys_key) or {_get_version_key(version, "info"), _get_version_key(version, "ports")}
+    pipeline = redis_conn.pipeline(transaction=False)
+    for key in keys:
+        pipeline.expire(key, seconds)
+    pipeline.execute()
+
+def load(version: int) -> dict:
+    """
+    @description: 读取某个版本的全部代理信息
+    @return: 端口到代理信息的映射
+    """
+    info_mapping = redis.get_connetion(db=REDIS_DB).hgetall(_get_version_key(version, "info"))
+    return {int(port): json.loads(proxy_info_json) for port, proxy_info_json in info_mapping.items()}
+
+def pick(country_code: str = None, sample_size: int = 16):
+    """
+    @description: 直接在 Redis 中选择一个出口 IP 未被禁用的代理
+    @return: 代理信息，没有可用代理时返回 None
+    """
+    redis_conn = redis.get_connetion(db=REDIS_DB)
+    for _ in range(PICK_RETRY_COUNT):
+        # 1. 读取版本号，拼出该版本的键
+        version = get_version()
+        if not version:
+            return None
+        ports_key = _get_version_key(version, "ports:" + country_code if country_code else "ports")
+        info_key = _get_version_key(version, "info")
+        # 2. 选择代理，版本号已切换时重新读取
+        proxy_info_json = redis_conn.eval(
+            PICK_LUA_SCRIPT, 4, VERSION_REDIS_KEY, ports_key, info_key, BANNED_EXIT_IPS_REDIS_KEY,
+            version, sample_size, time.time())
+        if proxy_info_json != 0:
+            return json.loads(proxy_info_json) if proxy_info_json else None
+    return None
+
+def ban_exit_ip(exit_ip: str, ttl: int):
+    """
+    @description: 禁用出口 IP，所有进程共享
+    """
+    redis_conn = redis.get_connetion(db=REDIS_DB)
+    redis_conn.zadd(BANNED_EXIT_IPS_REDIS_KEY, {exit_ip: time.time() + ttl})
+
+def get_banned_exit_ip_2_expire_at() -> dict:
+    """
+    @description: 获取仍在禁用期内的出口 IP，并清理已过期的记录
+    @return: 出口 IP 到禁用过期时间戳的映射
+    """
+    redis_conn = redis.get_connetion(db=REDIS_DB)
+    now = time.time()
+    redis_conn.zremrangebyscore(BANNED_EXIT_IPS_REDIS_KEY, "-inf", now)
+    return dict(redis_conn.zrangebyscore(BANNED_EXIT_IPS_REDIS_KEY, now, "+inf", withscores=True))
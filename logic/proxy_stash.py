@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/proxy_stash.py
+# @DATE: 2026/10/18
+# @TIME: 16:58:02
+#
+# @DESCRIPTION: 代理池本地暂存逻辑
+#   把最近一次成功加载的代理池保存到本地暂存数据库（common/stash/common.db），
+#   进程启动时 PostgreSQL 较慢或不可用也能先使用本地快照
+#   表：
+#     proxy_pool_snapshot        快照版本、格式版本、创建时间、加载条件
+#     proxy_pool_snapshot_proxy  快照中的代理
+
+
+import json
+import time
+
+from common import stash
+
+
+# 全局变量
+# 暂存数据库路径
+STASH_DATABASE_PATH = stash.STASH_DATABASE_PATH
+# 快照格式版本，字段变化时加一，旧格式的快照不再使用
+SNAPSHOT_FORMAT_VERSION = 1
+# 保留的快照数量
+KEEP_SNAPSHOT_COUNT = 2
+# 写入时等待其他进程释放锁的时间（秒）
+LOCK_TIMEOUT_SECONDS = 30
+
+
+def _init_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS proxy_pool_snapshot (
+            version INTEGER PRIMARY KEY,
+            format_version INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            condition_json TEXT NOT NULL,
+            proxy_count INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS proxy_pool_snapshot_proxy (
+            version INTEGER NOT NULL,
+            country_code TEXT,
+            host TEXT,
+            port INTEGER NOT NULL,
+            protocol TEXT,
+            exit_ip TEXT,
+            remark TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS proxy_pool_snapshot_proxy_version_index
+            ON proxy_pool_snapshot_proxy (version)
+    """)
+
+def _dump_condition(condition: dict) -> str:
+    return json.dumps(condition, sort_keys=True, ensure_ascii=False)
+
+def save(port_2_proxy_info_dict: dict, condition: dict, db_path: str = None) -> int:
+    """
+    @description: 保存代理池快照，只保留最近 KEEP_SNAPSHOT_COUNT 个
+    @param {type}
+    condition: 加载代理池时使用的条件，读取时条件不一致的快照不会被使用
+    @return: 快照版本（毫秒时间戳）
+    """
+    conn, cursor = stash.init_database(db_path or STASH_DATABASE_PATH)
+    conn.execute("PRAGMA busy_timeout = %d" % (LOCK_TIMEOUT_SECONDS * 1000))
+    try:
+        # 1. 建表
+        _init_tables(cursor)
+        # 2. 生成版本号（毫秒时间戳，保证递增）
+        cursor.execute("SELECT MAX(version) FROM proxy_pool_snapshot")
+        old_version = cursor.fetchone()[0]
+        version = max(int(time.time() * 1000), (old_version or 0) + 1)
+        # 3. 写入快照（同一个事务，读取方不会读到写了一半的快照）
+        cursor.execute(
+            "INSERT INTO proxy_pool_snapshot VALUES (?, ?, ?, ?, ?)",
+            (version, SNAPSHOT_FORMAT_VERSION, time.time(), _dump_condition(condition), len(port_2_proxy_info_dict)))
+        cursor.executemany(
+            "INSERT INTO proxy_pool_snapshot_proxy VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((version, proxy_info["country_code"], proxy_info["host"], port, proxy_info["protocol"],
+              proxy_info["exit_ip"], proxy_info["remark"]) for port, proxy_info in port_2_proxy_info_dict.items()))
+        # 4. 删除旧快照
+        cursor.execute(
+            "SELECT version FROM proxy_pool_snapshot ORDER BY version DESC LIMIT -1 OFFSET ?", (KEEP_SNAPSHOT_COUNT,))
+        old_versions = [(row[0],) for row in cursor.fetchall()]
+        cursor.executemany("DELETE FROM proxy_pool_snapshot_proxy WHERE version = ?", old_versions)
+        cursor.executemany("DELETE FROM proxy_pool_snapshot WHERE version = ?", old_versions)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        stash.close_database(conn, cursor)
+    return version
+
+def load(condition: dict, max_age_seconds: float, db_path: str = None):
+    """
+    @description: 读取条件一致且未过期的最新快照
+    @return: (版本, 创建时间, [(country_code, host, port, protocol, exit_ip, remark), ...])，没有可用快照时返回 None
+    """
+    conn, cursor = stash.init_database(db_path or STASH_DATABASE_PATH)
+    try:
+        _init_tables(cursor)
+        cursor.execute("""
+            SELECT version, created_at FROM proxy_pool_snapshot
+            WHERE format_version = ? AND condition_json = ? AND created_at >= ?
+            ORDER BY version DESC LIMIT 1
+        """, (SNAPSHOT_FORMAT_VERSION, _dump_condition(condition), time.time() - max_age_seconds))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        version, created_at = row
+        cursor.execute("""
+            SELECT country_code, host, port, protocol, exit_ip, remark
+            FROM proxy_pool_snapshot_proxy WHERE version = ?
+        """, (version,))
+        return version, created_at, cursor.fetchall()
+    finally:
+        stash.close_database(conn, cursor)
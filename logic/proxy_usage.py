@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/logic/proxy_usage.py
+# @DATE: 2026/10/18
+# @TIME: 18:05:12
+#
+# @DESCRIPTION: 代理用量统计逻辑
+#   每个线程只修改自己的累计计数（不加锁、不会丢失），汇总时与上次汇总的累计值相减得到增量
+#   上报使用结果时健康度也先这样计数（PortResultCounter），由后台线程汇总后批量更新评分器，上报不加锁
+#   增量可以先累加到 Redis（多个进程共用），再由一个进程定时批量写入 PostgreSQL
+#   Redis 键：
+#     common:proxy_usage:pending    Hash，"{端口}:{计数名}" -> 未写入数据库的增量
+#   表：
+#     pp_proxy_usage                按端口和日期累计的请求数、失败数、字节数
+
+
+import threading
+
+from sqlalchemy import text
+
+from common.config import CONFIG
+
+
+# 全局变量
+# Redis 汇总使用的数据库和键
+REDIS_DB = CONFIG["proxy"].get("redis_db", CONFIG["redis"]["db"])
+PENDING_REDIS_KEY = "common:proxy_usage:pending"
+# 计数名（与计数列表的下标对应）
+COUNT_NAME_LIST = ["request", "failure", "byte"]
+# 每次写入数据库的最大行数
+UPSERT_BATCH_SIZE = 1000
+# 原子读取并删除 Redis 中增量的 LUA 脚本
+POP_LUA_SCRIPT = """
+local values = redis.call('hgetall', KEYS[1])
+redis.call('del', KEYS[1])
+return values
+"""
+# 建表语句
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS pp_proxy_usage (
+        port INTEGER NOT NULL,
+        usage_date DATE NOT NULL,
+        request_count BIGINT NOT NULL DEFAULT 0,
+        failure_count BIGINT NOT NULL DEFAULT 0,
+        byte_count BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (port, usage_date)
+    )
+"""
+# 批量累加语句
+UPSERT_SQL = """
+    INSERT INTO pp_proxy_usage (port, usage_date, request_count, failure_count, byte_count, updated_at)
+    SELECT
+        v.port, CURRENT_DATE, v.request_count, v.failure_count, v.byte_count, NOW()
+    FROM
+        unnest(CAST(:ports AS INTEGER[]), CAST(:request_counts AS BIGINT[]),
+               CAST(:failure_counts AS BIGINT[]), CAST(:byte_counts AS BIGINT[]))
+            AS v(port, request_count, failure_count, byte_count)
+    ON CONFLICT (port, usage_date) DO UPDATE SET
+        request_count = pp_proxy_usage.request_count + EXCLUDED.request_count,
+        failure_count = pp_proxy_usage.failure_count + EXCLUDED.failure_count,
+        byte_count = pp_proxy_usage.byte_count + EXCLUDED.byte_count,
+        updated_at = NOW()
+"""
+
+
+def merge_counts(port_2_counts: dict, other_port_2_counts: dict):
+    """
+    @description: 把 other_port_2_counts 累加到 port_2_counts 中
+    """
+    for port, other_counts in other_port_2_counts.items():
+        counts = port_2_counts.get(port)
+        if counts is None:
+            port_2_counts[port] = list(other_counts)
+        else:
+            for i, count in enumerate(other_counts):
+                counts[i] += count
+
+
+class PortUsageCounter:
+    """
+    @description: 端口用量计数器
+    记录时只修改当前线程自己的计数（不加锁）；汇总时加锁，只与其他汇总互斥
+    """
+    def __init__(self, count_size: int = len(COUNT_NAME_LIST)):
+        """
+        @description: 初始化
+        @param {type}
+        count_size: 每个端口的计数个数（子类记录其他计数时修改）
+        """
+        self.count_size = count_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # 格式：[[线程, {端口: [请求数, 失败数, 字节数]}（累计）, {端口: (请求数, 失败数, 字节数)}（已汇总的累计）], ...]
+        #   子类的计数列表见子类说明
+        self._thread_entries = []
+        # 写入失败退回的增量，下次汇总时合并
+        self._restored_port_2_counts = {}
+
+    def _register(self) -> dict:
+        port_2_counts = {}
+        self._local.port_2_counts = port_2_counts
+        with self._lock:
+            self._thread_entries.append([threading.current_thread(), port_2_counts, {}])
+        return port_2_counts
+
+    def _get_counts(self, port: int) -> list:
+        """
+        @description: 获取当前线程中端口的累计计数（只由当前线程修改）
+        """
+        try:
+            port_2_counts = self._local.port_2_counts
+        except AttributeError:
+            port_2_counts = self._register()
+        counts = port_2_counts.get(port)
+        if counts is None:
+            counts = port_2_counts[port] = [0] * self.count_size
+        return counts
+
+    def record(self, port: int, is_success: bool = True, byte_count: int = 0):
+        """
+        @description: 记录一次使用
+        """
+        counts = self._get_counts(port)
+        counts[0] += 1
+        if not is_success:
+            counts[1] += 1
+        if byte_count:
+            counts[2] += byte_count
+
+    def collect(self) -> dict:
+        """
+        @description: 汇总自上次汇总以来的增量（已退出线程的计数汇总后丢弃）
+        @return: {端口: [请求数, 失败数, 字节数]}
+        """
+        port_2_delta_counts = {}
+        empty_counts = (0,) * self.count_size
+        with self._lock:
+            alive_thread_entries = []
+            for thread_entry in self._thread_entries:
+                thread, port_2_counts, port_2_collected_counts = thread_entry
+                # 先判断线程是否已退出，退出后的计数不会再变化，本次汇总完即可丢弃
+                is_alive = thread.is_alive()
+                for port, counts in list(port_2_counts.items()):
+                    counts = tuple(counts)
+                    collected_counts = port_2_collected_counts.get(port, empty_counts)
+                    if counts == collected_counts:
+                        continue
+                    port_2_collected_counts[port] = counts
+                    delta_counts = [count - collected_count for count, collected_count in zip(counts, collected_counts)]
+                    merge_counts(port_2_delta_counts, {port: delta_counts})
+                if is_alive:
+                    alive_thread_entries.append(thread_entry)
+            self._thread_entries = alive_thread_entries
+            merge_counts(port_2_delta_counts, self._restored_port_2_counts)
+            self._restored_port_2_counts = {}
+        return port_2_delta_counts
+
+    def restore(self, port_2_delta_counts: dict):
+        """
+        @description: 退回写入失败的增量，下次汇总时重新写入
+        """
+        with self._lock:
+            merge_counts(self._restored_port_2_counts, port_2_delta_counts)
+
+
+class PortResultCounter(PortUsageCounter):
+    """
+    @description: 端口使用结果计数器（健康度使用），计数为 [次数, 失败次数, 延迟总和（秒）, 有延迟的次数]
+    """
+    def __init__(self):
+        super().__init__(count_size=4)
+
+    def record(self, port: int, is_success: bool = True, latency: float = None):
+        """
+        @description: 记录一次使用结果
+        """
+        counts = self._get_counts(port)
+        counts[0] += 1
+        if not is_success:
+            counts[1] += 1
+        if latency is not None:
+            counts[2] += latency
+            counts[3] += 1
+
+
+def push_to_redis(port_2_delta_counts: dict):
+    """
+    @description: 增量累加到 Redis
+    """
+    from common import redis
+    redis_conn = redis.get_connetion(db=REDIS_DB)
+    pipeline = redis_conn.pipeline(transaction=False)
+    for port, counts in port_2_delta_counts.items():
+        for count_name, count in zip(COUNT_NAME_LIST, counts):
+            if count:
+                pipeline.hincrby(PENDING_REDIS_KEY, "%s:%s" % (port, count_name), count)
+    pipeline.execute()
+
+def pop_from_redis() -> dict:
+    """
+    @description: 原子读取并删除 Redis 中的全部增量
+    @return: {端口: [请求数, 失败数, 字节数]}
+    """
+    from common import redis
+    redis_conn = redis.get_connetion(db=REDIS_DB)
+    values = redis_conn.eval(POP_LUA_SCRIPT, 1, PENDING_REDIS_KEY)
+    port_2_delta_counts = {}
+    for i in range(0, len(values), 2):
+        field = values[i].decode() if isinstance(values[i], bytes) else values[i]
+        port, count_name = field.split(":", 1)
+        counts = port_2_delta_counts.setdefault(int(port), [0, 0, 0])
+        counts[COUNT_NAME_LIST.index(count_name)] += int(values[i + 1])
+    return port_2_delta_counts
+
+def init_table(session):
+    """
+    @description: 建表（已存在时忽略）
+    """
+    session.execute(text(CREATE_TABLE_SQL))
+    session.commit()
+
+def upsert(session, port_2_delta_counts: dict):
+    """
+    @description: 增量分批累加到 PostgreSQL（按当天日期），全部成功后提交
+    """
+    items = list(port_2_delta_counts.items())
+    for i in range(0, len(items), UPSERT_BATCH_SIZE):
+        batch_items = items[i:i + UPSERT_BATCH_SIZE]
+        session.execute(text(UPSERT_SQL), {
+            "ports": [port for port, _ in batch_items],
+            "request_counts": [counts[0] for _, counts in batch_items],
+            "failure_counts": [counts[1] for _, counts in batch_items],
+            "byte_counts": [counts[2] for _, counts in batch_items]
+        })
+    session.commit()
@@ -10,35 +10,161 @@
 #   使用 port 作为每个代理的主键
 
 
-import base64
+import sys
+import time
 import random
+import datetime
+import base64
+import asyncio
+import threading
+import contextlib
 import cachetools
+from urllib.parse import urlsplit
 from sqlalchemy import text
 
 from common.config import CONFIG
 from common.logger import COMMON_LOGGER as LOGGER
 from common.Base import init_db
+from common.logic.proxy_health import ProxyHealthScorer, RESCORE_INTERVAL_SECONDS
+from common.logic.proxy_ports import IndexedPortList
+from common.logic.proxy_hash_ring import ConsistentHashRing
+from common.logic.proxy_lease import PortLeaseCounter
+from common.logic.proxy_pool import ProxyInfo, ProxyPoolSnapshot, RANDOM_TRY_COUNT
+from common.logic.periodic_refresher import PeriodicRefresher
+from common.logic.proxy_columnar import ColumnarProxyPool
+from common.logic.proxy_index import ProxyAttributeIndex
+from common.logic.proxy_usage import PortUsageCounter, PortResultCounter
+from common.logic import proxy_redis_pool
+from common.logic import proxy_health_check
+from common.logic import proxy_stash
+from common.logic import proxy_usage
 
 
 # === 全局变量 ===
-# 端口到代理信息的映射
-#   格式：{30001: {"country_code": $country_code, "host": $host, "port": $port, "protocol": $protocol, "exit_ip": $exit_ip, "remark": $remark}, ...}
-PORT_2_PROXY_INFO_DICT = {}
-# 国家代码到代理字符串列表的映射
-#   格式：{"CN": [30001, 30002, ...], "US": [30003, 30004, ...], ...}
-COUNTRY_CODE_2_PORTS_DICT = {}
-# 被禁用的出口 IP，30 分钟过期
-BANNED_EXIT_IP_CACHE = cachetools.TTLCache(maxsize=1000, ttl=1800)
+# 当前代理池快照，构建完成后整体替换；读取时先取一次引用，不需要加锁
+PROXY_POOL = ProxyPoolSnapshot({}, {})
+# 修改代理池（替换快照、增删单个代理）时使用的锁，读取不需要
+PROXY_POOL_LOCK = threading.RLock()
+# 以下三个变量随每次替换快照一起指向新快照中的对象（快照发布后不再修改），仅为兼容旧代码保留，新代码请使用 PROXY_POOL
+# 移除代理时只在快照上标记，下次生成新快照前这三个变量中仍包含已移除的端口，判断是否有效请使用 PROXY_POOL.get_proxy_info
+# 端口到代理信息（只读的 ProxyInfo 记录，可以像字典一样读取）的映射
+#   格式：{30001: ProxyInfo({"country_code": $country_code, "host": $host, "port": $port, "protocol": $protocol, "exit_ip": $exit_ip,
+#                            "remark": $remark, "username": $username, "password": $password}), ...}
+PORT_2_PROXY_INFO_DICT = PROXY_POOL.port_2_proxy_info_dict
+# 国家代码到代理端口列表的映射（端口列表带反向索引，删除和随机选择为 O(1)）
+#   格式：{"CN": IndexedPortList([30001, 30002, ...]), "US": IndexedPortList([30003, 30004, ...]), ...}
+COUNTRY_CODE_2_PORTS_DICT = PROXY_POOL.country_code_2_ports_dict
+# 全部代理端口列表，未指定国家时随机选择使用
+ALL_PORT_LIST = PROXY_POOL.all_port_list
+# 出口 IP 的禁用时间（秒）
+BANNED_EXIT_IP_TTL_SECONDS = 1800
+# 被禁用的出口 IP，值为过期时间戳，到期后自动移除（从 Redis 同步的按其他进程禁用时的过期时间，不会重新计时）
+#   格式：{$exit_ip: $expire_at, ...}，通过 _set_banned_exit_ip 写入
+#   兼容旧的写法 BANNED_EXIT_IP_CACHE[$exit_ip] = True，值为 True 时按 BANNED_EXIT_IP_TTL_SECONDS 过期
+def _get_banned_exit_ip_expire_at(exit_ip: str, expire_at, now: float) -> float:
+    return now + BANNED_EXIT_IP_TTL_SECONDS if expire_at is True else expire_at
+BANNED_EXIT_IP_CACHE = cachetools.TLRUCache(maxsize=1000, ttu=_get_banned_exit_ip_expire_at, timer=time.time)
+# 只在指定目标网站（范围）下被禁用的出口 IP，30 分钟过期，其他网站仍可使用
+#   格式：{($scope, $exit_ip): True, ...}，范围字符串经过 sys.intern，出口 IP 与代理信息共用同一个字符串对象
+SCOPED_BANNED_EXIT_IP_CACHE = cachetools.TTLCache(maxsize=100000, ttl=1800)
+# 代理健康度评分器，按健康度加权选择端口
+PROXY_HEALTH_SCORER = ProxyHealthScorer()
+# 健康度定时重算线程（第一次替换代理池时启动，选择代理时不重算）
+HEALTH_RESCORER = PeriodicRefresher(
+    PROXY_HEALTH_SCORER.rescore, RESCORE_INTERVAL_SECONDS, 0, "proxy_health_rescore", "共通 Proxy")
+# 上报的使用结果（每个线程无锁计数），由后台线程每隔 health_apply_interval_seconds 秒批量更新健康度
+PROXY_RESULT_COUNTER = PortResultCounter()
+HEALTH_APPLY_INTERVAL_SECONDS = CONFIG["proxy"].get("health_apply_interval_seconds", 1)
+HEALTH_APPLIER = PeriodicRefresher(
+    lambda: apply_proxy_results(), HEALTH_APPLY_INTERVAL_SECONDS, 0, "proxy_health_apply", "共通 Proxy")
+# 国家代码到一致性哈希环的映射（会话粘滞使用，第一次使用时构建，None 为全部代理），只在 PROXY_POOL_LOCK 内修改
+COUNTRY_CODE_2_HASH_RING_DICT = {}
+# 端口并发租约计数器（按国家分桶，第一次租用时构建，None 为全部代理）
+PORT_LEASE_COUNTER = PortLeaseCounter(
+    lambda country_code: PROXY_POOL.iter_ports(country_code),
+    lambda port: (PROXY_POOL.get_proxy_info(port) or {}).get("country_code"))
 # 混淆密钥
 OBFS_KEY = CONFIG["proxy"]["obfs_key"]
 # 转发 Host
 FORWARDER_HOST = CONFIG["proxy"]["forwarder_host"]
+# 加载代理池时预先生成代理字符串的协议（代理自身的协议总会生成）
+PRECOMPUTED_PROTOCOL_LIST = ["socks5", "http"]
+# 预先生成的协议在 ProxyInfo.proxy_strs 中的位置（直连、转发各占一位，代理自身的其他协议排在最后）
+PRECOMPUTED_PROTOCOL_2_SLOT = {protocol: i * 2 for i, protocol in enumerate(PRECOMPUTED_PROTOCOL_LIST)}
+# 加载代理池时每批从服务端游标读取的行数
+LOAD_BATCH_SIZE = 10000
+# 健康检查时通过代理请求的出口 IP 回显地址
+HEALTH_CHECK_URL = CONFIG["proxy"].get("health_check_url", "http://api.ipify.org/")
+# 健康检查连续失败多少次后才移除代理、在 pp_proxy 中标记为不可用（偶发的超时不影响数据库）
+HEALTH_CHECK_MAX_FAILURE_COUNT = CONFIG["proxy"].get("health_check_max_failure_count", 3)
+# 端口连续健康检查失败的次数，成功后清零
+PORT_2_HEALTH_CHECK_FAILURE_COUNT = {}
 # 上次初始化时使用的参数
 LAST_IS_EXIT_IP_REMOVE_DUPLICATE = True
 LAST_COUNTRY_CODE_LIST = []
 LAST_REMARK_LIKE_STR_LIST = []
+# 增量刷新的高水位（上次刷新前 pp_proxy 的最大更新时间）
+LAST_HIGH_WATER_MARK = None
+# pp_proxy 是否有 updated_at 和 created_at 列（第一次使用时检测，没有时不增量刷新，健康检查也不写 updated_at）
+# 开启增量刷新前需要手动添加：
+#   ALTER TABLE pp_proxy ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT NOW();
+#   ALTER TABLE pp_proxy ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT NOW();
+# 其他写入 pp_proxy 的程序修改行时需要同时更新 updated_at，否则增量刷新读不到这些变化
+IS_UPDATED_AT_SUPPORTED = None
+# 增量刷新时从高水位往前多读的秒数：updated_at 取事务开始时间，提交较晚的事务写入的行可能早于已记录的高水位
+INCREMENTAL_OVERLAP_SECONDS = CONFIG["proxy"].get("incremental_overlap_seconds", 60)
+# 连续增量刷新多少次后改为一次全量刷新（pp_ip 国家变化、出口 IP 去重后胜出的代理消失等增量查询不到的变化）
+FULL_REFRESH_INTERVAL_COUNT = CONFIG["proxy"].get("full_refresh_interval_count", 12)
+# 上次全量加载后已经连续增量刷新的次数
+INCREMENTAL_REFRESH_COUNT = 0
+# 是否使用 Redis 共享代理池（由 init_proxy_pool_from_redis 开启）
+IS_REDIS_POOL_ENABLED = False
+# 本地已同步的 Redis 代理池版本号
+REDIS_POOL_VERSION = None
+# 上次检查 Redis 代理池版本号的时间，以及检查间隔（秒）
+REDIS_POOL_SYNCED_AT = 0
+REDIS_POOL_SYNC_INTERVAL_SECONDS = 5
+# 后台自动刷新的间隔和随机抖动（秒）
+AUTO_REFRESH_INTERVAL_SECONDS = CONFIG["proxy"].get("auto_refresh_interval_seconds", 300)
+AUTO_REFRESH_JITTER_SECONDS = CONFIG["proxy"].get("auto_refresh_jitter_seconds", 30)
+# 后台自动刷新线程（由 start_auto_refresh 创建）
+AUTO_REFRESHER = None
+# 是否在每次成功加载后把代理池暂存到本地（init_proxy_pool_from_stash 会开启）
+IS_STASH_ENABLED = CONFIG["proxy"].get("is_stash_enabled", False)
+# 本地暂存快照的最长使用期限（秒），超过后不再用于启动
+STASH_MAX_AGE_SECONDS = CONFIG["proxy"].get("stash_max_age_seconds", 86400)
+# 是否使用列式代理池（内存占用约为 ProxyInfo 记录的 1/20），开启后加载、刷新代理池时只构建列式代理池
+#   列式代理池只支持按国家代码获取代理、禁用出口 IP（包括按目标网站禁用）、移除代理和上报使用结果，
+#   不支持健康度加权、会话粘滞、按属性筛选、批量获取、租约、增量刷新、暂存到本地和发布到 Redis
+IS_COLUMNAR_POOL_ENABLED = CONFIG["proxy"].get("is_columnar_pool_enabled", False)
+# 当前列式代理池（开启时由加载、刷新代理池构建，整体替换）
+COLUMNAR_PROXY_POOL = None
+# 端口用量计数器（请求数、失败数、字节数）
+PROXY_USAGE_COUNTER = PortUsageCounter()
+# 用量写入数据库的间隔（秒），以及是否先汇总到 Redis（多个进程共用，由获得锁的进程写入数据库）
+USAGE_FLUSH_INTERVAL_SECONDS = CONFIG["proxy"].get("usage_flush_interval_seconds", 60)
+IS_USAGE_DISTRIBUTED = CONFIG["proxy"].get("is_usage_distributed", False)
+# 用量定时写入线程
+USAGE_FLUSHER = None
+# 用量表是否已经建好
+IS_USAGE_TABLE_INITIALIZED = False
 
 
+def _trim_encrypted_string(encrypted_string: str):
+    """
+    @description: 将编码后的字符串调整为 20 位并拆分为用户名和密码
+    """
+    # 1. 不满 20 位在前面补 0
+    length = len(encrypted_string)
+    if length < 20:
+        encrypted_string = encrypted_string.rjust(20, "0")
+    # 2. 超过 20 位，依次从前面删一个，从后面删一个，直到 20 位（前面多删的一个在奇数时）
+    elif length > 20:
+        overflow = length - 20
+        encrypted_string = encrypted_string[(overflow + 1) // 2:length - overflow // 2]
+    # 3. 返回结果
+    return encrypted_string[:10], encrypted_string[10:]
+
 def _generate_proxy_username_and_password_by_port(port: int):
     """
     @description: 生成代理用户名和密码
@@ -54,20 +180,30 @@ def _generate_proxy_username_and_password_by_port(port: int):
     encrypted_string = "{}{}".format(OBFS_KEY, encrypted_string)
     # 4. 再次进行 base64 编码
     encrypted_string = base64.b64encode(encrypted_string.encode("utf-8")).decode("utf-8")
-    # 5. 尾部去掉所有的等号
-    encrypted_string = encrypted_string.replace("=", "")
-    # 6. 转为大写
-    encrypted_string = encrypted_string.upper()
-    # 7. 检查位数，不满 20 位在前面补 0
-    if len(encrypted_string) < 20:
-        encrypted_string = "0" * (20 - len(encrypted_string)) + encrypted_string
-    # 8. 超过 20 位，依次从前面删一个，从后面删一个，直到 20 位
-    while len(encrypted_string) > 20:
-        encrypted_string = encrypted_string[1:]
-        if len(encrypted_string) > 20:
-            encrypted_string = encrypted_string[:-1]
-    # 9. 返回结果
-    return encrypted_string[:10], encrypted_string[10:]
+    # 5. 尾部去掉所有的等号并转为大写
+    encrypted_string = encrypted_string.replace("=", "").upper()
+    # 6. 调整为 20 位并返回结果
+    return _trim_encrypted_string(encrypted_string)
+
+def _generate_proxy_username_and_password_by_ports(ports):
+    """
+    @description: 批量生成代理用户名和密码
+    @param {iterable} ports 代理端口，可以是 range
+    @return {dict} 端口到 (用户名, 密码) 的映射
+    """
+    # 1. 混淆密钥只编码一次
+    obfs_key_bytes = OBFS_KEY.encode("utf-8")
+    b64encode = base64.b64encode
+    # 2. 逐个生成
+    port_2_username_and_password = {}
+    for port in ports:
+        if not port:
+            raise Exception("共通 Proxy -> 端口号不能为空")
+        encrypted_string = b64encode(obfs_key_bytes + b64encode(str(port).encode("utf-8")))
+        encrypted_string = encrypted_string.decode("utf-8").replace("=", "").upper()
+        port_2_username_and_password[port] = _trim_encrypted_string(encrypted_string)
+    # 3. 返回结果
+    return port_2_username_and_password
 
 def _generate_proxy_str(host, port, protocol, username, password):
     """
@@ -86,6 +222,37 @@ def _generate_proxy_str(host, port, protocol, username, password):
     # 3. 返回结果
     return proxy_str
 
+def _generate_proxy_strs(host, port, protocol, username, password):
+    """
+    @description: 预先生成代理字符串（直连、转发 × 协议）
+    @return: (PRECOMPUTED_PROTOCOL_LIST 中每个协议的直连、转发字符串..., 代理自身协议不在其中时再加上它的直连、转发字符串)
+    """
+    proxy_strs = []
+    protocol_list = PRECOMPUTED_PROTOCOL_LIST if protocol in PRECOMPUTED_PROTOCOL_2_SLOT else PRECOMPUTED_PROTOCOL_LIST + [protocol]
+    for proxy_str_protocol in protocol_list:
+        proxy_strs.append(_generate_proxy_str(host, port, proxy_str_protocol, username, password))
+        proxy_strs.append("%s://%s:%s" % (proxy_str_protocol, FORWARDER_HOST, port))
+    return tuple(proxy_strs)
+
+def _build_proxy_info(country_code, host, port, protocol, exit_ip, remark, username=None, password=None):
+    """
+    @description: 构建代理信息，包含账户密码和预先生成的代理字符串
+    """
+    if username is None or password is None:
+        username, password = _generate_proxy_username_and_password_by_port(port)
+    return ProxyInfo(country_code, host, port, protocol, exit_ip, remark, username, password,
+                     _generate_proxy_strs(host, port, protocol, username, password))
+
+def _get_port_by_proxy_str(proxy_str: str):
+    """
+    @description: 从代理字符串中获取端口（代理的主键）
+    """
+    try:
+        return int(proxy_str.rsplit(":", 1)[-1])
+    except Exception as e:
+        LOGGER.error("共通 Proxy -> 从代理字符串中获取端口失败，错误信息：%s" % str(e))
+        return None
+
 def parse_proxy_str(proxy_str: str):
     """
     @description: 解析代理字符串
@@ -99,69 +266,434 @@ def parse_proxy_str(proxy_str: str):
     if not proxy_str:
         LOGGER.error("共通 Proxy -> 代理字符串为空，无法解析")
         return host, port, protocol, username, password
-    # 2. 解析代理字符串
+    # 2. 解析代理字符串（格式：协议://[用户名:密码@]主机:端口）
     try:
         # 2.1 解析协议
-        protocol = proxy_str.split("://", 1)[0]
-        # 2.2 解析主机和端口
-        host_port = proxy_str.split("://", 1)[1]
-        host = host_port.split(":", 1)[0]
-        port = int(host_port.split(":", 1)[1].split("@", 1)[0])
-        # 2.3 解析用户名和密码
-        if "@" in host_port:
-            username_password = host_port.split("@", 1)[0].split(":", 1)
-            username = username_password[0]
-            password = username_password[1]
+        protocol, address = proxy_str.split("://", 1)
+        # 2.2 解析用户名和密码（以最后一个 @ 分隔）
+        if "@" in address:
+            username_password, address = address.rsplit("@", 1)
+            username, password = username_password.split(":", 1)
+        # 2.3 解析主机和端口
+        host, port = address.rsplit(":", 1)
+        port = int(port)
     except Exception as e:
         LOGGER.error("共通 Proxy -> 解析代理字符串失败，错误信息：%s" % str(e))
+        return None, None, None, None, None
     # 3. 返回结果
     return host, port, protocol, username, password
 
-def _select_and_save_proxy_info(is_exit_ip_remove_duplicate, sql, session):
+def _save_proxy_pool(country_code_2_ports_dict, port_2_proxy_info_dict):
+    """
+    @description: 构建新的代理池快照并替换，同时重建健康度选择器（端口统计会保留）
+    """
+    _swap_proxy_pool(ProxyPoolSnapshot(country_code_2_ports_dict, port_2_proxy_info_dict))
+
+def _publish_proxy_pool(proxy_pool: ProxyPoolSnapshot):
+    """
+    @description: 用一次引用赋值发布代理池快照，兼容旧代码的全局变量同时指向新快照（需要持有 PROXY_POOL_LOCK）
+    """
+    global PROXY_POOL
+    global COUNTRY_CODE_2_PORTS_DICT
+    global PORT_2_PROXY_INFO_DICT
+    global ALL_PORT_LIST
+    PROXY_POOL = proxy_pool
+    COUNTRY_CODE_2_PORTS_DICT = proxy_pool.country_code_2_ports_dict
+    PORT_2_PROXY_INFO_DICT = proxy_pool.port_2_proxy_info_dict
+    ALL_PORT_LIST = proxy_pool.all_port_list
+
+def _swap_proxy_pool(proxy_pool: ProxyPoolSnapshot):
+    """
+    @description: 替换代理池快照，并按新快照重建健康度选择器、哈希环和租约分桶
+    """
+    with PROXY_POOL_LOCK:
+        _publish_proxy_pool(proxy_pool)
+        PROXY_HEALTH_SCORER.rebuild(proxy_pool.country_code_2_ports_dict)
+        HEALTH_RESCORER.start()
+        HEALTH_APPLIER.start()
+        # 已构建的一致性哈希环只增删变化的端口
+        for country_code, hash_ring in COUNTRY_CODE_2_HASH_RING_DICT.items():
+            hash_ring.update(proxy_pool.get_ports(country_code) or [])
+        # 租约分桶按新的代理池重建（正在使用的计数保留）
+        PORT_LEASE_COUNTER.reset()
+
+def _build_condition_sql(country_code_list: list = None,
+                         remark_like_str_list: list = None,
+                         banned_exit_ip_list: list = None):
+    """
+    @description: 拼接代理查询条件（使用绑定参数），多个备注条件之间为 OR，并用括号包住
+    @return: (追加到 WHERE 之后的 SQL, 参数)
+    """
+    sql = ""
+    params = {}
+    if banned_exit_ip_list:
+        for i, banned_exit_ip in enumerate(banned_exit_ip_list):
+            params["banned_exit_ip_%s" % i] = banned_exit_ip
+        sql += " AND pp.exit_ip NOT IN (" + ", ".join(
+            ":banned_exit_ip_%s" % i for i in range(len(banned_exit_ip_list))) + ")"
+    if country_code_list:
+        for i, country_code in enumerate(country_code_list):
+            params["country_code_%s" % i] = country_code
+        sql += " AND pi.country_code IN (" + ", ".join(
+            ":country_code_%s" % i for i in range(len(country_code_list))) + ")"
+    if remark_like_str_list:
+        for i, remark_like_str in enumerate(remark_like_str_list):
+            params["remark_like_str_%s" % i] = "%" + remark_like_str + "%"
+        sql += " AND (" + " OR ".join(
+            "pp.remark LIKE :remark_like_str_%s" % i for i in range(len(remark_like_str_list))) + ")"
+    return sql, params
+
+def _select_and_save_proxy_info(is_exit_ip_remove_duplicate, sql, session, params: dict = None):
     """
-    @description: 查询代理信息并保存到全局变量中
+    @description: 查询代理信息并保存到全局变量中（开启列式代理池时只构建列式代理池）
     """
+    if IS_COLUMNAR_POOL_ENABLED:
+        return _select_and_save_columnar_proxy_pool(is_exit_ip_remove_duplicate, sql, session, params)
     try:
-        # 1. 查询代理
-        result = session.execute(text(sql)).fetchall()
+        # 1. 查询代理（服务端游标分批读取，不一次性保存全部结果）
+        result = session.execute(
+            text(sql), params or {}, execution_options={"stream_results": True, "yield_per": LOAD_BATCH_SIZE})
         # 2. 遍历结果并保存到临时结果中
         temp_country_code_2_ports_dict = {}
         temp_port_2_proxy_info_dict = {}
-        exit_ip_list = []
-        for row in result:
-            country_code = row[0] if row[0] else "UNKNOWN"
-            host = row[1]
-            port = row[2]
-            protocol = row[3]
-            exit_ip = row[4]
-            remark = row[5]
-            # 2.1 如果需要去重，检查是否已经存在
-            if is_exit_ip_remove_duplicate and exit_ip in exit_ip_list:
-                continue
-            else:
-                exit_ip_list.append(exit_ip)
-            # 2.2 插入到全局变量中
-            if country_code not in temp_country_code_2_ports_dict:
-                temp_country_code_2_ports_dict[country_code] = []
-            temp_country_code_2_ports_dict[country_code].append(port)
-            temp_port_2_proxy_info_dict[port] = {
-                "country_code": country_code,
-                "host": host,
-                "port": port,
-                "protocol": protocol,
-                "exit_ip": exit_ip,
-                "remark": remark
-            }
+        exit_ip_set = set()
+        for rows in result.partitions():
+            port_2_username_and_password = _generate_proxy_username_and_password_by_ports(row[2] for row in rows)
+            for row in rows:
+                # 重复度高的字符串驻留，所有代理共用同一个对象
+                country_code = sys.intern(row[0]) if row[0] else "UNKNOWN"
+                host = sys.intern(row[1]) if row[1] else row[1]
+                port = row[2]
+                protocol = sys.intern(row[3]) if row[3] else row[3]
+                exit_ip = row[4]
+                remark = sys.intern(row[5]) if row[5] else row[5]
+                # 2.1 如果需要去重，检查是否已经存在
+                if is_exit_ip_remove_duplicate:
+                    if exit_ip in exit_ip_set:
+                        continue
+                    exit_ip_set.add(exit_ip)
+                # 2.2 插入到全局变量中
+                if country_code not in temp_country_code_2_ports_dict:
+                    temp_country_code_2_ports_dict[country_code] = IndexedPortList()
+                temp_country_code_2_ports_dict[country_code].append(port)
+                username, password = port_2_username_and_password[port]
+                temp_port_2_proxy_info_dict[port] = _build_proxy_info(
+                    country_code, host, port, protocol, exit_ip, remark, username, password)
+        result.close()
         # 3. 排序并显示代理数量
         LOGGER.info("共通 Proxy -> 初始化代理池成功，代理数量：%s" % len(temp_port_2_proxy_info_dict))
         # 4. 保存到全局变量中
-        global COUNTRY_CODE_2_PORTS_DICT
-        global PORT_2_PROXY_INFO_DICT
-        COUNTRY_CODE_2_PORTS_DICT = temp_country_code_2_ports_dict
-        PORT_2_PROXY_INFO_DICT = temp_port_2_proxy_info_dict
+        _save_proxy_pool(temp_country_code_2_ports_dict, temp_port_2_proxy_info_dict)
     except Exception as e:
         LOGGER.error("共通 Proxy -> 查询代理失败，错误信息：%s" % str(e))
-        return
+        return False
+    return True
+
+def _select_columnar_proxy_pool(is_exit_ip_remove_duplicate, sql, session, params: dict = None):
+    """
+    @description: 查询代理信息并构建列式代理池（服务端游标分批读取，逐行写入列），与全局代理池共用被禁用的出口 IP
+    @return: ColumnarProxyPool
+    """
+    result = session.execute(
+        text(sql), params or {}, execution_options={"stream_results": True, "yield_per": LOAD_BATCH_SIZE})
+    rows = ((sys.intern(row[0]) if row[0] else row[0], row[1], row[2], row[3], row[4], row[5])
+            for rows in result.partitions() for row in rows)
+    columnar_proxy_pool = ColumnarProxyPool.from_rows(
+        rows, _build_proxy_str, is_exit_ip_remove_duplicate, _generate_proxy_username_and_password_by_ports,
+        BANNED_EXIT_IP_CACHE)
+    result.close()
+    return columnar_proxy_pool
+
+def _select_and_save_columnar_proxy_pool(is_exit_ip_remove_duplicate, sql, session, params: dict = None):
+    """
+    @description: 查询代理信息并替换全局的列式代理池
+    """
+    global COLUMNAR_PROXY_POOL
+    try:
+        COLUMNAR_PROXY_POOL = _select_columnar_proxy_pool(is_exit_ip_remove_duplicate, sql, session, params)
+    except Exception as e:
+        LOGGER.error("共通 Proxy -> 查询代理失败，错误信息：%s" % str(e))
+        return False
+    LOGGER.info("共通 Proxy -> 初始化列式代理池成功，代理数量：%s" % len(COLUMNAR_PROXY_POOL))
+    return True
+
+def _get_proxy_info(port: int):
+    """
+    @description: 获取当前使用的代理池（开启列式代理池时为列式代理池）中的代理信息
+    @return: 代理信息，不存在时返回 None
+    """
+    columnar_proxy_pool = COLUMNAR_PROXY_POOL
+    if columnar_proxy_pool is not None:
+        return columnar_proxy_pool.get_proxy_info(port)
+    return PROXY_POOL.get_proxy_info(port)
+
+def _is_updated_at_supported(session):
+    """
+    @description: 检测 pp_proxy 是否有 updated_at 和 created_at 列，检测成功后缓存结果
+    """
+    global IS_UPDATED_AT_SUPPORTED
+    if IS_UPDATED_AT_SUPPORTED is not None:
+        return IS_UPDATED_AT_SUPPORTED
+    sql = """
+        SELECT
+            column_name
+        FROM
+            information_schema.columns
+        WHERE
+            table_name = 'pp_proxy'
+        AND column_name IN ('updated_at', 'created_at')
+    """
+    try:
+        column_name_set = set(row[0] for row in session.execute(text(sql)))
+    except Exception as e:
+        LOGGER.warning("共通 Proxy -> 检测 pp_proxy 的 updated_at 列失败，本次不增量刷新，错误信息：%s" % str(e))
+        session.rollback()
+        return False
+    IS_UPDATED_AT_SUPPORTED = column_name_set == {"updated_at", "created_at"}
+    if not IS_UPDATED_AT_SUPPORTED:
+        LOGGER.warning("共通 Proxy -> pp_proxy 没有 updated_at 和 created_at 列，增量刷新将改为全量刷新")
+    return IS_UPDATED_AT_SUPPORTED
+
+def _select_high_water_mark(session):
+    """
+    @description: 查询 pp_proxy 当前的最大更新时间，作为增量刷新的高水位
+    @return: 高水位，pp_proxy 没有 updated_at 列或查询失败时返回 None（之后只能全量刷新）
+    """
+    if not _is_updated_at_supported(session):
+        return None
+    sql = """
+        SELECT
+            MAX(COALESCE(pp.updated_at, pp.created_at))
+        FROM
+            pp_proxy pp
+    """
+    try:
+        return session.execute(text(sql)).scalar()
+    except Exception as e:
+        LOGGER.warning("共通 Proxy -> 查询高水位失败，将无法增量刷新，错误信息：%s" % str(e))
+        session.rollback()
+        return None
+
+def _is_proxy_eligible(country_code, exit_ip, remark, is_available, is_exit_ip_remove_banned):
+    """
+    @description: 判断代理是否满足上次初始化时的条件（与全量查询的条件保持一致）
+    """
+    if not exit_ip or not is_available:
+        return False
+    if is_exit_ip_remove_banned and exit_ip in BANNED_EXIT_IP_CACHE:
+        return False
+    if LAST_COUNTRY_CODE_LIST and country_code not in LAST_COUNTRY_CODE_LIST:
+        return False
+    if LAST_REMARK_LIKE_STR_LIST and not any(
+            remark_like_str in (remark or "") for remark_like_str in LAST_REMARK_LIKE_STR_LIST):
+        return False
+    return True
+
+def _apply_proxy_pool_changes(port_2_upserted_proxy_info: dict, removed_ports):
+    """
+    @description: 写时复制：在新快照中应用增删（同时真正移除当前快照中标记移除的端口）后整体替换，
+    读取方只会看到修改前或修改后的代理池（需要持有 PROXY_POOL_LOCK）
+    新快照发布后再增删变化端口对应的健康度、属性索引、哈希环和租约分桶，已移除的端口在读取时会被跳过
+    @param {type}
+    port_2_upserted_proxy_info: 新增或更新的代理信息 {端口: 代理信息}
+    removed_ports: 移除的端口（不存在的忽略）
+    @return: 被移除的代理信息列表
+    """
+    # 1. 生成并发布新快照（属性索引沿用并在下面增删，旧快照的读取方会按旧快照校验选中的端口）
+    old_proxy_pool = PROXY_POOL
+    removed_ports = [port for port in dict.fromkeys(removed_ports)
+                     if old_proxy_pool.get_proxy_info(port) is not None and port not in port_2_upserted_proxy_info]
+    if not removed_ports and not port_2_upserted_proxy_info and not old_proxy_pool.removed_port_set:
+        return []
+    proxy_pool = old_proxy_pool.apply_changes(port_2_upserted_proxy_info, removed_ports)
+    attribute_index = old_proxy_pool.attribute_index
+    proxy_pool.attribute_index = attribute_index
+    _publish_proxy_pool(proxy_pool)
+    # 2. 移除的代理
+    removed_proxy_info_list = []
+    for port in removed_ports:
+        proxy_info = old_proxy_pool.get_proxy_info(port)
+        removed_proxy_info_list.append(proxy_info)
+        _unindex_proxy_info(port, proxy_info, attribute_index)
+    # 3. 新增或更新的代理（国家变化时按移除后新增处理，标记移除的端口已经移除过）
+    for port, proxy_info in port_2_upserted_proxy_info.items():
+        old_proxy_info = old_proxy_pool.get_proxy_info(port)
+        if old_proxy_info is not None and old_proxy_info["country_code"] == proxy_info["country_code"]:
+            if attribute_index is not None:
+                attribute_index.remove(port, old_proxy_info)
+                attribute_index.add(port, proxy_info)
+            continue
+        if old_proxy_info is not None:
+            _unindex_proxy_info(port, old_proxy_info, attribute_index)
+        if attribute_index is not None:
+            attribute_index.add(port, proxy_info)
+        PROXY_HEALTH_SCORER.add(port, proxy_info["country_code"])
+        PORT_LEASE_COUNTER.add(port, proxy_info["country_code"])
+        for hash_ring_country_code in (proxy_info["country_code"], None):
+            if hash_ring_country_code in COUNTRY_CODE_2_HASH_RING_DICT:
+                COUNTRY_CODE_2_HASH_RING_DICT[hash_ring_country_code].add(port)
+    return removed_proxy_info_list
+
+def _unindex_proxy_info(port, proxy_info, attribute_index):
+    """
+    @description: 从健康度选择器、属性索引、哈希环和租约分桶中移除单个代理
+    """
+    PROXY_HEALTH_SCORER.remove(port)
+    if attribute_index is not None:
+        attribute_index.remove(port, proxy_info)
+    for hash_ring_country_code in (proxy_info["country_code"], None):
+        if hash_ring_country_code in COUNTRY_CODE_2_HASH_RING_DICT:
+            COUNTRY_CODE_2_HASH_RING_DICT[hash_ring_country_code].remove(port)
+    PORT_LEASE_COUNTER.remove(port, proxy_info["country_code"])
+
+def _add_proxy_info(country_code, host, port, protocol, exit_ip, remark):
+    """
+    @description: 向代理池中添加或更新单个代理（生成新快照后替换）
+    """
+    with PROXY_POOL_LOCK:
+        _apply_proxy_pool_changes({port: _build_proxy_info(country_code, host, port, protocol, exit_ip, remark)}, ())
+
+def _remove_proxy_infos(ports):
+    """
+    @description: 从代理池中批量移除代理
+    只在当前快照上标记移除（每个端口 O(1)，不复制快照），标记的端口超过 REMOVED_PORT_FOLD_RATIO 时才生成一次新快照
+    @return: 被移除的代理信息列表
+    """
+    with PROXY_POOL_LOCK:
+        proxy_pool = PROXY_POOL
+        removed_proxy_info_list = []
+        for port in ports:
+            proxy_info = proxy_pool.mark_removed(port)
+            if proxy_info is not None:
+                removed_proxy_info_list.append(proxy_info)
+                _unindex_proxy_info(port, proxy_info, proxy_pool.attribute_index)
+        if proxy_pool.is_fold_needed():
+            _apply_proxy_pool_changes({}, ())
+        return removed_proxy_info_list
+
+def _remove_proxy_info(port):
+    """
+    @description: 从代理池中移除单个代理（O(1) 标记移除，见 _remove_proxy_infos）
+    @return: 被移除的代理信息，不存在时返回 None
+    """
+    removed_proxy_info_list = _remove_proxy_infos([port])
+    return removed_proxy_info_list[0] if removed_proxy_info_list else None
+
+def _refresh_proxy_pool_incrementally(is_exit_ip_remove_banned):
+    """
+    @description: 增量刷新代理池，只查询高水位之后变化的行，应用到新快照后整体替换
+    @return: 是否成功，失败时应退回全量刷新
+    """
+    global LAST_HIGH_WATER_MARK
+    # 1. 没有高水位（未初始化或数据库不支持）、使用列式代理池时无法增量刷新
+    if LAST_HIGH_WATER_MARK is None or not PROXY_POOL or IS_COLUMNAR_POOL_ENABLED:
+        return False
+    # 2. 连接数据库
+    session = init_db()
+    try:
+        # 3. 先记录新的高水位，查询期间的变化会在下一次刷新时被再次查到
+        high_water_mark = _select_high_water_mark(session)
+        if high_water_mark is None:
+            return False
+        # 4. 查询变化的行（不过滤可用状态，用于识别下线的代理），从高水位往前多读一段，覆盖提交较晚的事务
+        sql = """
+            SELECT
+                pi.country_code,
+                pp.host,
+                pp.port,
+                pp.protocol,
+                pp.exit_ip,
+                pp.remark,
+                pp.is_available
+            FROM
+                pp_proxy pp LEFT JOIN pp_ip pi ON pp.exit_ip = pi.ip
+            WHERE
+                COALESCE(pp.updated_at, pp.created_at) >= :high_water_mark
+        """
+        changed_rows = session.execute(text(sql), {
+            "high_water_mark": LAST_HIGH_WATER_MARK - datetime.timedelta(seconds=INCREMENTAL_OVERLAP_SECONDS)
+        }).fetchall()
+        # 5. 查询仍然可用的端口，用于识别被物理删除的代理（删除不会留下 updated_at，这一步仍需读取全部可用端口）
+        sql = """
+            SELECT
+                pp.port
+            FROM
+                pp_proxy pp
+            WHERE
+                pp.exit_ip IS NOT NULL
+            AND pp.is_available = True
+        """
+        available_port_set = set(row[0] for row in session.execute(text(sql)))
+    except Exception as e:
+        LOGGER.error("共通 Proxy -> 增量查询代理失败，错误信息：%s" % str(e))
+        return False
+    finally:
+        session.close()
+    # 6. 应用变化（生成新快照后替换，其他修改者需要等待）
+    with PROXY_POOL_LOCK:
+        return _apply_incremental_changes(changed_rows, available_port_set, high_water_mark, is_exit_ip_remove_banned)
+
+def _apply_incremental_changes(changed_rows, available_port_set, high_water_mark, is_exit_ip_remove_banned):
+    """
+    @description: 把增量查询的结果应用到新的代理池快照并替换（需要持有 PROXY_POOL_LOCK）
+    """
+    global LAST_HIGH_WATER_MARK
+    # 1. 被删除的代理
+    port_2_proxy_info_dict = dict(PROXY_POOL.items())
+    removed_port_set = set(port for port in port_2_proxy_info_dict if port not in available_port_set)
+    port_2_upserted_proxy_info = {}
+
+    def _get_current_proxy_info(port):
+        # 应用到当前行为止的代理信息（已移除时返回 None）
+        if port in port_2_upserted_proxy_info:
+            return port_2_upserted_proxy_info[port]
+        return None if port in removed_port_set else port_2_proxy_info_dict.get(port)
+
+    def _remove(port):
+        proxy_info = _get_current_proxy_info(port)
+        if proxy_info is None:
+            return
+        port_2_upserted_proxy_info.pop(port, None)
+        if port in port_2_proxy_info_dict:
+            removed_port_set.add(port)
+        if exit_ip_2_port.get(proxy_info["exit_ip"]) == port:
+            del exit_ip_2_port[proxy_info["exit_ip"]]
+
+    # 2. 应用变化的行
+    exit_ip_2_port = {}
+    if LAST_IS_EXIT_IP_REMOVE_DUPLICATE:
+        exit_ip_2_port = {proxy_info["exit_ip"]: port for port, proxy_info in port_2_proxy_info_dict.items()
+                          if port not in removed_port_set}
+    for row in changed_rows:
+        country_code = row[0] if row[0] else "UNKNOWN"
+        host, port, protocol, exit_ip, remark, is_available = row[1], row[2], row[3], row[4], row[5], row[6]
+        # 2.1 不再满足条件的代理（下线、被禁用、国家或备注变化）直接移除
+        if not _is_proxy_eligible(country_code, exit_ip, remark, is_available, is_exit_ip_remove_banned):
+            _remove(port)
+            continue
+        # 2.2 没有变化的行（重叠区间内重复读到的行）跳过
+        current_proxy_info = _get_current_proxy_info(port)
+        if current_proxy_info is not None and (
+                current_proxy_info["country_code"], current_proxy_info["host"], current_proxy_info["protocol"],
+                current_proxy_info["exit_ip"], current_proxy_info["remark"]) == (country_code, host, protocol, exit_ip, remark):
+            continue
+        # 2.3 出口 IP 去重（出口 IP 已被其他端口占用时移除）
+        if LAST_IS_EXIT_IP_REMOVE_DUPLICATE:
+            if exit_ip_2_port.get(exit_ip, port) != port:
+                _remove(port)
+                continue
+            if current_proxy_info and current_proxy_info["exit_ip"] != exit_ip:
+                exit_ip_2_port.pop(current_proxy_info["exit_ip"], None)
+            exit_ip_2_port[exit_ip] = port
+        port_2_upserted_proxy_info[port] = _build_proxy_info(country_code, host, port, protocol, exit_ip, remark)
+        removed_port_set.discard(port)
+    # 3. 一次性生成新快照并替换（同时增删健康度、属性索引、哈希环和租约分桶）
+    _apply_proxy_pool_changes(port_2_upserted_proxy_info, removed_port_set)
+    # 4. 保存高水位
+    LAST_HIGH_WATER_MARK = high_water_mark
+    LOGGER.info("共通 Proxy -> 增量刷新代理池成功，新增或更新：%s，移除：%s，代理数量：%s" % (
+        len(port_2_upserted_proxy_info), len(removed_port_set), len(PROXY_POOL)))
+    return True
 
 def init_proxy_pool(is_exit_ip_remove_duplicate = True,
                     country_code_list: list = [],
@@ -190,26 +722,48 @@ def init_proxy_pool(is_exit_ip_remove_duplicate = True,
         AND pp.is_available = True
     """
     # 2.2 拼接查询条件
-    if country_code_list:
-        sql += " AND pi.country_code IN ('" + "', '".join(country_code_list) + "')"
-    if remark_like_str_list:
-        sql += " AND pp.remark LIKE '%" + "%' OR pp.remark LIKE '%".join(remark_like_str_list) + "%'"
-    # 3. 查询代理
-    _select_and_save_proxy_info(is_exit_ip_remove_duplicate, sql, session)
+    condition_sql, params = _build_condition_sql(country_code_list, remark_like_str_list)
+    sql += condition_sql
+    # 3. 查询代理（高水位需要在查询之前记录）
+    high_water_mark = _select_high_water_mark(session)
+    is_selected = _select_and_save_proxy_info(is_exit_ip_remove_duplicate, sql, session, params)
     # 4. 关闭数据库连接
     session.close()
     # 5. 保存初始化参数
     global LAST_IS_EXIT_IP_REMOVE_DUPLICATE
     global LAST_COUNTRY_CODE_LIST
     global LAST_REMARK_LIKE_STR_LIST
+    global LAST_HIGH_WATER_MARK
+    global INCREMENTAL_REFRESH_COUNT
+    LAST_HIGH_WATER_MARK = high_water_mark if is_selected else None
+    INCREMENTAL_REFRESH_COUNT = 0
     LAST_IS_EXIT_IP_REMOVE_DUPLICATE = is_exit_ip_remove_duplicate
     LAST_COUNTRY_CODE_LIST = country_code_list
     LAST_REMARK_LIKE_STR_LIST = remark_like_str_list
+    # 6. 暂存到本地
+    if is_selected and IS_STASH_ENABLED:
+        stash_proxy_pool()
 
-def refresh_proxy_pool(is_exit_ip_remove_banned = True):
+def refresh_proxy_pool(is_exit_ip_remove_banned = True,
+                       is_incremental: bool = False):
     """
     @description: 刷新代理池
+    @param {type}
+    is_exit_ip_remove_banned: 是否排除被禁用的出口 IP
+    is_incremental: 是否增量刷新（只查询上次刷新后变化的行，失败或连续增量刷新 FULL_REFRESH_INTERVAL_COUNT 次后改为全量刷新）
     """
+    global INCREMENTAL_REFRESH_COUNT
+    # 0. 增量刷新
+    if is_incremental:
+        if INCREMENTAL_REFRESH_COUNT >= FULL_REFRESH_INTERVAL_COUNT:
+            LOGGER.info("共通 Proxy -> 已连续增量刷新 %s 次，本次改为全量刷新" % INCREMENTAL_REFRESH_COUNT)
+        elif _refresh_proxy_pool_incrementally(is_exit_ip_remove_banned):
+            INCREMENTAL_REFRESH_COUNT += 1
+            if IS_STASH_ENABLED:
+                stash_proxy_pool()
+            return
+        else:
+            LOGGER.warning("共通 Proxy -> 无法增量刷新代理池，改为全量刷新")
     # 1. 连接数据库
     session = init_db()
     # 2. 查询所有代理
@@ -229,90 +783,601 @@ def refresh_proxy_pool(is_exit_ip_remove_banned = True):
         AND pp.is_available = True
     """
     # 2.2 拼接查询条件
-    if is_exit_ip_remove_banned:
-        banned_exit_ip_list = list(BANNED_EXIT_IP_CACHE.keys())
-        sql += " AND pp.exit_ip NOT IN ('" + "', '".join(banned_exit_ip_list) + "')"
-    if LAST_COUNTRY_CODE_LIST:
-        sql += " AND pi.country_code IN ('" + "', '".join(LAST_COUNTRY_CODE_LIST) + "')"
-    if LAST_REMARK_LIKE_STR_LIST:
-        sql += " AND pp.remark LIKE '%" + "%' OR pp.remark LIKE '%".join(LAST_REMARK_LIKE_STR_LIST) + "%'"
-    # 3. 查询代理
-    _select_and_save_proxy_info(LAST_IS_EXIT_IP_REMOVE_DUPLICATE, sql, session)
+    condition_sql, params = _build_condition_sql(
+        LAST_COUNTRY_CODE_LIST, LAST_REMARK_LIKE_STR_LIST,
+        list(BANNED_EXIT_IP_CACHE.keys()) if is_exit_ip_remove_banned else None)
+    sql += condition_sql
+    # 3. 查询代理（高水位需要在查询之前记录）
+    high_water_mark = _select_high_water_mark(session)
+    is_selected = _select_and_save_proxy_info(LAST_IS_EXIT_IP_REMOVE_DUPLICATE, sql, session, params)
     # 4. 关闭数据库连接
     session.close()
+    # 5. 保存高水位
+    global LAST_HIGH_WATER_MARK
+    LAST_HIGH_WATER_MARK = high_water_mark if is_selected else None
+    INCREMENTAL_REFRESH_COUNT = 0
+    # 6. 暂存到本地
+    if is_selected and IS_STASH_ENABLED:
+        stash_proxy_pool()
+
+def _get_stash_condition():
+    """
+    @description: 暂存快照对应的加载条件（条件不同的快照不能互相使用）
+    """
+    return {
+        "is_exit_ip_remove_duplicate": bool(LAST_IS_EXIT_IP_REMOVE_DUPLICATE),
+        "country_code_list": sorted(LAST_COUNTRY_CODE_LIST),
+        "remark_like_str_list": sorted(LAST_REMARK_LIKE_STR_LIST)
+    }
+
+def stash_proxy_pool():
+    """
+    @description: 把当前代理池暂存到本地暂存数据库
+    @return: 快照版本，失败时返回 None
+    """
+    # 1. 代理池未初始化（列式代理池不支持暂存）
+    proxy_pool = PROXY_POOL
+    if IS_COLUMNAR_POOL_ENABLED:
+        LOGGER.warning("共通 Proxy -> 列式代理池不支持暂存到本地")
+        return None
+    if not proxy_pool:
+        LOGGER.warning("共通 Proxy -> 代理池未初始化，无法暂存到本地")
+        return None
+    # 2. 保存（复制一份，避免保存期间被其他线程移除代理）
+    port_2_proxy_info_dict = dict(proxy_pool.items())
+    try:
+        version = proxy_stash.save(port_2_proxy_info_dict, _get_stash_condition())
+    except Exception as e:
+        LOGGER.error("共通 Proxy -> 暂存代理池到本地失败，错误信息：%s" % str(e))
+        return None
+    LOGGER.info("共通 Proxy -> 暂存代理池到本地成功，版本：%s，代理数量：%s" % (version, len(port_2_proxy_info_dict)))
+    return version
+
+def _reconcile_proxy_pool_from_database(is_exit_ip_remove_duplicate, country_code_list, remark_like_str_list):
+    """
+    @description: 后台从 PostgreSQL 重新加载代理池，成功后替换本地快照
+    """
+    try:
+        init_proxy_pool(is_exit_ip_remove_duplicate, country_code_list, remark_like_str_list)
+    except Exception as e:
+        LOGGER.error("共通 Proxy -> 后台从数据库加载代理池失败，继续使用本地快照，错误信息：%s" % str(e))
+
+def init_proxy_pool_from_stash(is_exit_ip_remove_duplicate = True,
+                               country_code_list: list = [],
+                               remark_like_str_list: list = [],
+                               max_age_seconds: float = None,
+                               is_reconciled: bool = True):
+    """
+    @description: 先用本地暂存的快照初始化代理池，再在后台从 PostgreSQL 加载；没有可用快照时直接从 PostgreSQL 加载
+    之后每次成功加载都会更新本地快照
+    @param {type}
+    is_exit_ip_remove_duplicate, country_code_list, remark_like_str_list: 同 init_proxy_pool，条件不同的快照不会被使用
+    max_age_seconds: 快照最长使用期限（秒），默认读取配置 stash_max_age_seconds
+    is_reconciled: 使用快照后是否在后台从 PostgreSQL 加载
+    @return: 代理池是否可用
+    """
+    global IS_STASH_ENABLED
+    global LAST_IS_EXIT_IP_REMOVE_DUPLICATE
+    global LAST_COUNTRY_CODE_LIST
+    global LAST_REMARK_LIKE_STR_LIST
+    global LAST_HIGH_WATER_MARK
+    IS_STASH_ENABLED = True
+    LAST_IS_EXIT_IP_REMOVE_DUPLICATE = is_exit_ip_remove_duplicate
+    LAST_COUNTRY_CODE_LIST = country_code_list
+    LAST_REMARK_LIKE_STR_LIST = remark_like_str_list
+    # 1. 读取本地快照
+    snapshot = None
+    try:
+        snapshot = proxy_stash.load(
+            _get_stash_condition(), max_age_seconds if max_age_seconds is not None else STASH_MAX_AGE_SECONDS)
+    except Exception as e:
+        LOGGER.error("共通 Proxy -> 读取本地代理池快照失败，错误信息：%s" % str(e))
+    # 2. 没有可用快照时直接从数据库加载
+    if not snapshot:
+        LOGGER.warning("共通 Proxy -> 没有可用的本地代理池快照，从数据库加载")
+        init_proxy_pool(is_exit_ip_remove_duplicate, country_code_list, remark_like_str_list)
+        return bool(PROXY_POOL)
+    # 3. 使用快照构建代理池（快照保存的是去重后的结果）
+    version, created_at, rows = snapshot
+    port_2_username_and_password = _generate_proxy_username_and_password_by_ports(row[2] for row in rows)
+    temp_country_code_2_ports_dict = {}
+    temp_port_2_proxy_info_dict = {}
+    for country_code, host, port, protocol, exit_ip, remark in rows:
+        username, password = port_2_username_and_password[port]
+        temp_port_2_proxy_info_dict[port] = _build_proxy_info(
+            country_code, host, port, protocol, exit_ip, remark, username, password)
+        temp_country_code_2_ports_dict.setdefault(country_code, IndexedPortList()).append(port)
+    _save_proxy_pool(temp_country_code_2_ports_dict, temp_port_2_proxy_info_dict)
+    # 快照没有高水位，下一次刷新只能全量刷新
+    LAST_HIGH_WATER_MARK = None
+    LOGGER.info("共通 Proxy -> 使用本地代理池快照初始化成功，版本：%s，已保存 %.0f 秒，代理数量：%s" % (
+        version, time.time() - created_at, len(temp_port_2_proxy_info_dict)))
+    # 4. 后台从数据库加载
+    if is_reconciled:
+        threading.Thread(
+            target=_reconcile_proxy_pool_from_database,
+            args=(is_exit_ip_remove_duplicate, country_code_list, remark_like_str_list),
+            name="proxy_pool_stash_reconcile", daemon=True).start()
+    return True
+
+def publish_proxy_pool():
+    """
+    @description: 把当前进程的代理池发布到 Redis，供其他进程同步（在刷新代理池的进程中调用）
+    @return: 新版本号，失败时返回 None
+    """
+    # 1. 代理池未初始化（列式代理池不支持发布）
+    proxy_pool = PROXY_POOL
+    if IS_COLUMNAR_POOL_ENABLED:
+        LOGGER.warning("共通 Proxy -> 列式代理池不支持发布到 Redis")
+        return None
+    if not proxy_pool:
+        LOGGER.warning("共通 Proxy -> 代理池未初始化，无法发布到 Redis")
+        return None
+    # 2. 发布（复制一份，避免发布期间被其他线程移除代理）
+    port_2_proxy_info_dict = dict(proxy_pool.items())
+    try:
+        version = proxy_redis_pool.publish(port_2_proxy_info_dict)
+    except Exception as e:
+        LOGGER.error("共通 Proxy -> 发布代理池到 Redis 失败，错误信息：%s" % str(e))
+        return None
+    LOGGER.info("共通 Proxy -> 发布代理池到 Redis 成功，版本：%s，代理数量：%s" % (version, len(port_2_proxy_info_dict)))
+    # 3. 发布者本身也使用共享的禁用出口 IP，且不需要再下载自己发布的快照
+    global IS_REDIS_POOL_ENABLED
+    global REDIS_POOL_VERSION
+    IS_REDIS_POOL_ENABLED = True
+    REDIS_POOL_VERSION = version
+    return version
+
+def _sync_banned_exit_ips_from_redis():
+    """
+    @description: 同步其他进程禁用的出口 IP（使用 ZSet 中的过期时间，只剩余的禁用时间有效），并计入健康度
+    """
+    # 1. 找出本进程还不知道的禁用出口 IP，已知的出口 IP 被其他进程延长禁用时同步延长
+    new_banned_exit_ip_set = set()
+    for exit_ip, expire_at in proxy_redis_pool.get_banned_exit_ip_2_expire_at().items():
+        if exit_ip not in BANNED_EXIT_IP_CACHE:
+            new_banned_exit_ip_set.add(exit_ip)
+        _set_banned_exit_ip(exit_ip, expire_at)
+    # 2. 作为强负向信号计入健康度
+    if new_banned_exit_ip_set:
+        for port, proxy_info in PROXY_POOL.items():
+            if proxy_info["exit_ip"] in new_banned_exit_ip_set:
+                PROXY_HEALTH_SCORER.ban(port)
+        LOGGER.info("共通 Proxy -> 从 Redis 同步禁用出口 IP：%s" % len(new_banned_exit_ip_set))
+
+def sync_proxy_pool_from_redis(is_forced: bool = False):
+    """
+    @description: 从 Redis 同步代理池，只有版本号变化时才会重新下载快照
+    @param {type}
+    is_forced: 是否忽略检查间隔
+    @return: 是否成功
+    """
+    global REDIS_POOL_VERSION
+    global REDIS_POOL_SYNCED_AT
+    # 1. 检查间隔内不重复检查
+    now = time.time()
+    if not is_forced and now - REDIS_POOL_SYNCED_AT < REDIS_POOL_SYNC_INTERVAL_SECONDS:
+        return True
+    REDIS_POOL_SYNCED_AT = now
+    try:
+        # 2. 同步禁用的出口 IP
+        _sync_banned_exit_ips_from_redis()
+        # 3. 检查版本号
+        version = proxy_redis_pool.get_version()
+        if not version:
+            LOGGER.warning("共通 Proxy -> Redis 中没有代理池快照")
+            return False
+        if version == REDIS_POOL_VERSION:
+            return True
+        # 4. 下载快照并重建本地代理池
+        port_2_proxy_info = proxy_redis_pool.load(version)
+        port_2_username_and_password = _generate_proxy_username_and_password_by_ports(port_2_proxy_info.keys())
+        temp_country_code_2_ports_dict = {}
+        temp_port_2_proxy_info_dict = {}
+        for port, proxy_info in port_2_proxy_info.items():
+            username, password = port_2_username_and_password[port]
+            temp_port_2_proxy_info_dict[port] = _build_proxy_info(
+                proxy_info["country_code"], proxy_info["host"], port, proxy_info["protocol"],
+                proxy_info["exit_ip"], proxy_info["remark"], username, password)
+            temp_country_code_2_ports_dict.setdefault(proxy_info["country_code"], IndexedPortList()).append(port)
+        _save_proxy_pool(temp_country_code_2_ports_dict, temp_port_2_proxy_info_dict)
+    except Exception as e:
+        LOGGER.error("共通 Proxy -> 从 Redis 同步代理池失败，错误信息：%s" % str(e))
+        return False
+    REDIS_POOL_VERSION = version
+    LOGGER.info("共通 Proxy -> 从 Redis 同步代理池成功，版本：%s，代理数量：%s" % (version, len(PROXY_POOL)))
+    return True
+
+def init_proxy_pool_from_redis():
+    """
+    @description: 使用 Redis 共享代理池初始化（不连接 PostgreSQL），之后获取代理时会按间隔检查版本号
+    """
+    global IS_REDIS_POOL_ENABLED
+    IS_REDIS_POOL_ENABLED = True
+    return sync_proxy_pool_from_redis(is_forced=True)
+
+def get_proxy_str_from_redis(country_code: str = None,
+                             is_forward: bool = False,
+                             protocol: str = "socks5"):
+    """
+    @description: 直接在 Redis 中选择代理（本地不保存代理池），会跳过被禁用的出口 IP
+    """
+    # 1. 选择代理
+    try:
+        proxy_info = proxy_redis_pool.pick(country_code)
+    except Exception as e:
+        LOGGER.error("共通 Proxy -> 从 Redis 选择代理失败，错误信息：%s" % str(e))
+        return None
+    if not proxy_info:
+        LOGGER.warning("共通 Proxy -> Redis 代理池中没有可用代理")
+        return None
+    # 2. 生成代理字符串
+    proxy_info = _build_proxy_info(proxy_info["country_code"], proxy_info["host"], proxy_info["port"],
+                                   proxy_info["protocol"], proxy_info["exit_ip"], proxy_info["remark"])
+    return _get_proxy_str_by_proxy_info(proxy_info, is_forward, protocol)
+
+def _auto_refresh_proxy_pool(is_incremental: bool, is_published: bool):
+    """
+    @description: 后台自动刷新一次：使用 Redis 共享代理池的进程同步快照，否则从数据库刷新（可选发布到 Redis）
+    """
+    if IS_REDIS_POOL_ENABLED and not is_published:
+        sync_proxy_pool_from_redis(is_forced=True)
+        return
+    refresh_proxy_pool(is_incremental=is_incremental)
+    if is_published:
+        publish_proxy_pool()
+
+def start_auto_refresh(interval_seconds: float = None,
+                       jitter_seconds: float = None,
+                       is_incremental: bool = True,
+                       is_published: bool = False):
+    """
+    @description: 启动后台自动刷新线程（已经启动时先停止再按新参数启动）
+    @param {type}
+    interval_seconds: 刷新间隔（秒），默认读取配置 auto_refresh_interval_seconds
+    jitter_seconds: 每次额外等待 0 ~ jitter_seconds 秒，避免多个进程同时刷新，默认读取配置 auto_refresh_jitter_seconds
+    is_incremental: 从数据库刷新时是否增量刷新
+    is_published: 刷新后是否发布到 Redis（供其他进程同步）
+    """
+    global AUTO_REFRESHER
+    stop_auto_refresh()
+    AUTO_REFRESHER = PeriodicRefresher(
+        lambda: _auto_refresh_proxy_pool(is_incremental, is_published),
+        interval_seconds if interval_seconds is not None else AUTO_REFRESH_INTERVAL_SECONDS,
+        jitter_seconds if jitter_seconds is not None else AUTO_REFRESH_JITTER_SECONDS,
+        "proxy_pool_auto_refresh",
+        "共通 Proxy")
+    AUTO_REFRESHER.start()
+    LOGGER.info("共通 Proxy -> 启动代理池后台自动刷新，间隔：%s 秒，抖动：%s 秒" % (
+        AUTO_REFRESHER.interval_seconds, AUTO_REFRESHER.jitter_seconds))
+
+def stop_auto_refresh():
+    """
+    @description: 停止后台自动刷新线程
+    """
+    global AUTO_REFRESHER
+    if AUTO_REFRESHER is None:
+        return
+    AUTO_REFRESHER.stop()
+    AUTO_REFRESHER = None
+    LOGGER.info("共通 Proxy -> 停止代理池后台自动刷新")
+
+def _get_proxy_str_by_proxy_info(proxy_info: ProxyInfo, is_forward: bool, protocol: str = None):
+    """
+    @description: 从代理信息中获取代理字符串，未预先生成的协议每次生成（代理信息只读，不缓存）
+    """
+    # 1. 未指定协议时使用代理自身的协议
+    protocol = protocol or proxy_info.protocol
+    # 2. 读取预先生成的代理字符串
+    slot = PRECOMPUTED_PROTOCOL_2_SLOT.get(protocol)
+    if slot is None and protocol == proxy_info.protocol:
+        slot = len(PRECOMPUTED_PROTOCOL_LIST) * 2
+    if slot is not None and slot < len(proxy_info.proxy_strs):
+        return proxy_info.proxy_strs[slot + bool(is_forward)]
+    # 3. 生成
+    if is_forward:
+        return "%s://%s:%s" % (protocol, FORWARDER_HOST, proxy_info.port)
+    return _generate_proxy_str(proxy_info.host, proxy_info.port, protocol, proxy_info.username, proxy_info.password)
+
+def _get_hash_ring(country_code: str = None):
+    """
+    @description: 获取一致性哈希环，第一次使用时在 PROXY_POOL_LOCK 内按当前快照构建
+    构建期间不会替换快照，也不会有其他线程遍历或修改 COUNTRY_CODE_2_HASH_RING_DICT，之后的增删由修改代理池的一方同步
+    """
+    hash_ring = COUNTRY_CODE_2_HASH_RING_DICT.get(country_code)
+    if hash_ring is None:
+        with PROXY_POOL_LOCK:
+            hash_ring = COUNTRY_CODE_2_HASH_RING_DICT.get(country_code)
+            if hash_ring is None:
+                hash_ring = ConsistentHashRing(PROXY_POOL.iter_ports(country_code))
+                COUNTRY_CODE_2_HASH_RING_DICT[country_code] = hash_ring
+    return hash_ring
+
+def _get_attribute_index(proxy_pool: ProxyPoolSnapshot):
+    """
+    @description: 获取快照的属性索引，第一次使用时构建
+    """
+    if proxy_pool.attribute_index is None:
+        with PROXY_POOL_LOCK:
+            if proxy_pool.attribute_index is None:
+                attribute_index = ProxyAttributeIndex()
+                for port, proxy_info in proxy_pool.items():
+                    attribute_index.add(port, proxy_info)
+                proxy_pool.attribute_index = attribute_index
+    return proxy_pool.attribute_index
+
+def _normalize_scope(scope: str):
+    """
+    @description: 规范化禁用范围：网址取域名，统一小写，去掉端口和 www. 前缀
+    @return: 规范化后的范围（sys.intern），为空时返回 None
+    """
+    if not scope:
+        return None
+    host = urlsplit(scope).hostname if "://" in scope else scope.split("/", 1)[0].rsplit(":", 1)[0]
+    host = (host or "").strip().lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return sys.intern(host) if host else None
+
+def _is_exit_ip_banned(exit_ip: str, scope: str = None) -> bool:
+    """
+    @description: 判断出口 IP 是否被禁用（全局禁用或在范围内禁用），O(1)
+    @param {type}
+    scope: 规范化后的范围
+    """
+    return exit_ip in BANNED_EXIT_IP_CACHE or (scope is not None and (scope, exit_ip) in SCOPED_BANNED_EXIT_IP_CACHE)
+
+def _is_port_unmatched(proxy_pool: ProxyPoolSnapshot, port: int, filters: dict, scope: str = None) -> bool:
+    """
+    @description: 判断端口是否需要跳过（已移除、已被修改为不符合属性条件、出口 IP 被禁用）
+    """
+    proxy_info = proxy_pool.get_proxy_info(port)
+    return not proxy_info or _is_exit_ip_banned(proxy_info["exit_ip"], scope) \
+        or not ProxyAttributeIndex.is_matched(proxy_info, filters)
+
+def _random_port_by_attributes(proxy_pool: ProxyPoolSnapshot, filters: dict, scope: str = None):
+    """
+    @description: 从符合属性条件的端口中随机选择
+    @return: 端口，没有可用端口时返回 None
+    """
+    ports = _get_attribute_index(proxy_pool).select(filters)
+    if not ports:
+        return None
+    # 1. 随机尝试
+    for _ in range(RANDOM_TRY_COUNT):
+        port = random.choice(ports)
+        if not _is_port_unmatched(proxy_pool, port, filters, scope):
+            return port
+    # 2. 随机尝试都失败时从随机位置开始顺序查找
+    offset = random.randrange(len(ports))
+    for port in ports[offset:] + ports[:offset]:
+        if not _is_port_unmatched(proxy_pool, port, filters, scope):
+            return port
+    return None
+
+def _is_port_banned(port: int, scope: str = None) -> bool:
+    """
+    @description: 判断端口的出口 IP 是否被禁用（已移除的端口也视为禁用）
+    @param {type}
+    scope: 规范化后的范围，指定时同时检查在该范围内被禁用的出口 IP
+    """
+    proxy_info = PROXY_POOL.get_proxy_info(port)
+    return not proxy_info or _is_exit_ip_banned(proxy_info["exit_ip"], scope)
+
+def _pick_port_by_health(country_code: str = None):
+    """
+    @description: 按健康度加权选择端口（不加锁，选不到时由调用方随机选择）
+    """
+    return PROXY_HEALTH_SCORER.pick(country_code)
 
-def get_proxy_str(country_code: str = None,
+def get_proxy_str(country_code = None,
                   is_forward: bool = False,
-                  protocol: str = "socks5"):
+                  protocol: str = "socks5",
+                  is_health_weighted: bool = True,
+                  session_key: str = None,
+                  proxy_protocol = None,
+                  host = None,
+                  tag = None,
+                  scope: str = None):
     """
     @description: 根据国家代码获取代理字符串
     @param {type} 
-    country_code: 国家代码
+    country_code: 国家代码，也可以是国家代码的集合（任意一个）
+    is_health_weighted: 是否按健康度加权选择（否则等概率随机选择），按属性筛选时不使用
+    session_key: 会话键（如目标账号），指定后同一会话键总是映射到同一个代理，出口 IP 被禁用时顺延到下一个
+    proxy_protocol: 按代理自身的协议筛选，可以是集合（任意一个）
+    host: 按代理 host 筛选，可以是集合（任意一个）
+    tag: 按备注标签筛选（备注按空白、逗号等拆分，不区分大小写），可以是集合（任意一个）
+    scope: 目标网站（域名或网址），指定时跳过在该网站下被禁用的出口 IP
     @return: 代理字符串
     """
     # 1. 代理池未初始化
-    if not PORT_2_PROXY_INFO_DICT:
+    if IS_REDIS_POOL_ENABLED:
+        sync_proxy_pool_from_redis()
+    # 只取一次快照引用，之后即使代理池被替换也使用同一个快照
+    proxy_pool = PROXY_POOL
+    columnar_proxy_pool = COLUMNAR_PROXY_POOL
+    if not proxy_pool and columnar_proxy_pool is None:
         LOGGER.warning("共通 Proxy -> 代理池未初始化，无法获取代理")
         return None
     # 2. 获取代理（这里为获取代理的主键 port）
     port = None
-    # 2.1 指定了国家代码
-    if country_code:
-        if country_code in COUNTRY_CODE_2_PORTS_DICT:
-            ports = COUNTRY_CODE_2_PORTS_DICT[country_code]
-            if ports:
-                port = random.choice(ports)
-            else:
+    scope = _normalize_scope(scope)
+    is_skipped = (lambda port: _is_port_banned(port, scope)) if scope else None
+    filters = {"country_code": country_code, "protocol": proxy_protocol, "host": host, "tag": tag}
+    is_filtered = not isinstance(country_code, (str, type(None))) or any(
+        value is not None for value in (proxy_protocol, host, tag))
+    # 2.0 列式代理池（不按健康度加权）
+    if columnar_proxy_pool is not None:
+        if is_filtered or session_key:
+            LOGGER.warning("共通 Proxy -> 列式代理池不支持会话粘滞和按属性筛选，无法获取代理")
+            return None
+        proxy_str = columnar_proxy_pool.get_proxy_str(
+            country_code, is_forward, protocol,
+            (lambda exit_ip: (scope, exit_ip) in SCOPED_BANNED_EXIT_IP_CACHE) if scope else None)
+        if not proxy_str:
+            LOGGER.warning("共通 Proxy -> 列式代理池中没有可用代理，无法获取代理")
+        return proxy_str
+    # 2.1 按属性组合筛选
+    if is_filtered:
+        if session_key:
+            port = _get_hash_ring(country_code if isinstance(country_code, str) else None).get(
+                session_key, lambda port: _is_port_unmatched(proxy_pool, port, filters, scope))
+        else:
+            port = _random_port_by_attributes(proxy_pool, filters, scope)
+        if not port:
+            LOGGER.warning("共通 Proxy -> 没有符合条件的代理，无法获取代理：%s" % filters)
+            return None
+    # 2.2 会话粘滞
+    elif session_key:
+        port = _get_hash_ring(country_code).get(session_key, is_skipped or _is_port_banned)
+        if not port:
+            LOGGER.warning("共通 Proxy -> 一致性哈希环中没有可用代理，无法获取代理")
+            return None
+    # 2.3 指定了国家代码
+    elif country_code:
+        if country_code in proxy_pool.country_code_2_ports_dict:
+            port = _pick_port_by_health(country_code) if is_health_weighted else None
+            if not port or not proxy_pool.get_proxy_info(port, country_code) or (is_skipped and is_skipped(port)):
+                port = proxy_pool.random_port(country_code, is_skipped)
+            if not port:
                 LOGGER.warning("共通 Proxy -> 指定国家的代理池为空，无法获取代理")
                 return None
         else:
             LOGGER.warning("共通 Proxy -> 未找到指定国家的代理池，无法获取代理")
             return None
-    # 2.2 未指定国家代码
+    # 2.4 未指定国家代码
     else:
-        all_ports = list(PORT_2_PROXY_INFO_DICT.keys())
-        if all_ports:
-            port = random.choice(all_ports)
-        else:
-            LOGGER.warning("共通 Proxy -> 代理池为空，无法获取代理")
-            return None
-    # 3. 根据端口查找代理信息，生成代理字符串
-    # 3.1 获取代理信息
-    if port not in PORT_2_PROXY_INFO_DICT:
+        port = _pick_port_by_health() if is_health_weighted else None
+        if not port or not proxy_pool.get_proxy_info(port) or (is_skipped and is_skipped(port)):
+            port = proxy_pool.random_port(None, is_skipped)
+            if not port:
+                LOGGER.warning("共通 Proxy -> 代理池为空，无法获取代理")
+                return None
+    # 3. 根据端口查找代理信息
+    proxy_info = proxy_pool.get_proxy_info(port)
+    if not proxy_info:
         LOGGER.warning("共通 Proxy -> 未找到代理信息，无法获取代理")
         return None
-    proxy_info = PORT_2_PROXY_INFO_DICT[port]
-    # 3.2 生成账户和密码
-    proxy_username, proxy_password = _generate_proxy_username_and_password_by_port(port)
-    # 3.3 生成代理字符串
-    proxy_str = _generate_proxy_str(
-        proxy_info["host"],
-        proxy_info["port"],
-        proxy_info["protocol"],
-        proxy_username,
-        proxy_password
-    )
-    # 4. 指定了协议
-    if protocol:
-        proxy_str = protocol + "://" + proxy_str.split("://", 1)[1]
-    # 5. 是否需要转发
-    if is_forward:
-        proxy_str = proxy_str.split("://", 1)[0] + "://" + FORWARDER_HOST + ":" + proxy_str.split(":")[-1]
-    # 6. 返回结果
-    return proxy_str
+    # 4. 返回预先生成的代理字符串
+    return _get_proxy_str_by_proxy_info(proxy_info, is_forward, protocol)
+
+def get_proxy_strs(n: int,
+                   country_code: str = None,
+                   is_distinct_exit_ip: bool = True,
+                   is_forward: bool = False,
+                   protocol: str = "socks5",
+                   scope: str = None):
+    """
+    @description: 一次获取 n 个不重复的代理字符串（不放回抽样），跳过被禁用的出口 IP
+    @param {type}
+    n: 代理数量
+    country_code: 国家代码，不指定时从全部代理中选择
+    is_distinct_exit_ip: 是否要求出口 IP 也不重复
+    scope: 目标网站（域名或网址），指定时跳过在该网站下被禁用的出口 IP
+    @return: 代理字符串列表，可用代理不足时少于 n 个
+    """
+    # 1. 代理池未初始化
+    if IS_REDIS_POOL_ENABLED:
+        sync_proxy_pool_from_redis()
+    proxy_pool = PROXY_POOL
+    if not proxy_pool:
+        LOGGER.warning("共通 Proxy -> 代理池未初始化，无法获取代理")
+        return []
+    # 2. 获取端口列表（可能含失效端口，洗牌时跳过）
+    ports = proxy_pool.get_ports(country_code)
+    if not ports:
+        LOGGER.warning("共通 Proxy -> 未找到指定国家的代理池或代理池为空，无法获取代理")
+        return []
+    # 3. 惰性 Fisher-Yates 洗牌：只记录被交换过的下标，不复制端口列表，访问多少个下标就花多少时间
+    proxy_strs = []
+    exit_ip_set = set()
+    scope = _normalize_scope(scope)
+    port_count = len(ports)
+    swapped_slot_dict = {}
+    for i in range(port_count):
+        if len(proxy_strs) >= n:
+            break
+        j = random.randrange(i, port_count)
+        slot = swapped_slot_dict.get(j, j)
+        swapped_slot_dict[j] = swapped_slot_dict.get(i, i)
+        proxy_info = proxy_pool.get_proxy_info(ports[slot], country_code)
+        if not proxy_info:
+            continue
+        # 3.1 跳过被禁用的出口 IP
+        exit_ip = proxy_info["exit_ip"]
+        if _is_exit_ip_banned(exit_ip, scope):
+            continue
+        # 3.2 出口 IP 去重
+        if is_distinct_exit_ip:
+            if exit_ip in exit_ip_set:
+                continue
+            exit_ip_set.add(exit_ip)
+        proxy_strs.append(_get_proxy_str_by_proxy_info(proxy_info, is_forward, protocol))
+    # 4. 返回结果
+    if len(proxy_strs) < n:
+        LOGGER.warning("共通 Proxy -> 可用代理不足，需要：%s，实际：%s" % (n, len(proxy_strs)))
+    return proxy_strs
 
-def ban_exit_ip_by_proxy_str(proxy_str: str):
+@contextlib.contextmanager
+def lease(country_code: str = None,
+          max_inflight: int = 4,
+          is_forward: bool = False,
+          protocol: str = "socks5",
+          wait_seconds: float = 0,
+          is_distributed: bool = False,
+          scope: str = None):
+    """
+    @description: 租用当前使用数量最少的代理，退出 with 时自动归还
+        with proxy.lease(country_code="US", max_inflight=4) as proxy_str:
+            ...
+    @param {type}
+    country_code: 国家代码，不指定时从全部代理中选择
+    max_inflight: 单个代理的最大并发
+    wait_seconds: 所有代理都达到最大并发时最多等待的秒数
+    is_distributed: 是否使用 Redis 计数，限制多个进程对同一代理的总并发
+    scope: 目标网站（域名或网址），指定时跳过在该网站下被禁用的出口 IP
+    @return: 代理字符串，没有可用代理时为 None
+    """
+    # 1. 代理池未初始化
+    if IS_REDIS_POOL_ENABLED:
+        sync_proxy_pool_from_redis()
+    if not PROXY_POOL:
+        LOGGER.warning("共通 Proxy -> 代理池未初始化，无法租用代理")
+        yield None
+        return
+    # 2. 租用端口（跳过被禁用的出口 IP）
+    scope = _normalize_scope(scope)
+    is_skipped = (lambda port: _is_port_banned(port, scope)) if scope else _is_port_banned
+    port = PORT_LEASE_COUNTER.acquire(country_code, max_inflight, is_skipped, is_distributed, wait_seconds)
+    if not port:
+        LOGGER.warning("共通 Proxy -> 没有未达到最大并发的代理，无法租用代理")
+        yield None
+        return
+    # 3. 使用结束后归还（租用后代理可能已被其他线程移除）
+    try:
+        proxy_info = PROXY_POOL.get_proxy_info(port)
+        yield _get_proxy_str_by_proxy_info(proxy_info, is_forward, protocol) if proxy_info else None
+    finally:
+        try:
+            PORT_LEASE_COUNTER.release(port, is_distributed)
+        except Exception as e:
+            LOGGER.error("共通 Proxy -> 归还代理失败，错误信息：%s" % str(e))
+
+def ban_exit_ip_by_proxy_str(proxy_str: str, scope: str = None):
     """
     @description: 根据代理字符串禁用出口 IP
+    @param {type}
+    scope: 目标网站（域名或网址），指定时只在该网站下禁用，其他网站仍可使用
     """
     # 1. 参数判断
     if not proxy_str:
         LOGGER.warning("共通 Proxy -> 代理字符串为空，无法禁用出口 IP")
         return
-    # 2. 解析代理字符串
-    host, port, protocol, username, password = parse_proxy_str(proxy_str)
+    # 2. 获取代理的端口（代理的主键）
+    port = _get_port_by_proxy_str(proxy_str)
     # 3. 获取代理信息
-    proxy_info = PORT_2_PROXY_INFO_DICT.get(port, None)
+    proxy_info = _get_proxy_info(port)
     if not proxy_info:
         LOGGER.warning("共通 Proxy -> 未找到代理信息，无法禁用出口 IP")
         return
@@ -321,13 +1386,188 @@ def ban_exit_ip_by_proxy_str(proxy_str: str):
     if not exit_ip:
         LOGGER.warning("共通 Proxy -> 未找到出口 IP，无法禁用出口 IP")
         return
-    # 5. 添加到禁用列表
-    global BANNED_EXIT_IP_CACHE
-    BANNED_EXIT_IP_CACHE[exit_ip] = True
-    LOGGER.info("共通 Proxy -> 禁用出口 IP：%s" % exit_ip)
+    # 5. 禁用
+    scope = _normalize_scope(scope)
+    if scope:
+        _ban_exit_ip_in_scope(exit_ip, scope)
+    else:
+        _ban_exit_ip(port, exit_ip)
     # 6. 返回结果
     return
 
+def _set_banned_exit_ip(exit_ip: str, expire_at: float = None):
+    """
+    @description: 把出口 IP 加入本进程的禁用列表，已禁用时只会延长、不会缩短禁用时间
+    @param {str} exit_ip: 出口 IP
+    @param {float} expire_at: 禁用过期时间戳，默认从现在起禁用 BANNED_EXIT_IP_TTL_SECONDS 秒
+    """
+    if expire_at is None:
+        expire_at = time.time() + BANNED_EXIT_IP_TTL_SECONDS
+    current_expire_at = BANNED_EXIT_IP_CACHE.get(exit_ip)
+    # 旧写法写入的 True 没有记录过期时间，直接覆盖
+    if current_expire_at is None or current_expire_at is True or current_expire_at < expire_at:
+        BANNED_EXIT_IP_CACHE[exit_ip] = expire_at
+
+def _ban_exit_ip(port: int, exit_ip: str):
+    """
+    @description: 禁用出口 IP，并作为强负向信号计入健康度
+    """
+    # 1. 添加到禁用列表
+    _set_banned_exit_ip(exit_ip)
+    LOGGER.info("共通 Proxy -> 禁用出口 IP：%s" % exit_ip)
+    # 2. 作为强负向信号计入健康度
+    PROXY_HEALTH_SCORER.ban(port)
+    # 3. 使用 Redis 共享代理池时同步给其他进程
+    if IS_REDIS_POOL_ENABLED:
+        try:
+            proxy_redis_pool.ban_exit_ip(exit_ip, BANNED_EXIT_IP_TTL_SECONDS)
+        except Exception as e:
+            LOGGER.error("共通 Proxy -> 同步禁用出口 IP 到 Redis 失败，错误信息：%s" % str(e))
+
+def _ban_exit_ip_in_scope(exit_ip: str, scope: str):
+    """
+    @description: 只在指定范围内禁用出口 IP（不计入健康度，也不同步到 Redis）
+    """
+    SCOPED_BANNED_EXIT_IP_CACHE[(scope, exit_ip)] = True
+    LOGGER.info("共通 Proxy -> 在 %s 下禁用出口 IP：%s" % (scope, exit_ip))
+
+def report_proxy_result(proxy_str: str, is_success: bool, latency: float = None, byte_count: int = 0):
+    """
+    @description: 上报代理使用结果，用于计算健康度和统计用量
+    @param {type} 
+    proxy_str: 代理字符串（直连或转发均可）
+    is_success: 是否成功
+    latency: 延迟（秒），可选
+    byte_count: 传输的字节数，可选
+    @return: 
+    """
+    # 1. 参数判断
+    if not proxy_str:
+        LOGGER.warning("共通 Proxy -> 代理字符串为空，无法上报使用结果")
+        return
+    # 2. 获取代理的端口
+    port = _get_port_by_proxy_str(proxy_str)
+    if not _get_proxy_info(port):
+        LOGGER.warning("共通 Proxy -> 未找到代理信息，无法上报使用结果")
+        return
+    # 3. 记录健康度和用量（都只修改当前线程的计数，不加锁，健康度由后台线程批量更新）
+    PROXY_RESULT_COUNTER.record(port, is_success, latency)
+    PROXY_USAGE_COUNTER.record(port, is_success, byte_count)
+    # 4. 返回结果
+    return
+
+def apply_proxy_results():
+    """
+    @description: 把上报的使用结果批量更新到健康度（后台线程定时调用，也可以手动调用立即生效）
+    @return: 更新的端口数量
+    """
+    port_2_counts = PROXY_RESULT_COUNTER.collect()
+    if port_2_counts:
+        PROXY_HEALTH_SCORER.apply(port_2_counts)
+    return len(port_2_counts)
+
+def _upsert_proxy_usage(port_2_delta_counts: dict):
+    """
+    @description: 用量增量写入数据库
+    """
+    global IS_USAGE_TABLE_INITIALIZED
+    session = init_db()
+    try:
+        if not IS_USAGE_TABLE_INITIALIZED:
+            proxy_usage.init_table(session)
+            IS_USAGE_TABLE_INITIALIZED = True
+        proxy_usage.upsert(session, port_2_delta_counts)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def flush_proxy_usage(is_distributed: bool = None):
+    """
+    @description: 汇总本进程的用量增量并写入数据库，失败的增量保留到下次
+    @param {type}
+    is_distributed: 是否先累加到 Redis，再由获得锁的进程把全部进程的增量写入数据库，默认读取配置 is_usage_distributed
+    @return: 写入数据库的端口数量，失败时返回 None
+    """
+    from common import redis
+    is_distributed = IS_USAGE_DISTRIBUTED if is_distributed is None else is_distributed
+    # 1. 汇总本进程的增量
+    port_2_delta_counts = PROXY_USAGE_COUNTER.collect()
+    # 2. 不使用 Redis 时直接写入数据库
+    if not is_distributed:
+        if not port_2_delta_counts:
+            return 0
+        try:
+            _upsert_proxy_usage(port_2_delta_counts)
+        except Exception as e:
+            PROXY_USAGE_COUNTER.restore(port_2_delta_counts)
+            LOGGER.error("共通 Proxy -> 代理用量写入数据库失败，错误信息：%s" % str(e))
+            return None
+        LOGGER.info("共通 Proxy -> 代理用量写入数据库成功，端口数量：%s" % len(port_2_delta_counts))
+        return len(port_2_delta_counts)
+    # 3. 累加到 Redis
+    try:
+        if port_2_delta_counts:
+            proxy_usage.push_to_redis(port_2_delta_counts)
+    except Exception as e:
+        PROXY_USAGE_COUNTER.restore(port_2_delta_counts)
+        LOGGER.error("共通 Proxy -> 代理用量累加到 Redis 失败，错误信息：%s" % str(e))
+        return None
+    # 4. 获得锁的进程把 Redis 中全部进程的增量写入数据库（写入失败时退回 Redis）
+    if not redis.lock(proxy_usage.PENDING_REDIS_KEY, USAGE_FLUSH_INTERVAL_SECONDS):
+        return 0
+    try:
+        port_2_delta_counts = proxy_usage.pop_from_redis()
+        if not port_2_delta_counts:
+            return 0
+        try:
+            _upsert_proxy_usage(port_2_delta_counts)
+        except Exception as e:
+            proxy_usage.push_to_redis(port_2_delta_counts)
+            LOGGER.error("共通 Proxy -> 代理用量写入数据库失败，错误信息：%s" % str(e))
+            return None
+    except Exception as e:
+        LOGGER.error("共通 Proxy -> 从 Redis 读取代理用量失败，错误信息：%s" % str(e))
+        return None
+    finally:
+        redis.unlock(proxy_usage.PENDING_REDIS_KEY)
+    LOGGER.info("共通 Proxy -> 代理用量写入数据库成功，端口数量：%s" % len(port_2_delta_counts))
+    return len(port_2_delta_counts)
+
+def start_usage_flush(interval_seconds: float = None, is_distributed: bool = None):
+    """
+    @description: 启动用量定时写入线程（已经启动时先停止再按新参数启动）
+    @param {type}
+    interval_seconds: 写入间隔（秒），默认读取配置 usage_flush_interval_seconds
+    is_distributed: 是否先累加到 Redis，默认读取配置 is_usage_distributed
+    """
+    global USAGE_FLUSHER
+    stop_usage_flush(is_flushed=False)
+    USAGE_FLUSHER = PeriodicRefresher(
+        lambda: flush_proxy_usage(is_distributed),
+        interval_seconds if interval_seconds is not None else USAGE_FLUSH_INTERVAL_SECONDS,
+        0,
+        "proxy_usage_flush",
+        "共通 Proxy")
+    USAGE_FLUSHER.start()
+    LOGGER.info("共通 Proxy -> 启动代理用量定时写入，间隔：%s 秒" % USAGE_FLUSHER.interval_seconds)
+
+def stop_usage_flush(is_flushed: bool = True):
+    """
+    @description: 停止用量定时写入线程
+    @param {type}
+    is_flushed: 停止后是否再写入一次剩余的增量
+    """
+    global USAGE_FLUSHER
+    if USAGE_FLUSHER is None:
+        return
+    USAGE_FLUSHER.stop()
+    USAGE_FLUSHER = None
+    LOGGER.info("共通 Proxy -> 停止代理用量定时写入")
+    if is_flushed:
+        flush_proxy_usage()
+
 def remove_by_proxy_str(proxy_str: str):
     """
     @description: 根据代理字符串移除代理
@@ -340,18 +1580,192 @@ def remove_by_proxy_str(proxy_str: str):
         LOGGER.warning("共通 Proxy -> 代理字符串为空，无法移除代理")
         return
     # 2. 获取代理的端口，暂时可以作为唯一标识
-    port = int(proxy_str.split(":")[-1])
-    # 3. 获取代理字符串
-    global PORT_2_PROXY_INFO_DICT
-    if port in PORT_2_PROXY_INFO_DICT:
-        proxy_info = PORT_2_PROXY_INFO_DICT[port]
-        # 3.1 移除代理信息
-        PORT_2_PROXY_INFO_DICT.pop(port)
-        LOGGER.info("共通 Proxy -> 从代理信息字典中移除代理：%s" % proxy_info)
-    # 4. 移除代理字符串
-    for country_code, ports in COUNTRY_CODE_2_PORTS_DICT.items():
-        if port in ports:
-            COUNTRY_CODE_2_PORTS_DICT[country_code].remove(port)
-            LOGGER.info("共通 Proxy -> 从国家代码 %s 的代理列表中移除代理：%s" % (country_code, port))
+    port = _get_port_by_proxy_str(proxy_str)
+    if port is None:
+        return
+    # 3. 列式代理池标记为失效
+    columnar_proxy_pool = COLUMNAR_PROXY_POOL
+    if columnar_proxy_pool is not None:
+        proxy_info = columnar_proxy_pool.get_proxy_info(port)
+        if columnar_proxy_pool.remove_by_port(port):
+            LOGGER.info("共通 Proxy -> 从列式代理池中移除代理：%s" % proxy_info)
+        return
+    # 4. 通过代理信息中的国家代码定位端口列表，移除代理信息、端口和健康度选择器中的记录
+    proxy_info = _remove_proxy_info(port)
+    if proxy_info:
+        LOGGER.info("共通 Proxy -> 从国家代码 %s 的代理池中移除代理：%s" % (proxy_info["country_code"], proxy_info))
     # 5. 返回结果
-    return
\ No newline at end of file
+    return
+
+
+async def health_check_pool_async(concurrency: int = proxy_health_check.DEFAULT_CONCURRENCY,
+                                  connect_timeout: float = proxy_health_check.DEFAULT_CONNECT_TIMEOUT,
+                                  timeout: float = proxy_health_check.DEFAULT_TIMEOUT,
+                                  is_remove_failed: bool = True,
+                                  is_ban_failed: bool = False,
+                                  is_write_back: bool = True,
+                                  is_mark_unavailable: bool = True):
+    """
+    @description: 并发检查代理池中的全部代理（在已有事件循环中使用）
+    失败只计入健康度，连续失败 HEALTH_CHECK_MAX_FAILURE_COUNT 次后才移除、禁用、标记为不可用
+    @param {type}
+    concurrency: 最大并发数
+    connect_timeout: 建连超时（秒）
+    timeout: 单个代理的总超时（秒）
+    is_remove_failed: 是否从代理池中移除连续失败的代理
+    is_ban_failed: 是否禁用连续失败的代理的出口 IP
+    is_write_back: 是否把结果批量写回 pp_proxy
+    is_mark_unavailable: 写回时是否把连续失败的代理标记为不可用（关闭时只写回成功代理的出口 IP）
+    @return: 检查结果列表
+    """
+    # 1. 代理池未初始化
+    if not PROXY_POOL:
+        LOGGER.warning("共通 Proxy -> 代理池未初始化，无法进行健康检查")
+        return []
+    # 2. 并发检查
+    proxy_info_list = [proxy_info for _, proxy_info in PROXY_POOL.items()]
+    start_time = time.time()
+    results = await proxy_health_check.check_proxies(
+        proxy_info_list, concurrency, HEALTH_CHECK_URL, connect_timeout, timeout)
+    # 3. 结果计入健康度和连续失败次数，连续失败的代理移除或禁用
+    global PORT_2_HEALTH_CHECK_FAILURE_COUNT
+    port_2_failure_count = {}
+    failed_count = 0
+    failed_out_port_set = set()
+    for proxy_info, result in zip(proxy_info_list, results):
+        port = proxy_info["port"]
+        if not PROXY_POOL.get_proxy_info(port):
+            continue
+        PROXY_HEALTH_SCORER.report(port, result["is_success"], result["latency"])
+        if result["is_success"]:
+            continue
+        failed_count += 1
+        # 只保留本次检查的端口，已经离开代理池的端口不再计数
+        port_2_failure_count[port] = PORT_2_HEALTH_CHECK_FAILURE_COUNT.get(port, 0) + 1
+        if port_2_failure_count[port] < HEALTH_CHECK_MAX_FAILURE_COUNT:
+            continue
+        failed_out_port_set.add(port)
+        if is_ban_failed and proxy_info["exit_ip"]:
+            _ban_exit_ip(port, proxy_info["exit_ip"])
+    if is_remove_failed:
+        _remove_proxy_infos(failed_out_port_set)
+    PORT_2_HEALTH_CHECK_FAILURE_COUNT = port_2_failure_count
+    LOGGER.info("共通 Proxy -> 健康检查完成，代理数量：%s，失败：%s，连续失败 %s 次：%s，耗时：%.2f 秒" % (
+        len(results), failed_count, HEALTH_CHECK_MAX_FAILURE_COUNT, len(failed_out_port_set), time.time() - start_time))
+    # 4. 批量写回数据库
+    if is_write_back:
+        _update_proxy_health_check_results(results, failed_out_port_set if is_mark_unavailable else set())
+    # 5. 返回结果
+    return results
+
+def health_check_pool(concurrency: int = proxy_health_check.DEFAULT_CONCURRENCY,
+                      connect_timeout: float = proxy_health_check.DEFAULT_CONNECT_TIMEOUT,
+                      timeout: float = proxy_health_check.DEFAULT_TIMEOUT,
+                      is_remove_failed: bool = True,
+                      is_ban_failed: bool = False,
+                      is_write_back: bool = True,
+                      is_mark_unavailable: bool = True):
+    """
+    @description: 并发检查代理池中的全部代理，参数同 health_check_pool_async
+    """
+    return asyncio.run(health_check_pool_async(
+        concurrency, connect_timeout, timeout, is_remove_failed, is_ban_failed, is_write_back, is_mark_unavailable))
+
+def _build_health_check_update_params(results: list, unavailable_port_set: set):
+    """
+    @description: 生成写回 pp_proxy 的参数
+    成功的代理写回出口 IP（检查时已校验为 IP 地址）并标记为可用，unavailable_port_set 中的代理标记为不可用，其余不写回
+    @return: {"ports": [...], "is_availables": [...], "exit_ips": [...]}，没有需要写回的代理时返回 None
+    """
+    params = {"ports": [], "is_availables": [], "exit_ips": []}
+    for result in results:
+        if result["is_success"]:
+            params["ports"].append(result["port"])
+            params["is_availables"].append(True)
+            params["exit_ips"].append(result["exit_ip"])
+        elif result["port"] in unavailable_port_set:
+            params["ports"].append(result["port"])
+            params["is_availables"].append(False)
+            params["exit_ips"].append(None)
+    return params if params["ports"] else None
+
+def _update_proxy_health_check_results(results: list, unavailable_port_set: set = frozenset()):
+    """
+    @description: 用一条 UPDATE 把健康检查结果写回 pp_proxy
+    成功的代理更新出口 IP，unavailable_port_set 中的代理标记为不可用，有 updated_at 列时一并更新以便增量刷新识别
+    """
+    params = _build_health_check_update_params(results, unavailable_port_set)
+    if not params:
+        return
+    session = init_db()
+    updated_at_sql = ",\n            updated_at = NOW()" if _is_updated_at_supported(session) else ""
+    sql = """
+        UPDATE
+            pp_proxy pp
+        SET
+            is_available = v.is_available,
+            exit_ip = COALESCE(v.exit_ip, pp.exit_ip)%s
+        FROM
+            unnest(CAST(:ports AS INTEGER[]), CAST(:is_availables AS BOOLEAN[]), CAST(:exit_ips AS TEXT[]))
+                AS v(port, is_available, exit_ip)
+        WHERE
+            pp.port = v.port
+    """ % updated_at_sql
+    try:
+        session.execute(text(sql), params)
+        session.commit()
+        LOGGER.info("共通 Proxy -> 健康检查结果写回数据库成功，数量：%s" % len(params["ports"]))
+    except Exception as e:
+        session.rollback()
+        LOGGER.error("共通 Proxy -> 健康检查结果写回数据库失败，错误信息：%s" % str(e))
+    finally:
+        session.close()
+
+def _build_proxy_str(host, port, protocol, username, password, is_forward):
+    """
+    @description: 生成代理字符串（不缓存，列式代理池使用，账户密码由列式代理池在加载时生成）
+    """
+    if is_forward:
+        return "%s://%s:%s" % (protocol, FORWARDER_HOST, port)
+    return _generate_proxy_str(host, port, protocol, username, password)
+
+def load_columnar_proxy_pool(is_exit_ip_remove_duplicate = True,
+                             country_code_list: list = [],
+                             remark_like_str_list: list = []):
+    """
+    @description: 加载独立的列式代理池（不修改全局代理池），查询条件同 init_proxy_pool
+    需要代替全局代理池时请开启配置 is_columnar_pool_enabled，之后 init_proxy_pool 等会构建全局的列式代理池
+        pool = proxy.load_columnar_proxy_pool(country_code_list=["US"])
+        proxy_str = pool.get_proxy_str("US")
+        pool.remove_by_proxy_str(proxy_str)
+    @return: ColumnarProxyPool，失败时返回 None
+    """
+    # 1. 连接数据库
+    session = init_db()
+    # 2. 查询所有代理
+    sql = """
+        SELECT
+            pi.country_code,
+            pp.host,
+            pp.port,
+            pp.protocol,
+            pp.exit_ip,
+            pp.remark
+        FROM
+            pp_proxy pp LEFT JOIN pp_ip pi ON pp.exit_ip = pi.ip
+        WHERE
+            pp.exit_ip IS NOT NULL
+        AND pp.is_available = True
+    """
+    condition_sql, params = _build_condition_sql(country_code_list, remark_like_str_list)
+    sql += condition_sql
+    # 3. 构建列式代理池
+    try:
+        pool = _select_columnar_proxy_pool(is_exit_ip_remove_duplicate, sql, session, params)
+    except Exception as e:
+        LOGGER.error("共通 Proxy -> 查询代理失败，错误信息：%s" % str(e))
+        return None
+    finally:
+        session.close()
+    LOGGER.info("共通 Proxy -> 加载列式代理池成功，代理数量：%s" % len(pool))
+    return pool
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/scripts/bench_gost.py
+# @DATE: 2026/10/18
+# @TIME: 20:12:08
+#
+# @DESCRIPTION: GOST 端口转发的基准测试（不属于共通模块，不会被导入）
+#   使用本地模拟的 GOST 配置 API，在项目根目录（config.toml 所在目录）中运行：
+#     python -m common.scripts.bench_gost --count 500 --workers 8 --latency 0.002
+
+
+import time
+import argparse
+
+from common import gost
+from common.logic import gost_config
+from common.logic import gost_requests
+from common.logic.gost_fake import FakeGostServer
+
+
+def benchmark(forward_count: int = 200, max_workers: int = None, latency_seconds: float = 0) -> dict:
+    """
+    @description: 对模拟 API 压测 common.gost：批量新增、再次确保（无变化）、批量删除端口转发
+    压测期间临时把 gost_requests 指向模拟 API，结束后恢复
+    @param {type}
+    forward_count: 端口转发数量
+    max_workers: 批量操作的最大并发数，默认为 gost.BULK_MAX_WORKERS
+    latency_seconds: 模拟 API 每个请求的延迟（秒）
+    @return: {"add": {"seconds": 耗时, "per_second": 每秒转发数, "requests": {方法: 次数}}, "ensure": {...}, "delete": {...}}
+    """
+    max_workers = max_workers or gost.BULK_MAX_WORKERS
+    specs = [{
+        "from_host": "127.0.0.1",
+        "from_port": 40000 + i,
+        "from_protocol": "socks5",
+        "to_host": "10.0.{}.{}".format(i // 250, i % 250 + 1),
+        "to_port": 1080,
+        "to_protocol": "socks5"
+    } for i in range(forward_count)]
+    # 1. 指向模拟 API
+    original_settings = (gost_requests.GOST_API_URL, gost_requests.GOST_AUTH_USERNAME,
+                         gost_requests.GOST_AUTH_PASSWORD, gost_requests.SESSION)
+    fake_server = FakeGostServer(auth_username="benchmark", auth_password="benchmark", latency_seconds=latency_seconds)
+    fake_server.start()
+    gost_requests.GOST_API_URL = fake_server.url
+    gost_requests.GOST_AUTH_USERNAME = fake_server.auth_username
+    gost_requests.GOST_AUTH_PASSWORD = fake_server.auth_password
+    gost_requests.SESSION = None
+    gost_config.invalidate()
+    result = {}
+    try:
+        # 2. 批量新增、逐个确保（已经一致，只读取配置）、批量删除
+        steps = [
+            ("add", lambda: gost.add_port_forwards(specs, max_workers=max_workers)),
+            ("ensure", lambda: [gost.ensure_port_forward(**spec) for spec in specs]),
+            ("delete", lambda: gost.delete_port_forwards(
+                [gost._build_port_forward(**spec)[0]["name"] for spec in specs], max_workers=max_workers))
+        ]
+        for step_name, step in steps:
+            fake_server.method_2_count = {}
+            started_at = time.time()
+            step_results = step()
+            seconds = time.time() - started_at
+            success_count = sum(1 for step_result in step_results
+                                if step_result is True or (isinstance(step_result, dict) and step_result["is_success"]))
+            result[step_name] = {
+                "seconds": seconds,
+                "per_second": forward_count / seconds if seconds else float("inf"),
+                "success_count": success_count,
+                "requests": dict(fake_server.method_2_count)
+            }
+    finally:
+        # 3. 恢复
+        if gost_requests.SESSION is not None:
+            gost_requests.SESSION.close()
+        (gost_requests.GOST_API_URL, gost_requests.GOST_AUTH_USERNAME,
+         gost_requests.GOST_AUTH_PASSWORD, gost_requests.SESSION) = original_settings
+        gost_config.invalidate()
+        fake_server.stop()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="压测 common.gost 每秒可以配置多少个端口转发")
+    parser.add_argument("--count", type=int, default=200, help="端口转发数量")
+    parser.add_argument("--workers", type=int, default=None, help="批量操作的最大并发数")
+    parser.add_argument("--latency", type=float, default=0, help="模拟 API 每个请求的延迟（秒）")
+    args = parser.parse_args()
+    for step_name, step_result in benchmark(args.count, args.workers, args.latency).items():
+        print("{:<8} {:>8.3f} 秒  {:>10.1f} 个/秒  成功 {}/{}  请求 {}".format(
+            step_name, step_result["seconds"], step_result["per_second"],
+            step_result["success_count"], args.count, step_result["requests"]))
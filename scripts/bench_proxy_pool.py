@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/scripts/bench_proxy_pool.py
+# @DATE: 2026/10/18
+# @TIME: 23:52:14
+#
+# @DESCRIPTION: 代理池加载和内存占用的基准测试（不属于共通模块，不会被导入）
+#   在项目根目录（config.toml 所在目录）中运行：
+#     python -m common.scripts.bench_proxy_pool
+
+
+import sys
+import time
+import tracemalloc
+
+from sqlalchemy import text, create_engine
+from sqlalchemy.orm import sessionmaker
+
+from common import proxy
+from common.logic.proxy_ports import IndexedPortList
+from common.logic.proxy_columnar import ColumnarProxyPool
+
+
+def benchmark_memory(pool_size: int = 200000, country_count: int = 200):
+    """
+    @description: 对比 ProxyInfo 记录代理池和列式代理池的内存占用
+    @return: (记录代理池 MB, 列式代理池 MB)
+    """
+    rows = [("C%03d" % (i % country_count), "10.0.%s.%s" % (i // 65536 % 256, i // 256 % 256), 30000 + i, "socks5",
+             "%s.%s.%s.%s" % (1 + i // 16777216, i // 65536 % 256, i // 256 % 256, i % 256), "residential")
+            for i in range(pool_size)]
+    # 1. 记录代理池（与 proxy._select_and_save_proxy_info 相同的结构）
+    tracemalloc.start()
+    country_code_2_ports_dict = {}
+    port_2_proxy_info_dict = {}
+    port_2_username_and_password = proxy._generate_proxy_username_and_password_by_ports(row[2] for row in rows)
+    for country_code, host, port, protocol, exit_ip, remark in rows:
+        country_code_2_ports_dict.setdefault(sys.intern(country_code), IndexedPortList()).append(port)
+        username, password = port_2_username_and_password[port]
+        port_2_proxy_info_dict[port] = proxy._build_proxy_info(
+            sys.intern(country_code), sys.intern(host), port, sys.intern(protocol), exit_ip, sys.intern(remark),
+            username, password)
+    del port_2_username_and_password
+    record_mb = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+    del country_code_2_ports_dict, port_2_proxy_info_dict
+    # 2. 列式代理池
+    tracemalloc.start()
+    columnar_proxy_pool = ColumnarProxyPool.from_rows(
+        rows, proxy._build_proxy_str, True, proxy._generate_proxy_username_and_password_by_ports, proxy.BANNED_EXIT_IP_CACHE)
+    columnar_mb = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+    del columnar_proxy_pool
+    return record_mb, columnar_mb
+
+def benchmark_load(row_count_list: list = [125000, 250000, 500000, 1000000]):
+    """
+    @description: 加载代理池的基准测试（使用内存 SQLite 模拟 pp_proxy 和 pp_ip）
+    @return: [(行数, 耗时秒数, 内存峰值 MB), ...]
+    """
+    results = []
+    for row_count in row_count_list:
+        # 1. 生成数据（出口 IP 有 1/10 重复，国家 200 个）
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE pp_proxy (host TEXT, port INTEGER, protocol TEXT, exit_ip TEXT, remark TEXT, is_available BOOLEAN)"))
+            conn.execute(text("CREATE TABLE pp_ip (ip TEXT PRIMARY KEY, country_code TEXT)"))
+            conn.execute(
+                text("INSERT INTO pp_proxy VALUES ('10.0.0.1', :port, 'socks5', :exit_ip, 'residential', 1)"),
+                [{"port": 30000 + i, "exit_ip": "ip-%s" % (i - i % 10 if i % 10 == 9 else i)} for i in range(row_count)])
+            conn.execute(
+                text("INSERT INTO pp_ip VALUES (:ip, :country_code)"),
+                [{"ip": "ip-%s" % i, "country_code": "C%03d" % (i % 200)} for i in range(row_count) if i % 10 != 9])
+        session = sessionmaker(bind=engine)()
+        sql = """
+            SELECT pi.country_code, pp.host, pp.port, pp.protocol, pp.exit_ip, pp.remark
+            FROM pp_proxy pp LEFT JOIN pp_ip pi ON pp.exit_ip = pi.ip
+            WHERE pp.exit_ip IS NOT NULL AND pp.is_available = True
+        """
+        # 2. 加载并统计耗时
+        proxy._save_proxy_pool({}, {})
+        start_time = time.perf_counter()
+        proxy._select_and_save_proxy_info(True, sql, session)
+        seconds = time.perf_counter() - start_time
+        # 3. 再加载一次统计内存峰值（tracemalloc 会拖慢加载，不计入耗时）
+        proxy._save_proxy_pool({}, {})
+        tracemalloc.start()
+        proxy._select_and_save_proxy_info(True, sql, session)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+        session.close()
+        engine.dispose()
+        results.append((row_count, seconds, peak_mb))
+    proxy._save_proxy_pool({}, {})
+    return results
+
+
+if __name__ == "__main__":
+    for row_count, seconds, peak_mb in benchmark_load():
+        print("%8s 行：%.2f 秒（%.2f 微秒/行），内存峰值 %.1f MB" % (
+            row_count, seconds, seconds / row_count * 1000000, peak_mb))
+    record_mb, columnar_mb = benchmark_memory()
+    print("200000 个代理常驻内存：ProxyInfo 记录 %.1f MB，列式 %.1f MB" % (record_mb, columnar_mb))
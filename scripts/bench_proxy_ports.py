@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/scripts/bench_proxy_ports.py
+# @DATE: 2026/10/18
+# @TIME: 11:03:47
+#
+# @DESCRIPTION: 代理端口列表和移除代理的基准测试（不属于共通模块，不会被导入）
+#   在项目根目录（config.toml 所在目录）中运行：
+#     python -m common.scripts.bench_proxy_ports
+
+
+import time
+import random
+
+from common import proxy
+from common.logic.proxy_ports import IndexedPortList
+
+
+def benchmark(pool_size: int = 100000, remove_size: int = 50000, country_count: int = 50):
+    """
+    @description: 对比列表和带反向索引的端口列表删除端口的耗时
+    @return: (list.remove 耗时秒数, IndexedPortList 耗时秒数)
+    """
+    # 1. 构建代理池（端口平均分配到各个国家）
+    ports = list(range(30000, 30000 + pool_size))
+    removed_ports = random.sample(ports, remove_size)
+    country_codes = ["C%02d" % i for i in range(country_count)]
+    # 2. 原有方式：遍历全部国家，list.remove
+    country_code_2_ports_dict = {country_code: [] for country_code in country_codes}
+    for port in ports:
+        country_code_2_ports_dict[country_codes[port % country_count]].append(port)
+    start_time = time.perf_counter()
+    for port in removed_ports:
+        for country_code, country_ports in country_code_2_ports_dict.items():
+            if port in country_ports:
+                country_ports.remove(port)
+    list_seconds = time.perf_counter() - start_time
+    # 3. 反向索引方式：端口 -> 国家 -> 下标，与末尾交换后删除
+    port_2_country_code = {}
+    country_code_2_port_list = {country_code: IndexedPortList() for country_code in country_codes}
+    for port in ports:
+        port_2_country_code[port] = country_codes[port % country_count]
+        country_code_2_port_list[port_2_country_code[port]].append(port)
+    start_time = time.perf_counter()
+    for port in removed_ports:
+        country_code_2_port_list[port_2_country_code.pop(port)].remove(port)
+    indexed_seconds = time.perf_counter() - start_time
+    # 4. 校验结果一致
+    for country_code in country_codes:
+        assert sorted(country_code_2_ports_dict[country_code]) == sorted(country_code_2_port_list[country_code])
+    return list_seconds, indexed_seconds
+
+def benchmark_remove_by_proxy_str(pool_size_list: list = [10000, 100000, 1000000], remove_size: int = 10000,
+                                  country_count: int = 50):
+    """
+    @description: 通过公开的 proxy.remove_by_proxy_str 逐个移除代理，统计单次移除的平均耗时（应不随代理池变大而增加）
+    @return: [(代理数量, 单次移除微秒数), ...]
+    """
+    results = []
+    country_codes = ["C%02d" % i for i in range(country_count)]
+    for pool_size in pool_size_list:
+        # 1. 构建代理池
+        ports = range(30000, 30000 + pool_size)
+        port_2_username_and_password = proxy._generate_proxy_username_and_password_by_ports(ports)
+        country_code_2_ports_dict = {}
+        port_2_proxy_info_dict = {}
+        for port in ports:
+            country_code = country_codes[port % country_count]
+            username, password = port_2_username_and_password[port]
+            country_code_2_ports_dict.setdefault(country_code, IndexedPortList()).append(port)
+            port_2_proxy_info_dict[port] = proxy._build_proxy_info(
+                country_code, "10.0.0.1", port, "socks5", "ip-%s" % port, "", username, password)
+        del port_2_username_and_password
+        proxy._save_proxy_pool(country_code_2_ports_dict, port_2_proxy_info_dict)
+        del country_code_2_ports_dict, port_2_proxy_info_dict
+        proxy_strs = [proxy._get_proxy_str_by_proxy_info(proxy.PROXY_POOL.get_proxy_info(port), False)
+                      for port in random.sample(ports, remove_size)]
+        # 2. 逐个移除并统计耗时（日志关闭，只统计移除本身）
+        proxy.LOGGER.disabled = True
+        start_time = time.perf_counter()
+        for proxy_str in proxy_strs:
+            proxy.remove_by_proxy_str(proxy_str)
+        seconds = time.perf_counter() - start_time
+        proxy.LOGGER.disabled = False
+        results.append((pool_size, seconds / remove_size * 1000000))
+    proxy._save_proxy_pool({}, {})
+    return results
+
+
+if __name__ == "__main__":
+    list_seconds, indexed_seconds = benchmark()
+    print("从 100000 个代理中移除 50000 个：")
+    print("  list.remove      ：%.3f 秒" % list_seconds)
+    print("  IndexedPortList  ：%.3f 秒" % indexed_seconds)
+    for pool_size, microseconds in benchmark_remove_by_proxy_str():
+        print("%8s 个代理中 remove_by_proxy_str：%.2f 微秒/次" % (pool_size, microseconds))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/conftest.py
+# @DATE: 2026/10/18
+# @TIME: 21:05:40
+#
+# @DESCRIPTION: 测试环境
+#   把仓库根目录注册为 common 包（不要求仓库目录名为 common），并在临时目录中使用 config.template.toml 作为配置文件
+
+
+import os
+import sys
+import shutil
+import tempfile
+import importlib.util
+
+import pytest
+
+
+# 全局变量
+ROOT_DIR_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DIR_PATH = tempfile.mkdtemp(prefix="common_test_")
+
+
+# 1. 配置文件（common.config 从当前目录读取 config.toml）
+shutil.copy(os.path.join(ROOT_DIR_PATH, "config.template.toml"), os.path.join(TEST_DIR_PATH, "config.toml"))
+os.chdir(TEST_DIR_PATH)
+# 2. 注册 common 包
+if "common" not in sys.modules:
+    spec = importlib.util.spec_from_file_location(
+        "common", os.path.join(ROOT_DIR_PATH, "__init__.py"), submodule_search_locations=[ROOT_DIR_PATH])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["common"] = module
+    spec.loader.exec_module(module)
+
+
+@pytest.fixture
+def fake_gost(monkeypatch):
+    """
+    @description: 本地模拟的 GOST 配置 API，gost_requests 在测试期间指向它
+    """
+    from common.logic import gost_config
+    from common.logic import gost_requests
+    from common.logic.gost_fake import FakeGostServer
+    with FakeGostServer() as fake_server:
+        monkeypatch.setattr(gost_requests, "GOST_API_URL", fake_server.url)
+        monkeypatch.setattr(gost_requests, "SESSION", None)
+        gost_config.invalidate()
+        yield fake_server
+    gost_config.invalidate()
+
+@pytest.fixture
+def proxy_pool():
+    """
+    @description: 5 个美国代理组成的代理池，测试结束后清空
+    """
+    from common import proxy
+    from common.logic.proxy_ports import IndexedPortList
+    port_2_proxy_info_dict = {
+        30000 + i: proxy._build_proxy_info("US", "10.0.0.{}".format(i + 1), 30000 + i, "socks5", "1.1.1.{}".format(i + 1), "")
+        for i in range(5)
+    }
+    proxy._save_proxy_pool({"US": IndexedPortList(port_2_proxy_info_dict.keys())}, port_2_proxy_info_dict)
+    yield port_2_proxy_info_dict
+    proxy._save_proxy_pool({}, {})
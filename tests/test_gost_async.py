@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_gost_async.py
+# @DATE: 2026/10/18
+# @TIME: 20:58:41
+#
+# @DESCRIPTION: GOST 异步客户端测试（使用本地模拟的 GOST 配置 API）
+
+
+import socket
+import asyncio
+
+import aiohttp
+import pytest
+
+from common.logic import gost_requests
+from common.logic.gost_async import GostAsyncClient
+
+
+# 全局变量
+NODES = [{"name": "node", "addr": "10.0.0.1:1080"}]
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(gost_requests, "RETRY_COUNT", 2)
+    monkeypatch.setattr(gost_requests, "RETRY_BACKOFF_FACTOR", 0)
+    gost_requests.reset_latency_stats()
+    yield
+    gost_requests.reset_latency_stats()
+
+def _fail_first_requests(monkeypatch, fake_gost, method: str, status: int, fail_count: int):
+    """
+    @description: 让模拟 API 的前 fail_count 个 method 请求返回 status
+    @return: 收到的 method 请求次数（列表，只有一项）
+    """
+    handle = fake_gost.handle
+    request_counts = [0]
+
+    def _handle(request_method, section, name, body):
+        if request_method == method:
+            request_counts[0] += 1
+            if request_counts[0] <= fail_count:
+                return status, {"code": 50000, "msg": "unavailable"}
+        return handle(request_method, section, name, body)
+
+    monkeypatch.setattr(fake_gost, "handle", _handle)
+    return request_counts
+
+
+def test_concurrent_requests_share_one_session(monkeypatch, fake_gost):
+    created_sessions = []
+    client_session_class = aiohttp.ClientSession
+
+    def _create_client_session(*args, **kwargs):
+        created_sessions.append(client_session_class(*args, **kwargs))
+        return created_sessions[-1]
+
+    monkeypatch.setattr(aiohttp, "ClientSession", _create_client_session)
+
+    async def _run():
+        async with GostAsyncClient(max_connections=4) as client:
+            results = await asyncio.gather(*[client.hop.add("hop-%s" % i, NODES) for i in range(20)])
+            session = client._session
+            assert await client.hop.delete("hop-0")
+        return results, session, client._session
+
+    results, session, closed_session = asyncio.run(_run())
+    assert all(results) and len(created_sessions) == 1 and created_sessions[0] is session
+    assert session.closed and closed_session is None
+    assert len(fake_gost.get_config()["hops"]) == 19
+    # 配置只获取一次，之后使用缓存
+    assert fake_gost.method_2_count["GET"] == 1
+
+def test_idempotent_request_is_retried(monkeypatch, fake_gost, no_backoff):
+    async def _run():
+        async with GostAsyncClient() as client:
+            assert await client.hop.add("hop", NODES)
+            request_counts = _fail_first_requests(monkeypatch, fake_gost, "PUT", 503, 2)
+            assert await client.hop.update("hop", NODES + [{"name": "node-2", "addr": "10.0.0.2:1080"}])
+            return request_counts[0]
+
+    assert asyncio.run(_run()) == 3
+    assert len(fake_gost.get_config()["hops"][0]["nodes"]) == 2
+    stats = gost_requests.get_latency_stats()["PUT api/config/hops/{name}"]
+    assert stats["count"] == 3 and stats["failure_count"] == 2
+
+def test_post_is_not_retried_after_server_error(monkeypatch, fake_gost, no_backoff):
+    request_counts = _fail_first_requests(monkeypatch, fake_gost, "POST", 503, 1)
+
+    async def _run():
+        async with GostAsyncClient() as client:
+            return await client.hop.add("hop", NODES)
+
+    assert not asyncio.run(_run())
+    assert request_counts[0] == 1 and not fake_gost.get_config().get("hops")
+
+def test_connection_error_is_retried_then_fails(monkeypatch, no_backoff):
+    # 没有监听的端口
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setattr(gost_requests, "GOST_API_URL", "http://127.0.0.1:%s" % port)
+
+    async def _run():
+        async with GostAsyncClient() as client:
+            return await client.request("POST", "api/config/hops", data={"name": "hop", "nodes": NODES})
+
+    assert asyncio.run(_run()) is None
+    stats = gost_requests.get_latency_stats()["POST api/config/hops"]
+    assert stats["count"] == 3 and stats["failure_count"] == 3
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_gost_config.py
+# @DATE: 2026/10/18
+# @TIME: 23:05:27
+#
+# @DESCRIPTION: GOST 配置缓存测试（按来源和目标查找端口转发服务，写入缓存时复制后替换，已发布的索引不会被修改）
+
+
+import sys
+import threading
+
+from common.logic import gost_config
+
+
+def _build_service(from_port: int, to_port: int = 1080) -> dict:
+    return {
+        "name": "port-forward-socks5-127.0.0.1-{}-to-socks5-10.0.0.1-{}-service".format(from_port, to_port),
+        "addr": "127.0.0.1:{}".format(from_port),
+        "handler": {"type": "socks5"},
+        "forwarder": {"nodes": [{"addr": "10.0.0.1:{}".format(to_port), "connector": {"type": "socks5"}}]}
+    }
+
+
+def test_find_services_by_endpoints(fake_gost):
+    # 默认名称、自定义名称的直接转发和转发链
+    fake_gost.handle("POST", "services", None, _build_service(20001))
+    fake_gost.handle("POST", "services", None, _build_service(20002, 1081))
+    fake_gost.handle("POST", "services", None, dict(_build_service(20003), name="custom"))
+    fake_gost.handle("POST", "chains", None, {
+        "name": "chain", "hops": [{"name": "hop", "nodes": [{"name": "node", "addr": "10.0.0.1:1080", "connector": {"type": "http"}}]}]})
+    fake_gost.handle("POST", "services", None, {
+        "name": "chained", "addr": "127.0.0.1:20004", "handler": {"type": "socks5", "chain": "chain"}})
+    fake_gost.handle("POST", "services", None, {"name": "unparsed", "addr": "127.0.0.1:20005", "handler": {"type": "socks5"}})
+    # 1. 按目标查找（结果按名称排序）
+    services = gost_config.find_services(to_host="10.0.0.1", to_port=1080)
+    assert [service["name"] for service in services] == ["chained", "custom", _build_service(20001)["name"]]
+    assert [service["name"] for service in gost_config.find_services(to_host="10.0.0.1", to_port="1080", to_protocol="http")] == ["chained"]
+    # 2. 按来源查找、来源和目标同时指定、按完整的键查找
+    assert [service["addr"] for service in gost_config.find_services(from_host="127.0.0.1", from_port=20002)] == ["127.0.0.1:20002"]
+    assert gost_config.find_services(from_host="127.0.0.1", from_port=20002, to_host="10.0.0.1", to_port=1080) == []
+    assert [service["name"] for service in gost_config.find_services(
+        "127.0.0.1", 20003, "socks5", "10.0.0.1", 1080, "socks5")] == ["custom"]
+    assert gost_config.find_services(from_host="127.0.0.1", from_port=20005) == []
+    # 3. 有效期内只请求一次配置，之后的修改通过 put_item 写入缓存
+    assert fake_gost.method_2_count["GET"] == 1
+    gost_config.put_item("services", _build_service(20006))
+    assert len(gost_config.find_services(to_host="10.0.0.1", to_port=1080)) == 4
+    assert fake_gost.method_2_count["GET"] == 1
+    # 4. 过期后重新获取，缓存中的修改被 GOST 的配置替换
+    gost_config.get_config_index(max_age_seconds=0)
+    assert fake_gost.method_2_count["GET"] == 2
+    assert len(gost_config.find_services(to_host="10.0.0.1", to_port=1080)) == 3
+
+def test_put_and_remove_do_not_mutate_published_index():
+    gost_config.save_config_index({"api": {}, "services": [_build_service(20001), _build_service(20002)]})
+    old_config_index = gost_config.CONFIG_INDEX
+    old_service_names = set(old_config_index["services"])
+    old_to_names = old_config_index["to_2_names"][("10.0.0.1", 1080)]
+    # 1. 新增一个相同目标的服务、删除一个服务
+    gost_config.put_item("services", _build_service(20003))
+    gost_config.remove_item("services", _build_service(20001)["name"])
+    # 2. 旧索引（包括其中的名称集合）保持不变
+    assert set(old_config_index["services"]) == old_service_names
+    assert old_config_index["to_2_names"][("10.0.0.1", 1080)] is old_to_names
+    assert len(old_to_names) == 2
+    # 3. 新索引包含修改
+    assert [service["addr"] for service in gost_config.find_services(to_host="10.0.0.1", to_port=1080)] == \
+        ["127.0.0.1:20002", "127.0.0.1:20003"]
+    assert gost_config.find_services(from_host="127.0.0.1", from_port=20001) == []
+    gost_config.invalidate()
+
+def test_readers_can_iterate_while_writing():
+    # 频繁切换线程，让遍历和写入交错
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    gost_config.save_config_index({"api": {}, "services": [_build_service(20000 + i) for i in range(200)]})
+    errors = []
+    is_stopped = threading.Event()
+
+    def reader():
+        try:
+            while not is_stopped.is_set():
+                config_index = gost_config.CONFIG_INDEX
+                for name in config_index["services"]:
+                    config_index["service_keys"].get(name)
+                for names in config_index["to_2_names"].values():
+                    list(names)
+        except Exception as e:
+            errors.append(e)
+
+    def writer():
+        for i in range(300):
+            gost_config.put_item("services", _build_service(21000 + i))
+            gost_config.remove_item("services", _build_service(20000 + i % 200)["name"])
+
+    try:
+        threads = [threading.Thread(target=reader) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        writer()
+        is_stopped.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+        gost_config.invalidate()
+    assert not errors
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_gost_fake.py
+# @DATE: 2026/10/18
+# @TIME: 20:44:19
+#
+# @DESCRIPTION: 本地模拟的 GOST 配置 API 测试（状态码与 GOST 一致）
+
+
+import pytest
+import requests
+
+from common.logic.gost_fake import FakeGostServer
+
+
+@pytest.fixture
+def fake_server():
+    with FakeGostServer(auth_username="user", auth_password="pass") as fake_server:
+        yield fake_server
+
+
+def _request(fake_server, method: str, path: str, body: dict = None, auth: tuple = ("user", "pass")):
+    response = requests.request(method, "{}/{}".format(fake_server.url.rstrip("/"), path), json=body, auth=auth, timeout=5)
+    return response.status_code, response.json()
+
+
+def test_add_update_delete_status_codes(fake_server):
+    chain = {"name": "chain", "hops": [{"name": "hop", "nodes": [{"name": "node", "addr": "10.0.0.1:1080"}]}]}
+    assert _request(fake_server, "POST", "api/config/chains", chain) == (200, {"msg": "OK"})
+    # 名称重复
+    assert _request(fake_server, "POST", "api/config/chains", chain) == (400, {"code": 40002, "msg": "object duplicated"})
+    # 修改时名称以路径为准
+    assert _request(fake_server, "PUT", "api/config/chains/chain", dict(chain, name="other"))[0] == 200
+    assert [item["name"] for item in fake_server.get_config()["chains"]] == ["chain"]
+    # 不存在
+    assert _request(fake_server, "PUT", "api/config/chains/missing", chain) == (404, {"code": 40004, "msg": "object not found"})
+    assert _request(fake_server, "DELETE", "api/config/chains/chain")[0] == 200
+    assert _request(fake_server, "DELETE", "api/config/chains/chain")[0] == 404
+    assert fake_server.method_2_count == {"POST": 2, "PUT": 2, "DELETE": 2}
+
+def test_invalid_requests(fake_server):
+    assert _request(fake_server, "POST", "api/config/services", {"addr": ":1080"})[0] == 400
+    assert _request(fake_server, "POST", "api/config/unknown", {"name": "a"})[0] == 404
+    assert _request(fake_server, "POST", "api/config")[0] == 405
+    assert _request(fake_server, "DELETE", "api/config/services")[0] == 405
+
+def test_auth_is_required(fake_server):
+    assert _request(fake_server, "GET", "api/config", auth=None) == (401, {"code": 40101, "msg": "Unauthorized"})
+    assert _request(fake_server, "GET", "api/config", auth=("user", "wrong"))[0] == 401
+    assert _request(fake_server, "GET", "api/config")[0] == 200
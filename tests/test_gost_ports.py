@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_gost_ports.py
+# @DATE: 2026/10/18
+# @TIME: 21:40:05
+#
+# @DESCRIPTION: GOST 监听端口分配测试
+
+
+import pytest
+
+from common import gost
+from common.logic import gost_ports
+
+
+@pytest.fixture
+def allocator(monkeypatch, fake_gost):
+    monkeypatch.setattr(gost_ports, "IS_PORT_REDIS", False)
+    gost_ports.reset()
+    yield
+    gost_ports.reset()
+
+
+def test_allocate_and_free():
+    port_allocator = gost_ports.PortAllocator(1, 13)
+    assert [port_allocator.allocate() for _ in range(14)] == list(range(1, 14)) + [None]
+    assert port_allocator.free(5) and not port_allocator.free(5)
+    assert port_allocator.allocate("key") == 5
+    assert port_allocator.allocate("key") == 5 and port_allocator.get_port("key") == 5
+    assert port_allocator.free(5) and port_allocator.get_port("key") is None
+
+def test_seed_skips_listening_ports_and_restores_keys(allocator):
+    assert gost.ensure_port_forward("127.0.0.1", 20000, "socks5", "10.0.0.1", 1080, "socks5")
+    assert gost.ensure_port_forward("127.0.0.1", 20001, "socks5", "10.0.0.2", 1080, "socks5", base_name="profile-a-proxy")
+    # 新进程：已监听的端口不会再分配，按转发名称恢复的 key 得到原来的端口
+    gost_ports.reset()
+    assert gost.allocate_port("profile-a-proxy") == 20001
+    assert gost.allocate_port() == 20002
+    assert gost.get_allocated_port("profile-b-proxy") is None
+
+def test_redis_allocations_are_loaded_on_start(monkeypatch, fake_gost):
+    fakeredis = pytest.importorskip("fakeredis")
+    fake_redis_conn = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(gost_ports, "_get_redis_connection", lambda: fake_redis_conn)
+    monkeypatch.setattr(gost_ports, "IS_PORT_REDIS", True)
+    gost_ports.reset()
+    # 其他进程已分配、还没有添加转发的端口
+    assert gost.allocate_port("profile-a-proxy") == 20000
+    assert gost.allocate_port() == 20001
+    fake_redis_conn.setbit(gost_ports.PORT_REDIS_KEY_PREFIX + ":bitmap", 9, 1)
+    # 新进程：本地分配器同样标记为已使用，并恢复 key 与端口的对应关系
+    gost_ports.reset()
+    allocator = gost_ports.get_allocator()
+    assert 20000 in allocator and 20001 in allocator and 20009 in allocator and len(allocator) == 3
+    assert allocator.get_port("profile-a-proxy") == 20000
+    assert gost.allocate_port() == 20002
+    gost_ports.reset()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_gost_reconciler.py
+# @DATE: 2026/10/18
+# @TIME: 20:31:05
+#
+# @DESCRIPTION: GOST 配置调和测试（使用本地模拟的 GOST 配置 API）
+
+
+import threading
+
+from common.logic import gost_reconciler
+from common.logic import periodic_refresher
+from common.logic.periodic_refresher import PeriodicRefresher
+
+
+# 全局变量
+SERVICE = {"name": "service", "addr": ":20030", "handler": {"type": "socks5"}, "listener": {"type": "tcp"}}
+
+
+def test_is_matched_compares_whole_normalized_item():
+    live = {"name": "service", "addr": ":20030", "handler": {"type": "socks5", "auth": {}},
+            "listener": {"type": "tcp"}, "forwarder": None, "status": {"state": "running"}}
+    assert gost_reconciler.is_matched(SERVICE, live)
+    assert gost_reconciler.is_matched({"name": "hop", "nodes": [{"addr": "1.2.3.4:1080", "weight": 1}]},
+                                      {"name": "hop", "nodes": [{"addr": "1.2.3.4:1080", "weight": "1"}]})
+    # 当前配置中多出的字段也视为不一致
+    assert not gost_reconciler.is_matched(SERVICE, dict(live, handler={"type": "socks5", "chain": "old-chain"}))
+
+def test_reconcile_removes_stale_handler_chain(fake_gost):
+    chain = {"name": "old-chain", "hops": [{"name": "old-hop", "nodes": [{"name": "node", "addr": "10.0.0.1:1080"}]}]}
+    chained_service = dict(SERVICE, handler={"type": "socks5", "chain": "old-chain"})
+    assert not gost_reconciler.reconcile({"chains": [chain], "services": [chained_service]})["failed"]
+    # 期望中不再引用转发链时修改服务
+    result = gost_reconciler.reconcile({"services": [SERVICE]})
+    assert result["updated"] == ["service"]
+    assert fake_gost.get_config()["services"][0]["handler"] == {"type": "socks5"}
+    # 已经一致时不发送修改请求
+    fake_gost.method_2_count = {}
+    assert gost_reconciler.reconcile({"services": [SERVICE]})["updated"] == []
+    assert set(fake_gost.method_2_count) == {"GET"}
+
+def test_refresher_logs_with_caller_prefix(monkeypatch):
+    messages = []
+    is_logged = threading.Event()
+
+    def _error(message):
+        messages.append(message)
+        is_logged.set()
+
+    monkeypatch.setattr(periodic_refresher.LOGGER, "error", _error)
+    refresher = PeriodicRefresher(lambda: 1 / 0, 0.01, 0, "test_refresh", "GOST 调和")
+    refresher.start()
+    assert is_logged.wait(5)
+    refresher.stop(5)
+    assert not refresher.is_running() and messages[0].startswith("GOST 调和 -> 后台刷新 test_refresh 出错")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_gost_requests.py
+# @DATE: 2026/10/18
+# @TIME: 11:24:53
+#
+# @DESCRIPTION: GOST 请求封装测试（共用 Session、重试、接口耗时统计）
+
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from common.logic import gost_requests
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    """
+    @description: 前 failure_count 个请求返回 503，之后返回 200
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        with server.lock:
+            server.method_list.append(self.command)
+            status = 503 if len(server.method_list) <= server.failure_count else 200
+        data = json.dumps({"msg": "OK" if status == 200 else "unavailable"}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+@pytest.fixture
+def flaky_server(monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyHandler)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.method_list = []
+    httpd.failure_count = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(gost_requests, "GOST_API_URL", "http://127.0.0.1:{}".format(httpd.server_address[1]))
+    monkeypatch.setattr(gost_requests, "RETRY_BACKOFF_FACTOR", 0)
+    monkeypatch.setattr(gost_requests, "SESSION", None)
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+def test_session_is_shared_between_threads(fake_gost):
+    sessions = []
+    threads = [threading.Thread(target=lambda: sessions.append(gost_requests.get_session())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(session) for session in sessions}) == 1
+    assert gost_requests.get("api/config")["api"]
+    assert gost_requests.get_session() is sessions[0]
+    # 带认证信息请求
+    assert sessions[0].auth == (gost_requests.GOST_AUTH_USERNAME, gost_requests.GOST_AUTH_PASSWORD)
+
+def test_idempotent_requests_are_retried(flaky_server):
+    flaky_server.failure_count = 2
+    assert gost_requests.get("api/config") == {"msg": "OK"}
+    assert flaky_server.method_list == ["GET"] * 3
+    # 重试次数用完后返回 None
+    flaky_server.method_list.clear()
+    flaky_server.failure_count = gost_requests.RETRY_COUNT + 1
+    assert gost_requests.put("api/config/services/a", {"name": "a"}) is None
+    assert flaky_server.method_list == ["PUT"] * (gost_requests.RETRY_COUNT + 1)
+
+def test_post_is_not_retried_after_server_error(flaky_server):
+    flaky_server.failure_count = 1
+    assert gost_requests.post("api/config/services", {"name": "a"}) is None
+    assert flaky_server.method_list == ["POST"]
+
+def test_latency_stats(monkeypatch, flaky_server):
+    monkeypatch.setattr(gost_requests, "ENDPOINT_2_STATS_DICT", {})
+    flaky_server.failure_count = 1
+    gost_requests.post("api/config/services", {"name": "a"})
+    gost_requests.delete("api/config/services/a")
+    gost_requests.delete("api/config/services/b")
+    gost_requests.get("api/config")
+    latency_stats = gost_requests.get_latency_stats()
+    # 配置项名称合并为占位符
+    assert set(latency_stats) == {"POST api/config/services", "DELETE api/config/services/{name}", "GET api/config"}
+    assert latency_stats["POST api/config/services"]["failure_count"] == 1
+    assert latency_stats["DELETE api/config/services/{name}"]["count"] == 2
+    assert latency_stats["DELETE api/config/services/{name}"]["failure_count"] == 0
+    for stats in latency_stats.values():
+        assert 0 <= stats["avg_seconds"] <= stats["max_seconds"]
+    gost_requests.reset_latency_stats()
+    assert gost_requests.get_latency_stats() == {}
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_proxy_batch.py
+# @DATE: 2026/10/18
+# @TIME: 10:12:48
+#
+# @DESCRIPTION: 批量获取代理测试（不放回抽样，跳过被禁用的出口 IP）
+
+
+import time
+
+import pytest
+import cachetools
+
+from common import proxy
+from common.logic.proxy_health import ProxyHealthScorer
+
+
+@pytest.fixture
+def banned_exit_ip_cache(monkeypatch):
+    cache = cachetools.TLRUCache(maxsize=1000, ttu=proxy._get_banned_exit_ip_expire_at, timer=time.time)
+    monkeypatch.setattr(proxy, "BANNED_EXIT_IP_CACHE", cache)
+    monkeypatch.setattr(proxy, "SCOPED_BANNED_EXIT_IP_CACHE", cachetools.TTLCache(maxsize=1000, ttl=1800))
+    # 禁用会计入健康度，使用单独的评分器
+    monkeypatch.setattr(proxy, "PROXY_HEALTH_SCORER", ProxyHealthScorer())
+    return cache
+
+
+def _get_port(proxy_str: str) -> int:
+    return int(proxy_str.rsplit(":", 1)[1])
+
+
+def test_proxy_strs_are_distinct(banned_exit_ip_cache, proxy_pool):
+    for _ in range(20):
+        proxy_strs = proxy.get_proxy_strs(3, "US")
+        assert len(proxy_strs) == 3 and len(set(proxy_strs)) == 3
+    # 不足 n 个时返回全部可用代理
+    assert sorted(_get_port(proxy_str) for proxy_str in proxy.get_proxy_strs(10)) == sorted(proxy_pool)
+    assert proxy.get_proxy_strs(3, "JP") == []
+    assert proxy.get_proxy_strs(2, is_forward=True, protocol="http")[0].startswith("http://%s:" % proxy.FORWARDER_HOST)
+
+def test_banned_and_duplicate_exit_ips_are_skipped(banned_exit_ip_cache, proxy_pool):
+    # 30005 与 30000 出口 IP 相同
+    proxy._add_proxy_info("US", "10.0.0.6", 30005, "socks5", "1.1.1.1", "")
+    proxy.ban_exit_ip_by_proxy_str("socks5://10.0.0.2:30001")
+    proxy.ban_exit_ip_by_proxy_str("socks5://10.0.0.3:30002", scope="https://www.example.com/")
+    for _ in range(20):
+        ports = [_get_port(proxy_str) for proxy_str in proxy.get_proxy_strs(10, "US", scope="example.com")]
+        assert len(ports) == 3 and {30003, 30004} < set(ports) and len({30000, 30005} & set(ports)) == 1
+    # 不要求出口 IP 不重复、不指定范围
+    ports = [_get_port(proxy_str) for proxy_str in proxy.get_proxy_strs(10, "US", is_distinct_exit_ip=False)]
+    assert sorted(ports) == [30000, 30002, 30003, 30004, 30005]
+    # 已移除的端口不会被选中
+    proxy._remove_proxy_info(30003)
+    assert 30003 not in [_get_port(proxy_str) for proxy_str in proxy.get_proxy_strs(10)]
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_proxy_columnar.py
+# @DATE: 2026/10/18
+# @TIME: 19:24:36
+#
+# @DESCRIPTION: 列式代理池测试
+
+
+import time
+
+import pytest
+import cachetools
+
+from common import proxy
+from common.logic.proxy_columnar import ColumnarProxyPool
+
+
+# 全局变量
+ROWS = [
+    ("US", "10.0.0.1", 30001, "socks5", "1.1.1.1", "residential"),
+    ("US", "10.0.0.2", 30002, "socks5", "1.1.1.2", ""),
+    ("US", "10.0.0.3", 30003, "http", "2001:db8::1", ""),
+    # 出口 IP 与 30001 重复
+    ("US", "10.0.0.4", 30004, "socks5", "1.1.1.1", ""),
+    ("JP", "10.0.1.1", 31001, "socks5", "2.2.2.2", ""),
+]
+
+
+class FakeResult:
+    def __init__(self, rows: list):
+        self.rows = rows
+
+    def partitions(self):
+        yield self.rows
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, rows: list):
+        self.rows = rows
+
+    def execute(self, sql, params=None, execution_options=None):
+        return FakeResult(self.rows)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def banned_exit_ip_cache(monkeypatch):
+    cache = cachetools.TLRUCache(maxsize=1000, ttu=proxy._get_banned_exit_ip_expire_at, timer=time.time)
+    monkeypatch.setattr(proxy, "BANNED_EXIT_IP_CACHE", cache)
+    return cache
+
+@pytest.fixture
+def columnar_proxy_pool(monkeypatch, banned_exit_ip_cache):
+    """
+    @description: 开启列式代理池并从 ROWS 加载，测试结束后恢复
+    """
+    monkeypatch.setattr(proxy, "IS_COLUMNAR_POOL_ENABLED", True)
+    monkeypatch.setattr(proxy, "COLUMNAR_PROXY_POOL", None)
+    assert proxy._select_and_save_proxy_info(True, "", FakeSession(ROWS))
+    return proxy.COLUMNAR_PROXY_POOL
+
+
+def test_rows_are_deduplicated_and_credentials_cached(monkeypatch, banned_exit_ip_cache):
+    pool = ColumnarProxyPool.from_rows(
+        ROWS, proxy._build_proxy_str, True, proxy._generate_proxy_username_and_password_by_ports, banned_exit_ip_cache)
+    assert len(pool) == 4 and pool.get_proxy_info(30004) is None
+    record_proxy_info = proxy._build_proxy_info("US", "10.0.0.3", 30003, "http", "2001:db8::1", "")
+    assert pool.get_proxy_info(30003) == {field: getattr(record_proxy_info, field) for field in pool.get_proxy_info(30003)}
+    jp_proxy_str = proxy._get_proxy_str_by_proxy_info(
+        proxy._build_proxy_info("JP", "10.0.1.1", 31001, "socks5", "2.2.2.2", ""), False)
+    # 选择时不再生成账户密码
+    monkeypatch.setattr(proxy, "_generate_proxy_username_and_password_by_port", None)
+    monkeypatch.setattr(proxy, "_generate_proxy_username_and_password_by_ports", None)
+    assert pool.get_proxy_str("JP") == jp_proxy_str
+    assert pool.get_proxy_str("JP", is_forward=True, protocol="http") == "http://%s:31001" % proxy.FORWARDER_HOST
+
+def test_removed_slots_are_never_picked():
+    rows = [("US", "10.0.0.1", 30000 + i, "socks5", "1.1.%s.%s" % (i // 256, i % 256), "") for i in range(1000)]
+    pool = ColumnarProxyPool.from_rows(rows, proxy._build_proxy_str, True, proxy._generate_proxy_username_and_password_by_ports)
+    for port in range(30000, 30999):
+        assert pool.remove_by_port(port)
+    assert not pool.remove_by_port(30000)
+    assert len(pool) == 1 and list(pool.alive_slots) == [999] and list(pool.country_code_id_2_slots[0]) == [999]
+    assert all(pool.get_proxy_str("US").endswith(":30999") for _ in range(20))
+    assert pool.remove_by_proxy_str("socks5://10.0.0.1:30999")
+    assert pool.get_proxy_str("US") is None and pool.get_proxy_str() is None
+
+def test_proxy_module_uses_columnar_pool_behind_flag(columnar_proxy_pool):
+    assert isinstance(columnar_proxy_pool, ColumnarProxyPool) and len(columnar_proxy_pool) == 4
+    # 全局的 ProxyInfo 代理池不会被构建
+    assert not proxy.PROXY_POOL
+    assert proxy.get_proxy_str("JP").endswith("@10.0.1.1:31001")
+    assert proxy.get_proxy_str(session_key="user") is None
+    # 移除
+    proxy.remove_by_proxy_str("socks5://10.0.1.1:31001")
+    assert proxy.get_proxy_str("JP") is None
+    # 上报使用结果
+    proxy.report_proxy_result(proxy.get_proxy_str("US"), True, byte_count=100)
+    assert sum(counts[2] for counts in proxy.PROXY_USAGE_COUNTER.collect().values()) == 100
+    # 增量刷新改为全量刷新
+    assert not proxy._refresh_proxy_pool_incrementally(True)
+
+def test_bans_are_shared_with_proxy_module(columnar_proxy_pool, banned_exit_ip_cache):
+    # 通过 proxy 模块禁用后列式代理池不再选中
+    proxy.ban_exit_ip_by_proxy_str("socks5://10.0.0.1:30001")
+    assert "1.1.1.1" in banned_exit_ip_cache
+    assert all(not proxy.get_proxy_str("US").endswith(":30001") for _ in range(30))
+    # 只在目标网站下禁用
+    proxy.ban_exit_ip_by_proxy_str("socks5://10.0.0.2:30002", scope="https://www.example.com/login")
+    assert all(proxy.get_proxy_str("US", protocol="http", scope="example.com").endswith(":30003") for _ in range(30))
+    assert {proxy.get_proxy_str("US")[-5:] for _ in range(50)} == {"30002", "30003"}
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_proxy_health.py
+# @DATE: 2026/10/18
+# @TIME: 22:03:18
+#
+# @DESCRIPTION: 代理健康度评分测试
+
+
+import sys
+import random
+import threading
+
+import pytest
+
+from common.logic import proxy_health
+from common.logic.proxy_health import ProxyHealthScorer
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    monkeypatch.setattr(proxy_health, "time", fake_clock)
+    return fake_clock
+
+def _assert_tree_consistent(selector):
+    tree = selector._tree
+    assert tree.total() == pytest.approx(sum(tree._weights))
+    for slot in range(len(tree)):
+        assert tree._prefix_sum(slot + 1) == pytest.approx(sum(tree._weights[:slot + 1]))
+
+
+def test_concurrent_updates_keep_prefix_sums_consistent():
+    # 频繁切换线程，让没有加锁的读-改-写交错
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    scorer = ProxyHealthScorer()
+    scorer.rebuild({"US": list(range(1000)), "CA": list(range(1000, 1500))})
+
+    errors = []
+
+    def worker(seed: int):
+        try:
+            _run(seed)
+        except Exception as e:
+            errors.append(e)
+
+    def _run(seed: int):
+        rng = random.Random(seed)
+        for _ in range(3000):
+            port = rng.randrange(1500)
+            action = rng.random()
+            if action < 0.6:
+                scorer.report(port, rng.random() < 0.7, rng.random())
+            elif action < 0.7:
+                scorer.ban(port)
+            elif action < 0.85:
+                scorer.remove(port)
+            else:
+                scorer.add(port, "US" if port < 1000 else "CA")
+            scorer.pick(rng.choice([None, "US", "CA"]))
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert not errors
+    _assert_tree_consistent(scorer.all_selector)
+    for selector in scorer.country_code_2_selector.values():
+        _assert_tree_consistent(selector)
+
+def test_banned_port_recovers_without_traffic(clock):
+    scorer = ProxyHealthScorer()
+    scorer.rebuild({"US": [1, 2]})
+    scorer.ban(1)
+    banned_weight = scorer.all_selector._tree.get(scorer.all_selector._port_2_slot[1])
+    assert banned_weight < 0.1
+    # 没有再上报，只是经过了一段时间后由后台线程重算
+    clock.now += proxy_health.HALF_LIFE_SECONDS * 12
+    scorer.rescore()
+    recovered_weight = scorer.all_selector._tree.get(scorer.all_selector._port_2_slot[1])
+    assert recovered_weight == pytest.approx(0.5, abs=0.01)
+    assert 1 not in scorer._decaying_port_set
+
+def test_stats_are_pruned_when_ports_leave_the_pool():
+    scorer = ProxyHealthScorer()
+    scorer.rebuild({"US": [1, 2, 3]})
+    scorer.report(1, False)
+    scorer.report(2, False)
+    scorer.remove(1)
+    assert 1 not in scorer.port_2_health
+    scorer.rebuild({"US": [3]})
+    assert set(scorer.port_2_health) == {3}
+    # 已离开代理池的端口的上报被忽略
+    scorer.report(2, True)
+    assert 2 not in scorer.port_2_health
+
+def test_pick_does_not_wait_for_writers():
+    scorer = ProxyHealthScorer()
+    scorer.rebuild({"US": [1, 2, 3]})
+    picked_ports = []
+    # 其他线程正在修改（持有锁）时仍能选择
+    with scorer._lock:
+        thread = threading.Thread(target=lambda: picked_ports.extend([scorer.pick(), scorer.pick("US")]))
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive()
+    assert set(picked_ports) <= {1, 2, 3} and len(picked_ports) == 2
+
+def test_health_rescorer_runs_in_background():
+    from common import proxy
+    assert proxy.HEALTH_RESCORER.refresh_function == proxy.PROXY_HEALTH_SCORER.rescore
+    assert proxy.HEALTH_RESCORER.interval_seconds == proxy_health.RESCORE_INTERVAL_SECONDS
+    proxy._save_proxy_pool({}, {})
+    assert proxy.HEALTH_RESCORER.is_running()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_proxy_health_check.py
+# @DATE: 2026/10/18
+# @TIME: 22:18:45
+#
+# @DESCRIPTION: 代理批量健康检查测试（使用本地替身代理和出口 IP 回显服务）
+
+
+import socket
+import asyncio
+from urllib.parse import urlsplit
+
+from common import proxy
+from common.logic import proxy_health_check
+
+
+async def _pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(proxy_health_check.MAX_RESPONSE_BYTES)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    finally:
+        writer.close()
+
+def _build_echo_handler(body: bytes = None):
+    # 出口 IP 回显服务：默认返回对端 IP，指定 body 时返回固定内容（模拟劫持页面）
+    async def _handle_echo(reader, writer):
+        await reader.read(proxy_health_check.MAX_RESPONSE_BYTES)
+        response_body = body if body is not None else writer.get_extra_info("peername")[0].encode("utf-8")
+        writer.write(b"HTTP/1.0 200 OK\r\n\r\n" + response_body)
+        await writer.drain()
+        writer.close()
+    return _handle_echo
+
+async def _handle_socks5(reader, writer):
+    # 只支持用户名密码认证和域名 / IPv4 目标的 SOCKS5 替身
+    _, method_count = await reader.readexactly(2)
+    await reader.readexactly(method_count)
+    writer.write(b"\x05\x02")
+    _, username_length = await reader.readexactly(2)
+    username = await reader.readexactly(username_length)
+    password = await reader.readexactly((await reader.readexactly(1))[0])
+    if (username, password) != (b"user", b"pass"):
+        writer.write(b"\x01\x01")
+        writer.close()
+        return
+    writer.write(b"\x01\x00")
+    _, _, _, address_type = await reader.readexactly(4)
+    if address_type == 0x03:
+        target_host = (await reader.readexactly((await reader.readexactly(1))[0])).decode("utf-8")
+    else:
+        target_host = socket.inet_ntoa(await reader.readexactly(4))
+    target_port = int.from_bytes(await reader.readexactly(2), "big")
+    target_reader, target_writer = await asyncio.open_connection(target_host, target_port)
+    writer.write(b"\x05\x00\x00\x01\x00\x00\x00\x00\x00\x00")
+    await asyncio.gather(_pipe(reader, target_writer), _pipe(target_reader, writer))
+
+async def _handle_http(reader, writer):
+    # 只支持绝对地址 GET 的 HTTP 替身
+    request = await reader.readuntil(b"\r\n\r\n")
+    split_result = urlsplit(request.split(b" ", 2)[1].decode("utf-8"))
+    target_reader, target_writer = await asyncio.open_connection(split_result.hostname, split_result.port)
+    target_writer.write(request)
+    await asyncio.gather(_pipe(reader, target_writer), _pipe(target_reader, writer))
+
+def _get_closed_port() -> int:
+    closed_socket = socket.socket()
+    closed_socket.bind(("127.0.0.1", 0))
+    closed_port = closed_socket.getsockname()[1]
+    closed_socket.close()
+    return closed_port
+
+
+def test_check_proxies():
+    async def _main():
+        echo_server = await asyncio.start_server(_build_echo_handler(), "127.0.0.1", 0)
+        hijacked_server = await asyncio.start_server(_build_echo_handler(b"<html>login</html>"), "127.0.0.1", 0)
+        socks5_server = await asyncio.start_server(_handle_socks5, "127.0.0.1", 0)
+        http_server = await asyncio.start_server(_handle_http, "127.0.0.1", 0)
+        socks5_port = socks5_server.sockets[0].getsockname()[1]
+        http_port = http_server.sockets[0].getsockname()[1]
+        proxy_info_list = [
+            {"host": "127.0.0.1", "port": socks5_port, "protocol": "socks5", "username": "user", "password": "pass"},
+            {"host": "127.0.0.1", "port": socks5_port, "protocol": "socks5", "username": "user", "password": "wrong"},
+            {"host": "127.0.0.1", "port": http_port, "protocol": "http"},
+            {"host": "127.0.0.1", "port": _get_closed_port(), "protocol": "socks5"},
+        ] * 50
+        try:
+            results = await proxy_health_check.check_proxies(
+                proxy_info_list, concurrency=20,
+                check_url="http://127.0.0.1:{}/".format(echo_server.sockets[0].getsockname()[1]), timeout=3)
+            hijacked_result = await proxy_health_check.check_proxy(
+                "127.0.0.1", http_port, "http",
+                check_url="http://127.0.0.1:{}/".format(hijacked_server.sockets[0].getsockname()[1]), timeout=3)
+        finally:
+            for server in (echo_server, hijacked_server, socks5_server, http_server):
+                server.close()
+        return results, hijacked_result
+
+    results, hijacked_result = asyncio.run(_main())
+    assert len(results) == 200
+    for i in range(0, 200, 4):
+        assert results[i]["is_success"] and results[i]["exit_ip"] == "127.0.0.1" and results[i]["latency"] is not None
+        assert not results[i + 1]["is_success"] and results[i + 1]["error"]
+        assert results[i + 2]["is_success"] and results[i + 2]["exit_ip"] == "127.0.0.1"
+        assert not results[i + 3]["is_success"]
+    # 响应体不是 IP 地址时不能作为出口 IP
+    assert not hijacked_result["is_success"] and hijacked_result["exit_ip"] is None
+    assert "出口 IP" in hijacked_result["error"]
+
+def test_health_check_marks_unavailable_after_consecutive_failures(monkeypatch, proxy_pool):
+    failed_port = 30000
+    written_params_list = []
+
+    async def _check_proxies(proxy_info_list, *args):
+        return [{"port": proxy_info["port"], "is_success": proxy_info["port"] != failed_port, "latency": 0.1,
+                 "exit_ip": None if proxy_info["port"] == failed_port else proxy_info["exit_ip"], "error": None}
+                for proxy_info in proxy_info_list]
+
+    def _update_proxy_health_check_results(results, unavailable_port_set):
+        written_params_list.append(proxy._build_health_check_update_params(results, unavailable_port_set))
+
+    monkeypatch.setattr(proxy_health_check, "check_proxies", _check_proxies)
+    monkeypatch.setattr(proxy, "_update_proxy_health_check_results", _update_proxy_health_check_results)
+    monkeypatch.setattr(proxy, "HEALTH_CHECK_MAX_FAILURE_COUNT", 3)
+    monkeypatch.setattr(proxy, "PORT_2_HEALTH_CHECK_FAILURE_COUNT", {})
+    # 1. 前两次失败只计数，不移除也不写回
+    for _ in range(2):
+        proxy.health_check_pool()
+        assert proxy.PROXY_POOL.get_proxy_info(failed_port) is not None
+        assert failed_port not in written_params_list[-1]["ports"]
+    # 2. 第三次失败后移除并标记为不可用，成功的代理只写回出口 IP
+    proxy.health_check_pool()
+    assert proxy.PROXY_POOL.get_proxy_info(failed_port) is None
+    params = written_params_list[-1]
+    assert params["is_availables"][params["ports"].index(failed_port)] is False
+    assert all(exit_ip for port, exit_ip in zip(params["ports"], params["exit_ips"]) if port != failed_port)
+
+def test_health_check_update_params_without_marking():
+    results = [
+        {"port": 1, "is_success": True, "exit_ip": "1.1.1.1"},
+        {"port": 2, "is_success": False, "exit_ip": None},
+    ]
+    assert proxy._build_health_check_update_params(results, set()) == \
+        {"ports": [1], "is_availables": [True], "exit_ips": ["1.1.1.1"]}
+    assert proxy._build_health_check_update_params(results[1:], set()) is None
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_proxy_index.py
+# @DATE: 2026/10/18
+# @TIME: 10:47:19
+#
+# @DESCRIPTION: 代理属性索引测试
+
+
+import pytest
+
+from common import proxy
+from common.logic.proxy_index import ProxyAttributeIndex, split_tags
+
+
+# 全局变量
+PORT_2_PROXY_INFO = {
+    30001: {"country_code": "US", "protocol": "socks5", "host": "10.0.0.1", "exit_ip": "1.1.1.1", "remark": "Residential, mobile"},
+    30002: {"country_code": "US", "protocol": "http", "host": "10.0.0.2", "exit_ip": "1.1.1.2", "remark": "datacenter"},
+    30003: {"country_code": "CA", "protocol": "socks5", "host": "10.0.0.1", "exit_ip": "1.1.1.3", "remark": "residential"},
+    30004: {"country_code": "JP", "protocol": "socks5", "host": "10.0.0.3", "exit_ip": "1.1.1.4", "remark": ""},
+}
+
+
+@pytest.fixture
+def attribute_index():
+    attribute_index = ProxyAttributeIndex()
+    for port, proxy_info in PORT_2_PROXY_INFO.items():
+        attribute_index.add(port, proxy_info)
+    return attribute_index
+
+
+def test_split_tags():
+    assert split_tags("Residential, mobile；ISP|static/rotating") == {"residential", "mobile", "isp", "static", "rotating"}
+    assert split_tags("") == set() and split_tags(None) == set()
+
+def test_select_unions_values_and_intersects_attributes(attribute_index):
+    assert len(attribute_index) == 4
+    assert attribute_index.select({"country_code": None}) is None
+    assert sorted(attribute_index.select({"country_code": {"US", "CA"}})) == [30001, 30002, 30003]
+    assert sorted(attribute_index.select({"country_code": {"US", "CA"}, "tag": "RESIDENTIAL"})) == [30001, 30003]
+    assert sorted(attribute_index.select({"host": "10.0.0.1", "protocol": "socks5", "tag": None})) == [30001, 30003]
+    assert attribute_index.select({"country_code": "US", "tag": "mobile", "protocol": "http"}) == ()
+    assert attribute_index.select({"country_code": "DE"}) == ()
+    with pytest.raises(ValueError):
+        attribute_index.select({"exit_ip": "1.1.1.1"})
+
+def test_selection_cache_is_invalidated_by_changes(attribute_index):
+    filters = {"tag": "residential"}
+    ports = attribute_index.select(filters)
+    assert attribute_index.select(dict(filters)) is ports
+    # 修改后不再使用缓存的结果
+    attribute_index.remove(30003, PORT_2_PROXY_INFO[30003])
+    assert attribute_index.select(filters) == (30001,)
+    attribute_index.add(30005, dict(PORT_2_PROXY_INFO[30003], remark="Residential"))
+    assert sorted(attribute_index.select(filters)) == [30001, 30005]
+    # 移除最后一个端口后值也被移除
+    attribute_index.remove(30004, PORT_2_PROXY_INFO[30004])
+    assert attribute_index.select({"country_code": "JP"}) == ()
+    assert len(attribute_index) == 3
+
+def test_is_matched():
+    proxy_info = PORT_2_PROXY_INFO[30001]
+    assert ProxyAttributeIndex.is_matched(proxy_info, {"country_code": {"US", "CA"}, "tag": "Mobile", "host": None})
+    assert not ProxyAttributeIndex.is_matched(proxy_info, {"country_code": "US", "protocol": "http"})
+
+def test_get_proxy_str_by_attributes(proxy_pool):
+    proxy._add_proxy_info("CA", "10.0.1.1", 31000, "http", "2.2.2.1", "residential")
+    proxy._add_proxy_info("CA", "10.0.1.2", 31001, "socks5", "2.2.2.2", "residential")
+    for _ in range(20):
+        assert proxy.get_proxy_str({"US", "CA"}, proxy_protocol="http", tag="Residential").endswith(":31000")
+    assert proxy.get_proxy_str("US", tag="residential") is None
+    # 选择时确认属性仍然符合：修改后的代理不会被选中
+    proxy._add_proxy_info("CA", "10.0.1.1", 31000, "http", "2.2.2.1", "datacenter")
+    assert proxy.get_proxy_str("CA", proxy_protocol="http", tag="residential") is None
+    assert proxy.get_proxy_str("CA", proxy_protocol="http", tag="datacenter").endswith(":31000")
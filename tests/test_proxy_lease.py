@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_proxy_lease.py
+# @DATE: 2026/10/18
+# @TIME: 18:52:07
+#
+# @DESCRIPTION: 代理并发租约测试
+
+
+import threading
+
+from common.logic import proxy_lease
+from common.logic.proxy_lease import PortLeaseCounter
+
+
+def _build_counter(ports: list):
+    return PortLeaseCounter(lambda country_code: list(ports), lambda port: "US" if port in ports else None)
+
+
+def test_least_loaded_port_is_leased_first():
+    counter = _build_counter([1, 2])
+    assert {counter.acquire(max_inflight=2), counter.acquire(max_inflight=2)} == {1, 2}
+    assert counter.acquire(max_inflight=2) in (1, 2)
+    assert counter.acquire(max_inflight=2) in (1, 2)
+    assert counter.acquire(max_inflight=2) is None
+    counter.release(1)
+    assert counter.acquire(max_inflight=2) == 1
+    assert counter.port_2_inflight == {1: 2, 2: 2}
+
+def test_redis_acquire_runs_outside_the_lock(monkeypatch):
+    counter = _build_counter([1, 2, 3])
+    other_thread_results = []
+
+    def _acquire_redis(port, max_inflight):
+        # 网络请求期间其他线程仍能租用和归还
+        thread = threading.Thread(target=lambda: other_thread_results.append(counter.acquire(max_inflight=1)))
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive()
+        return True
+
+    monkeypatch.setattr(proxy_lease, "_acquire_redis", _acquire_redis)
+    port = counter.acquire(max_inflight=1, is_distributed=True)
+    # 本地计数在请求 Redis 前已经占用，其他线程不会选中同一个端口
+    assert other_thread_results and other_thread_results[0] not in (None, port)
+
+def test_port_full_in_redis_is_rolled_back_and_skipped(monkeypatch):
+    counter = _build_counter([1, 2])
+    redis_ports = []
+
+    def _acquire_redis(port, max_inflight):
+        redis_ports.append(port)
+        return port == 2
+
+    monkeypatch.setattr(proxy_lease, "_acquire_redis", _acquire_redis)
+    assert counter.acquire(max_inflight=1, is_distributed=True) == 2
+    assert counter.port_2_inflight == {2: 1}
+    # 1 在其他进程中已满（只请求一次 Redis），2 在本进程中已满（不请求 Redis）
+    del redis_ports[:]
+    assert counter.acquire(max_inflight=1, is_distributed=True) is None
+    assert counter.port_2_inflight == {2: 1}
+    assert redis_ports == [1]
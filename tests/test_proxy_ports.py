@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_proxy_ports.py
+# @DATE: 2026/10/18
+# @TIME: 23:58:36
+#
+# @DESCRIPTION: 带反向索引的端口列表测试
+
+
+import random
+
+from common.logic.proxy_ports import IndexedPortList
+
+
+def _assert_index_consistent(port_list: IndexedPortList):
+    for slot, port in enumerate(port_list):
+        assert port_list.index(port) == slot
+    assert len(port_list._port_2_slot) == len(port_list)
+
+
+def test_remove_matches_list_semantics():
+    rng = random.Random(0)
+    ports = list(range(30000, 32000))
+    port_list = IndexedPortList(ports)
+    expected_port_set = set(ports)
+    removed_ports = rng.sample(ports, 1000)
+    for port in removed_ports:
+        assert port_list.remove(port)
+        expected_port_set.discard(port)
+    assert not port_list.remove(removed_ports[0])
+    assert set(port_list) == expected_port_set and len(port_list) == len(expected_port_set)
+    _assert_index_consistent(port_list)
+
+def test_append_ignores_duplicates_and_random_choice():
+    port_list = IndexedPortList([1, 2, 2, 3])
+    assert list(port_list) == [1, 2, 3]
+    assert port_list.random_choice() in (1, 2, 3)
+    assert IndexedPortList().random_choice() is None
+
+def test_copy_is_independent():
+    port_list = IndexedPortList([1, 2, 3])
+    copied_port_list = port_list.copy()
+    copied_port_list.remove(1)
+    copied_port_list.append(4)
+    assert list(port_list) == [1, 2, 3] and 1 in port_list and 4 not in port_list
+    assert sorted(copied_port_list) == [2, 3, 4]
+    _assert_index_consistent(copied_port_list)
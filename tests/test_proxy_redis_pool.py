@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_proxy_redis_pool.py
+# @DATE: 2026/10/18
+# @TIME: 23:31:52
+#
+# @DESCRIPTION: Redis 共享代理池测试（使用 fakeredis）
+
+
+import time
+
+import pytest
+import cachetools
+
+from common import proxy
+from common import redis
+from common.logic import proxy_redis_pool
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def redis_conn(monkeypatch):
+    fake_redis_conn = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis, "get_connetion", lambda db=None: fake_redis_conn)
+    return fake_redis_conn
+
+
+def test_publish_expires_old_version_without_scanning(monkeypatch, redis_conn, proxy_pool):
+    def _scan_iter(*args, **kwargs):
+        raise AssertionError("不应扫描键空间")
+
+    monkeypatch.setattr(redis_conn, "scan_iter", _scan_iter)
+    old_version = proxy_redis_pool.publish(proxy_pool)
+    old_keys = redis_conn.smembers(proxy_redis_pool._get_version_key(old_version, "keys"))
+    assert old_keys == {proxy_redis_pool._get_version_key(old_version, suffix) for suffix in ("keys", "info", "ports", "ports:US")}
+    version = proxy_redis_pool.publish(proxy_pool)
+    assert version > old_version
+    for key in old_keys:
+        assert 0 < redis_conn.ttl(key) <= proxy_redis_pool.OLD_VERSION_EXPIRE_SECONDS
+    for key in redis_conn.smembers(proxy_redis_pool._get_version_key(version, "keys")):
+        assert redis_conn.ttl(key) == -1
+    assert set(proxy_redis_pool.load(version)) == set(proxy_pool)
+
+def test_synced_ban_keeps_remaining_ttl(monkeypatch, redis_conn, proxy_pool):
+    monkeypatch.setattr(proxy, "BANNED_EXIT_IP_CACHE", cachetools.TLRUCache(
+        maxsize=1000, ttu=proxy._get_banned_exit_ip_expire_at, timer=time.time))
+    # 其他进程 30 分钟前禁用，只剩 100 秒
+    expire_at = time.time() + 100
+    redis_conn.zadd(proxy_redis_pool.BANNED_EXIT_IPS_REDIS_KEY, {"1.1.1.1": expire_at})
+    proxy._sync_banned_exit_ips_from_redis()
+    assert proxy.BANNED_EXIT_IP_CACHE["1.1.1.1"] == pytest.approx(expire_at)
+    # 其他进程重新禁用后同步延长
+    redis_conn.zadd(proxy_redis_pool.BANNED_EXIT_IPS_REDIS_KEY, {"1.1.1.1": expire_at + 1000})
+    proxy._sync_banned_exit_ips_from_redis()
+    assert proxy.BANNED_EXIT_IP_CACHE["1.1.1.1"] == pytest.approx(expire_at + 1000)
+    # 过期时间已到的禁用不再生效
+    proxy.BANNED_EXIT_IP_CACHE["2.2.2.2"] = time.time() - 1
+    assert "2.2.2.2" not in proxy.BANNED_EXIT_IP_CACHE
+
+def test_pick_passes_every_key_through_keys(monkeypatch, redis_conn, proxy_pool):
+    assert proxy_redis_pool.pick() is None
+    version = proxy_redis_pool.publish(proxy_pool)
+    eval_keys_list = []
+    _eval = redis_conn.eval
+
+    def _recording_eval(script, key_count, *keys_and_args):
+        eval_keys_list.append(keys_and_args[:key_count])
+        return _eval(script, key_count, *keys_and_args)
+
+    monkeypatch.setattr(redis_conn, "eval", _recording_eval)
+    # 按国家选择，跳过被禁用的出口 IP
+    for port in (30000, 30001, 30002, 30003):
+        proxy_redis_pool.ban_exit_ip(proxy_pool[port]["exit_ip"], 60)
+    assert proxy_redis_pool.pick("US")["port"] == 30004
+    assert eval_keys_list[-1] == (
+        proxy_redis_pool.VERSION_REDIS_KEY, proxy_redis_pool._get_version_key(version, "ports:US"),
+        proxy_redis_pool._get_version_key(version, "info"), proxy_redis_pool.BANNED_EXIT_IPS_REDIS_KEY)
+    assert proxy_redis_pool.pick()["port"] == 30004
+    assert eval_keys_list[-1][1] == proxy_redis_pool._get_version_key(version, "ports")
+    assert proxy_redis_pool.pick("JP") is None
+    # 读取版本号后发布了新版本时，按新版本的键重试
+    new_version = proxy_redis_pool.publish(proxy_pool)
+    version_list = [version]
+    get_version = proxy_redis_pool.get_version
+    monkeypatch.setattr(proxy_redis_pool, "get_version", lambda: version_list.pop() if version_list else get_version())
+    eval_keys_list.clear()
+    assert proxy_redis_pool.pick("US")["port"] == 30004
+    assert [eval_keys[2] for eval_keys in eval_keys_list] == [
+        proxy_redis_pool._get_version_key(version, "info"), proxy_redis_pool._get_version_key(new_version, "info")]
+
+def test_legacy_true_bans_use_default_ttl(monkeypatch, redis_conn):
+    now_list = [time.time()]
+    monkeypatch.setattr(proxy, "BANNED_EXIT_IP_CACHE", cachetools.TLRUCache(
+        maxsize=1000, ttu=proxy._get_banned_exit_ip_expire_at, timer=lambda: now_list[0]))
+    # 旧写法仍按默认禁用时间生效
+    proxy.BANNED_EXIT_IP_CACHE["1.1.1.1"] = True
+    now_list[0] += proxy.BANNED_EXIT_IP_TTL_SECONDS - 1
+    assert proxy._is_exit_ip_banned("1.1.1.1")
+    now_list[0] += 2
+    assert not proxy._is_exit_ip_banned("1.1.1.1")
+    # 同步时覆盖旧写法的 True，较早的过期时间不会缩短已有的禁用
+    now_list[0] = time.time()
+    proxy.BANNED_EXIT_IP_CACHE["1.1.1.1"] = True
+    expire_at = time.time() + 100
+    redis_conn.zadd(proxy_redis_pool.BANNED_EXIT_IPS_REDIS_KEY, {"1.1.1.1": expire_at})
+    proxy._sync_banned_exit_ips_from_redis()
+    assert proxy.BANNED_EXIT_IP_CACHE["1.1.1.1"] == pytest.approx(expire_at)
+    proxy._set_banned_exit_ip("1.1.1.1", expire_at - 50)
+    assert proxy.BANNED_EXIT_IP_CACHE["1.1.1.1"] == pytest.approx(expire_at)
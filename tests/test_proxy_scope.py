@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_proxy_scope.py
+# @DATE: 2026/10/18
+# @TIME: 11:02:35
+#
+# @DESCRIPTION: 只在指定目标网站（范围）下禁用出口 IP 的测试
+
+
+import time
+
+import pytest
+import cachetools
+
+from common import proxy
+from common.logic.proxy_health import ProxyHealthScorer
+
+
+@pytest.fixture
+def scorer(monkeypatch):
+    monkeypatch.setattr(proxy, "BANNED_EXIT_IP_CACHE", cachetools.TLRUCache(
+        maxsize=1000, ttu=proxy._get_banned_exit_ip_expire_at, timer=time.time))
+    monkeypatch.setattr(proxy, "SCOPED_BANNED_EXIT_IP_CACHE", cachetools.TTLCache(maxsize=1000, ttl=1800))
+    scorer = ProxyHealthScorer()
+    monkeypatch.setattr(proxy, "PROXY_HEALTH_SCORER", scorer)
+    return scorer
+
+
+def _get_port(proxy_str: str) -> int:
+    return int(proxy_str.rsplit(":", 1)[1])
+
+
+def test_normalize_scope():
+    for scope in ("https://www.Example.com:8443/login?a=1", "example.com", "WWW.EXAMPLE.COM/path", "example.com:80"):
+        assert proxy._normalize_scope(scope) == "example.com"
+    assert proxy._normalize_scope("https://api.example.com/") == "api.example.com"
+    assert proxy._normalize_scope("") is None and proxy._normalize_scope(None) is None
+
+def test_scoped_ban_only_applies_to_its_scope(scorer, proxy_pool):
+    for port in (30000, 30001, 30002, 30003):
+        proxy.ban_exit_ip_by_proxy_str("socks5://10.0.0.1:%s" % port, scope="https://www.example.com/login")
+    # 1. 不计入健康度，也不是全局禁用
+    assert not proxy.BANNED_EXIT_IP_CACHE
+    assert all(scorer.port_2_health.get(port) is None or scorer.port_2_health[port].failure_count == 0 for port in proxy_pool)
+    # 2. 该网站下只剩 30004，其他网站和未指定范围时仍可使用全部代理
+    for get_proxy_str in (lambda scope: proxy.get_proxy_str("US", scope=scope),
+                          lambda scope: proxy.get_proxy_str(scope=scope, is_health_weighted=False),
+                          lambda scope: proxy.get_proxy_str("US", session_key="user", scope=scope),
+                          lambda scope: proxy.get_proxy_str("US", proxy_protocol="socks5", scope=scope)):
+        assert all(_get_port(get_proxy_str("example.com")) == 30004 for _ in range(20))
+    assert {_get_port(proxy.get_proxy_str("US", scope="other.com")) for _ in range(100)} == set(proxy_pool)
+    assert {_get_port(proxy.get_proxy_str("US")) for _ in range(100)} == set(proxy_pool)
+    # 3. 该网站下全部禁用后没有可用代理
+    proxy.ban_exit_ip_by_proxy_str("socks5://10.0.0.5:30004", scope="example.com")
+    assert proxy.get_proxy_str("US", scope="www.example.com") is None
+    assert proxy.get_proxy_strs(5, "US", scope="example.com") == []
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_proxy_stash.py
+# @DATE: 2026/10/18
+# @TIME: 10:31:06
+#
+# @DESCRIPTION: 代理池本地暂存测试（使用临时目录中的 SQLite 数据库）
+
+
+import pytest
+
+from common import proxy
+from common.logic import proxy_stash
+
+
+# 全局变量
+CONDITION = {"is_exit_ip_remove_duplicate": True, "country_code_list": [], "remark_like_str_list": []}
+
+
+@pytest.fixture
+def stash_database_path(monkeypatch, tmp_path):
+    db_path = str(tmp_path / "common.db")
+    monkeypatch.setattr(proxy_stash, "STASH_DATABASE_PATH", db_path)
+    # init_proxy_pool_from_stash 会修改加载条件等全局变量
+    for name in ("IS_STASH_ENABLED", "LAST_IS_EXIT_IP_REMOVE_DUPLICATE", "LAST_COUNTRY_CODE_LIST",
+                 "LAST_REMARK_LIKE_STR_LIST", "LAST_HIGH_WATER_MARK"):
+        monkeypatch.setattr(proxy, name, getattr(proxy, name))
+    return db_path
+
+
+def test_save_and_load_latest_matching_snapshot(stash_database_path, proxy_pool):
+    versions = [proxy_stash.save(proxy_pool, CONDITION) for _ in range(3)]
+    assert versions == sorted(set(versions))
+    # 1. 读取最新的快照
+    version, created_at, rows = proxy_stash.load(CONDITION, 60)
+    assert version == versions[-1]
+    assert sorted(rows) == sorted(
+        (proxy_info["country_code"], proxy_info["host"], port, proxy_info["protocol"], proxy_info["exit_ip"], proxy_info["remark"])
+        for port, proxy_info in proxy_pool.items())
+    # 2. 只保留最近 KEEP_SNAPSHOT_COUNT 个
+    conn, cursor = proxy_stash.stash.init_database(stash_database_path)
+    cursor.execute("SELECT version FROM proxy_pool_snapshot ORDER BY version")
+    assert [row[0] for row in cursor.fetchall()] == versions[-proxy_stash.KEEP_SNAPSHOT_COUNT:]
+    cursor.execute("SELECT COUNT(*) FROM proxy_pool_snapshot_proxy")
+    assert cursor.fetchone()[0] == len(proxy_pool) * proxy_stash.KEEP_SNAPSHOT_COUNT
+    proxy_stash.stash.close_database(conn, cursor)
+    # 3. 条件不一致、已过期、格式版本不一致的快照不会被使用
+    assert proxy_stash.load(dict(CONDITION, country_code_list=["US"]), 60) is None
+    assert proxy_stash.load(CONDITION, -1) is None
+    proxy_stash.SNAPSHOT_FORMAT_VERSION += 1
+    try:
+        assert proxy_stash.load(CONDITION, 60) is None
+    finally:
+        proxy_stash.SNAPSHOT_FORMAT_VERSION -= 1
+
+def test_init_proxy_pool_from_stash(monkeypatch, stash_database_path, proxy_pool):
+    proxy.LAST_IS_EXIT_IP_REMOVE_DUPLICATE, proxy.LAST_COUNTRY_CODE_LIST, proxy.LAST_REMARK_LIKE_STR_LIST = True, [], []
+    assert proxy.stash_proxy_pool()
+    proxy._save_proxy_pool({}, {})
+    # 1. 使用快照初始化，不连接数据库
+    def _init_proxy_pool(*args, **kwargs):
+        raise AssertionError("有可用快照时不应从数据库加载")
+
+    monkeypatch.setattr(proxy, "init_proxy_pool", _init_proxy_pool)
+    assert proxy.init_proxy_pool_from_stash(is_reconciled=False)
+    assert {port: proxy_info.proxy_strs for port, proxy_info in proxy.PROXY_POOL.items()} == \
+        {port: proxy_info.proxy_strs for port, proxy_info in proxy_pool.items()}
+    assert sorted(proxy.PROXY_POOL.iter_ports("US")) == sorted(proxy_pool)
+    assert proxy.LAST_HIGH_WATER_MARK is None
+    # 2. 条件不同时从数据库加载
+    country_code_lists = []
+    monkeypatch.setattr(proxy, "init_proxy_pool", lambda is_exit_ip_remove_duplicate, country_code_list, remark_like_str_list:
+                        country_code_lists.append(country_code_list))
+    proxy.init_proxy_pool_from_stash(country_code_list=["JP"], is_reconciled=False)
+    assert country_code_lists == [["JP"]]
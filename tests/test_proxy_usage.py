@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding:UTF-8 -*-
+#
+# @AUTHOR: Rabbir
+# @FILE: common/tests/test_proxy_usage.py
+# @DATE: 2026/10/18
+# @TIME: 21:27:50
+#
+# @DESCRIPTION: 代理用量、使用结果计数测试（上报不加锁，健康度批量更新）
+
+
+import threading
+
+import pytest
+
+from common import proxy
+from common.logic import proxy_health
+from common.logic import proxy_usage
+from common.logic.proxy_usage import PortUsageCounter, PortResultCounter
+from common.logic.proxy_health import ProxyHealthScorer
+
+
+def test_counts_from_all_threads_are_collected_once():
+    counter = PortUsageCounter()
+
+    def _record():
+        for i in range(1000):
+            counter.record(30000 + i % 2, i % 4 != 0, 10)
+
+    threads = [threading.Thread(target=_record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    counter.record(30002, False)
+    for thread in threads:
+        thread.join()
+    assert counter.collect() == {30000: [4000, 2000, 40000], 30001: [4000, 0, 40000], 30002: [1, 1, 0]}
+    # 只返回上次汇总后的增量，已退出线程的计数汇总后丢弃
+    assert counter.collect() == {}
+    assert len(counter._thread_entries) == 1
+    counter.record(30002)
+    assert counter.collect() == {30002: [1, 0, 0]}
+
+def test_restored_counts_are_merged_into_next_collect():
+    counter = PortUsageCounter()
+    counter.record(30000, byte_count=5)
+    port_2_delta_counts = counter.collect()
+    counter.restore(port_2_delta_counts)
+    counter.record(30000, False)
+    assert counter.collect() == {30000: [2, 1, 5]}
+
+def test_redis_round_trip(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    from common import redis
+    fake_redis_conn = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis, "get_connetion", lambda db=None: fake_redis_conn)
+    proxy_usage.push_to_redis({30000: [2, 1, 100]})
+    proxy_usage.push_to_redis({30000: [1, 0, 0], 30001: [1, 0, 7]})
+    assert proxy_usage.pop_from_redis() == {30000: [3, 1, 100], 30001: [1, 0, 7]}
+    assert proxy_usage.pop_from_redis() == {}
+
+def test_batched_results_match_single_reports(monkeypatch):
+    monkeypatch.setattr(proxy_health.time, "time", lambda: 1000000.0)
+    reported_scorer = ProxyHealthScorer()
+    applied_scorer = ProxyHealthScorer()
+    counter = PortResultCounter()
+    for scorer in (reported_scorer, applied_scorer):
+        scorer.rebuild({"US": [30000, 30001]})
+    results = [(30000, True, 0.5), (30000, False, None), (30000, True, 0.5), (30001, False, 3.0)]
+    for port, is_success, latency in results:
+        reported_scorer.report(port, is_success, latency)
+        counter.record(port, is_success, latency)
+    # 未知端口忽略
+    counter.record(39999, True)
+    applied_scorer.apply(counter.collect())
+    for port in (30000, 30001):
+        reported_health = reported_scorer.port_2_health[port]
+        applied_health = applied_scorer.port_2_health[port]
+        assert (applied_health.success_count, applied_health.failure_count) == \
+            (reported_health.success_count, reported_health.failure_count)
+        assert applied_health.latency == pytest.approx(reported_health.latency)
+        assert applied_scorer.get_score(port) == pytest.approx(reported_scorer.get_score(port))
+    assert 39999 not in applied_scorer.port_2_health
+
+def test_report_does_not_wait_for_scorer_lock(monkeypatch, proxy_pool):
+    # 停止后台批量更新，由测试手动调用
+    proxy.HEALTH_APPLIER.stop(5)
+    scorer = ProxyHealthScorer()
+    scorer.rebuild({"US": list(proxy_pool)})
+    monkeypatch.setattr(proxy, "PROXY_HEALTH_SCORER", scorer)
+    monkeypatch.setattr(proxy, "PROXY_RESULT_COUNTER", PortResultCounter())
+    proxy_str = proxy._get_proxy_str_by_proxy_info(proxy_pool[30000], False)
+    is_locked = threading.Event()
+    is_released = threading.Event()
+
+    def _hold_lock():
+        with scorer._lock:
+            is_locked.set()
+            is_released.wait(5)
+
+    thread = threading.Thread(target=_hold_lock)
+    thread.start()
+    try:
+        assert is_locked.wait(5)
+        # 评分器被其他线程占用时上报仍然立即返回
+        for _ in range(10):
+            proxy.report_proxy_result(proxy_str, False, latency=1.0)
+        assert scorer.port_2_health[30000].failure_count == 0
+    finally:
+        is_released.set()
+        thread.join()
+    # 批量更新后生效
+    assert proxy.apply_proxy_results() == 1
+    assert scorer.port_2_health[30000].failure_count == pytest.approx(10, rel=1e-3)
+    assert proxy.apply_proxy_results() == 0